@@ -1,10 +1,13 @@
 """FastAPI application entry point"""
-from fastapi import FastAPI, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import face_router
-from app.utils.config import PORT, HOST, LOG_LEVEL
-from app.services.model_loader import ModelLoader
+from app.utils.config import (
+    PORT, HOST, LOG_LEVEL, RAG_WARMUP_ON_STARTUP, METRICS_REQUIRE_API_KEY, SERVER_TIMING_ENABLED,
+)
+from app.utils.metrics import REGISTRY, render_prometheus
+from app.utils.server_timing import SERVER_TIMING_HEADER, ServerTimingMiddleware
 import logging
 import os
 import traceback
@@ -39,8 +42,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "DELETE", "OPTIONS"],  # Include DELETE and OPTIONS for preflight
     allow_headers=["Content-Type", "Authorization", "X-API-Key"],  # Restrict headers
+    expose_headers=[SERVER_TIMING_HEADER] if SERVER_TIMING_ENABLED else [],
 )
 
+# Per-stage durations of each request in a Server-Timing header (opt-in)
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(face_router.router)
 
@@ -156,20 +164,62 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+# Readiness endpoint (separate from /health, which only says the process is up)
+@app.get("/ready")
+async def ready():
+    if not face_router.face_service_created():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "loading", "ready": False, "error": None,
+                     "anti_spoofing_model": False, "timings_ms": {}}
+        )
+    readiness = face_router.face_service.get_readiness()
+    if readiness["ready"]:
+        return {"status": "ready", **readiness}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "failed" if readiness["error"] else "loading", **readiness}
+    )
+
+# Prometheus scrape endpoint: per-stage latencies, executor queue depth,
+# active liveness sessions/streams and model-load timings
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(face_router.verify_api_key)] if METRICS_REQUIRE_API_KEY else [],
+)
+def metrics():
+    # Sync on purpose: the session gauge callback may hit Redis, so the
+    # render runs in the threadpool rather than on the event loop
+    return PlainTextResponse(render_prometheus(REGISTRY), media_type="text/plain; version=0.0.4")
+
 # Background model loading
 async def load_model_background():
-    """Load InsightFace model in background"""
+    """Load and warm up the face models without blocking the event loop"""
     try:
-        logger.info("Loading InsightFace model in background...")
-        model_loader = ModelLoader()
-        # Run synchronous model loading in a separate thread to avoid blocking
+        logger.info("Loading face models in background...")
         import asyncio
-        await asyncio.to_thread(model_loader.load_model)
+        # Run synchronous model loading in a separate thread to avoid blocking
+        # (the first attribute access also imports and builds the FaceService)
+        if not await asyncio.to_thread(lambda: face_router.face_service.load_models()):
+            logger.warning("Model loading failed - /ready stays 503")
+            return
         logger.info("Model loaded successfully. Service is ready.")
     except Exception as e:
         logger.error(f"Failed to load model: {str(e)}")
         logger.warning("Model loading failed - service may not function properly")
 
+# Background RAG import
+async def warm_up_rag_background():
+    """Import langchain and the RAG service off the event loop so the first chat request is fast"""
+    import asyncio
+    from app.routers.rag_router import load_rag_module
+    try:
+        await asyncio.to_thread(load_rag_module)
+        logger.info("RAG modules imported")
+    except ImportError as e:
+        logger.warning(f"RAG modules unavailable: {e}")
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -180,11 +230,22 @@ async def startup_event():
     import asyncio
     # Save task to variable to prevent premature garbage collection
     _model_load_task = asyncio.create_task(load_model_background())
+    if rag_router_imported and RAG_WARMUP_ON_STARTUP:
+        _rag_warmup_task = asyncio.create_task(warm_up_rag_background())
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Face Recognition API shutting down...")
+    face_router.inference_executor.shutdown()
+    if not face_router.face_service_created():
+        return
+    pipeline_pool = getattr(face_router.face_service, "pipeline_pool", None)
+    if pipeline_pool is not None:
+        pipeline_pool.shutdown()
+    liveness_sessions = getattr(face_router.face_service, "liveness_sessions", None)
+    if liveness_sessions is not None:
+        liveness_sessions.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -6,6 +6,7 @@ Architecture adapted from https://github.com/minivision-ai/Silent-Face-Anti-Spoo
 80x80 = input spatial size, 3 output classes with index 1 = real).
 """
 
+import numpy as np
 import torch
 from torch.nn import (
     BatchNorm1d,
@@ -194,3 +195,84 @@ def load_pretrained_model(model_path: str, device_str: str) -> Module:
     model.to(device)
     model.eval()
     return model
+
+
+def export_onnx(model_path: str, onnx_path: str, opset: int = 13) -> str:
+    """
+    Export the MiniFASNetV2 checkpoint to ONNX with a dynamic batch axis.
+
+    Input is ``N x 3 x 80 x 80`` float32 in BGR [0, 255] (same as the torch
+    path); output is the raw ``N x 3`` logits — softmax is applied by the caller.
+    """
+    import inspect
+    import os
+
+    model = load_pretrained_model(model_path, "cpu")
+    dummy = torch.zeros(1, 3, 80, 80, dtype=torch.float32)
+    os.makedirs(os.path.dirname(os.path.abspath(onnx_path)), exist_ok=True)
+
+    kwargs = {}
+    # torch >= 2.5 defaults to the dynamo exporter on newer releases; the
+    # TorchScript exporter handles dynamic_axes for this small CNN reliably.
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        model,
+        dummy,
+        onnx_path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+        do_constant_folding=True,
+        **kwargs,
+    )
+    return onnx_path
+
+
+def quantize_onnx(
+    onnx_path: str,
+    quantized_path: str,
+    calibration_data: np.ndarray,
+) -> str:
+    """
+    Write a static int8 (QDQ, per-channel) copy of an exported ONNX model.
+
+    Dynamic quantization is not usable here: ORT has no CPU kernel for
+    ConvInteger and the conv activations overflow without calibration.
+    ``calibration_data`` is an N x 3 x 80 x 80 float32 array of preprocessed
+    face patches (real check-in crops): the activation ranges come from it,
+    and ranges fitted to random noise do not hold on faces.
+    """
+    import os
+    import tempfile
+
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if calibration_data is None or len(calibration_data) == 0:
+        raise ValueError("int8 quantization needs calibration face patches")
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self, data: np.ndarray):
+            self._iter = iter(data[i:i + 1] for i in range(len(data)))
+
+        def get_next(self):
+            batch = next(self._iter, None)
+            return None if batch is None else {"input": batch}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(onnx_path, prepared)
+        quantize_static(
+            prepared,
+            quantized_path,
+            _Reader(np.ascontiguousarray(calibration_data, dtype=np.float32)),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+        )
+    return quantized_path
@@ -1,9 +1,11 @@
 import logging
+from types import SimpleNamespace
 from typing import Any, Dict, List, Optional
 
 import numpy as np
 
 from app.services.model_loader import ModelLoader
+from app.utils.config import FACE_BATCHING_ENABLED, FACE_BATCH_MAX_SIZE, FACE_BATCH_WINDOW_MS
 
 logger = logging.getLogger(__name__)
 
@@ -16,16 +18,53 @@ class FaceDetector:
     non-None to confirm the model has been loaded successfully.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, load: bool = True) -> None:
+        """
+        Args:
+            load: Load the models now. With False the detector stays empty
+                (``app`` is None) until ``load()`` is called, e.g. from the
+                startup task instead of at import time.
+        """
         self._app: Optional[Any] = None
+        self._batcher: Optional[Any] = None
+        if load:
+            self.load()
+
+    def load(self) -> None:
+        """Load the InsightFace model (no-op if ModelLoader already holds it)."""
+        loader = ModelLoader()
         try:
-            loader = ModelLoader()
             self._app = loader.get_model()
             logger.info("InsightFace model loaded successfully for FaceDetector")
         except Exception as e:  # pragma: no cover - defensive logging
             self._app = None
             logger.exception("Failed to load InsightFace model in FaceDetector: %s", e)
 
+        if self._app is not None and FACE_BATCHING_ENABLED and self._batcher is None:
+            from app.services.inference_batcher import FaceAnalysisBatcher
+
+            self._batcher = FaceAnalysisBatcher(
+                self._app,
+                max_batch_size=FACE_BATCH_MAX_SIZE,
+                max_wait_ms=FACE_BATCH_WINDOW_MS,
+            )
+
+    def warm_up(self, image: np.ndarray) -> None:
+        """
+        Run every loaded network once on ``image``.
+
+        onnxruntime allocates its buffers and picks kernels on the first
+        run; doing that here keeps the cost off the first real request. A
+        synthetic frame has no face, so the recognition network is fed a
+        blank aligned crop directly.
+        """
+        if self._app is None:
+            raise RuntimeError("InsightFace model is not loaded")
+        self._app.get(image)
+        for model in getattr(self._app, "models", {}).values():
+            if getattr(model, "taskname", None) == "recognition" and hasattr(model, "get_feat"):
+                model.get_feat(np.zeros((112, 112, 3), dtype=np.uint8))
+
     @property
     def app(self) -> Optional[Any]:
         """
@@ -36,10 +75,35 @@ class FaceDetector:
 
         return self._app
 
-    def detect_single_face(self, image: np.ndarray) -> Dict[str, Any]:
+    def _detect_only(self, image: np.ndarray) -> List[Any]:
+        """
+        Faces (bbox, det_score, kps) from the app's own SCRFD session.
+
+        The same first step FaceAnalysis.get runs before the per-face models,
+        so no second detection session has to be loaded.
+        """
+        bboxes, kpss = self._app.det_model.detect(image, max_num=0, metric="default")
+        return [
+            SimpleNamespace(
+                bbox=bboxes[i, 0:4],
+                det_score=bboxes[i, 4],
+                kps=kpss[i] if kpss is not None else None,
+            )
+            for i in range(bboxes.shape[0])
+        ]
+
+    def get_batching_stats(self) -> Optional[Dict[str, Any]]:
+        """Micro-batching metrics, or None when batching is disabled."""
+        return self._batcher.get_stats() if self._batcher is not None else None
+
+    def detect_single_face(self, image: np.ndarray, with_embedding: bool = True) -> Dict[str, Any]:
         """
         Detect exactly one face in the given image.
 
+        With ``with_embedding=False`` only the loaded app's detection model
+        runs: the recognition network is skipped and ``face["embedding"]`` is
+        None. Use it wherever only the bbox and kps are needed.
+
         Returns a structured dictionary describing the detection result:
 
         - No face:
@@ -74,7 +138,12 @@ class FaceDetector:
             if self._app is None:
                 raise RuntimeError("InsightFace model is not loaded")
 
-            faces = self._app.get(image)  # type: ignore[attr-defined]
+            if not with_embedding and getattr(self._app, "det_model", None) is not None:
+                faces = self._detect_only(image)
+            elif self._batcher is not None:
+                faces = self._batcher.get(image)
+            else:
+                faces = self._app.get(image)  # type: ignore[attr-defined]
             if not faces:
                 return {
                     "success": False,
@@ -110,9 +179,11 @@ class FaceDetector:
             face = faces_list[0]
 
             # Prefer normalized embedding if available
-            embedding = getattr(face, "normed_embedding", None)
-            if embedding is None:
-                embedding = getattr(face, "embedding", None)
+            embedding = None
+            if with_embedding:
+                embedding = getattr(face, "normed_embedding", None)
+                if embedding is None:
+                    embedding = getattr(face, "embedding", None)
 
             bbox = getattr(face, "bbox", None)
             det_score = getattr(face, "det_score", None)
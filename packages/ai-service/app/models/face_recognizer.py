@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 import numpy as np
 
@@ -7,6 +7,43 @@ from app.utils.config import VERIFICATION_THRESHOLD
 
 logger = logging.getLogger(__name__)
 
+# Score = mean of the K closest references. With 4 references, requiring the
+# 2 closest to agree is much stricter than trusting just the single max, and
+# reduces false-accepts when one reference matches due to lighting/pose noise.
+TOP_K_MEAN = 2
+
+
+def _row_dots(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Dot products of matching rows of ``a`` and ``b`` (broadcast over leading axes).
+
+    Written as a stack of 1 x D @ D x 1 products: numpy runs each one with
+    the same BLAS dot kernel as ``np.dot`` on two 1-D vectors, so every value
+    is bit-identical to the per-pair ``np.dot`` loop (a GEMV or einsum sums
+    in a different order and is not).
+    """
+    return (a[..., np.newaxis, :] @ b[..., :, np.newaxis])[..., 0, 0]
+
+
+def _unit_rows(reference_arrays: Union[np.ndarray, Sequence[np.ndarray]]) -> np.ndarray:
+    """Stack references into a K x D float32 matrix of unit rows, dropping zero-norm rows."""
+    refs = np.asarray(reference_arrays, dtype=np.float32)
+    if refs.ndim == 1:
+        refs = refs[np.newaxis, :]
+    # sqrt(x . x), exactly what np.linalg.norm does for one 1-D vector
+    norms = np.sqrt(_row_dots(refs, refs))
+    valid = norms != 0
+    # Skip degenerate reference embeddings
+    return refs[valid] / norms[valid, np.newaxis]
+
+
+def _top_k_mean(similarities: np.ndarray) -> np.ndarray:
+    """Mean of the TOP_K_MEAN largest values along the last axis (float64, like np.mean on floats)."""
+    n = similarities.shape[-1]
+    k = min(TOP_K_MEAN, n)
+    top = np.partition(similarities, n - k, axis=-1)[..., n - k:]
+    return top.astype(np.float64).mean(axis=-1)
+
 
 class FaceRecognizer:
     """
@@ -47,49 +84,145 @@ class FaceRecognizer:
             if candidate_embedding is None or len(reference_arrays) == 0:
                 raise ValueError("Candidate embedding and reference arrays must be provided")
 
-            # Ensure numpy arrays
-            candidate_vec = np.asarray(candidate_embedding, dtype=np.float32)
-
-            # L2 normalise candidate
-            cand_norm = np.linalg.norm(candidate_vec)
-            if cand_norm == 0:
-                raise ValueError("Candidate embedding has zero norm")
-            candidate_vec = candidate_vec / cand_norm
-
-            similarities: List[float] = []
-            for ref in reference_arrays:
-                ref_vec = np.asarray(ref, dtype=np.float32)
-                ref_norm = np.linalg.norm(ref_vec)
-                if ref_norm == 0:
-                    # Skip degenerate reference embeddings
-                    continue
-                ref_vec = ref_vec / ref_norm
-                sim = float(np.dot(candidate_vec, ref_vec))
-                similarities.append(sim)
-
-            if not similarities:
-                raise ValueError("No valid reference embeddings to compare against")
-
-            # Use mean of top-K similarities to reduce false-accept when a single
-            # reference embedding happens to match due to lighting/pose noise.
-            # With 4 references, requiring the 2 closest to agree is much
-            # stricter than trusting just the single max.
-            similarities_sorted = sorted(similarities, reverse=True)
-            k = min(2, len(similarities_sorted))
-            score = float(np.mean(similarities_sorted[:k]))
-
-            return {
-                "match": score >= threshold,
-                "similarity": score,
-                "threshold": threshold,
-            }
+            return self._score(candidate_embedding, _unit_rows(reference_arrays), threshold)
 
         except Exception as e:
             logger.exception("Error during face verification: %s", e)
-            return {
-                "match": False,
-                "similarity": 0.0,
-                "threshold": threshold,
-                "error": str(e),
-                "error_code": "AI_SERVICE_ERROR",
-            }
+            return self._error(e, threshold)
+
+    def verify_against_normalized(
+        self,
+        candidate_embedding: np.ndarray,
+        reference_matrix: np.ndarray,
+        custom_threshold: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Same contract as ``verify_against_multiple`` but for references that
+        are already stacked into a K x D float32 matrix of unit-norm rows
+        (e.g. rows from the embedding gallery). One batched dot over the rows.
+        """
+
+        threshold = float(custom_threshold) if custom_threshold is not None else float(VERIFICATION_THRESHOLD)
+
+        try:
+            if candidate_embedding is None or reference_matrix is None or len(reference_matrix) == 0:
+                raise ValueError("Candidate embedding and reference matrix must be provided")
+
+            return self._score(candidate_embedding, reference_matrix, threshold)
+
+        except Exception as e:
+            logger.exception("Error during face verification: %s", e)
+            return self._error(e, threshold)
+
+    def verify_many(
+        self,
+        candidate_embeddings: Union[np.ndarray, Sequence[np.ndarray]],
+        references: Union[np.ndarray, Sequence[Sequence[np.ndarray]]],
+        custom_threshold: Optional[float] = None,
+        per_candidate: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Batch form of ``verify_against_multiple`` for offline-sync and bulk flows.
+
+        ``references`` is one K x D set shared by every candidate or, with
+        ``per_candidate=True``, a list with one reference set per candidate
+        (sets may differ in size, and may be empty). Returns one result dict
+        per candidate, in order, with the same scores
+        ``verify_against_multiple`` would give for each pair; on failure
+        every candidate gets the error result.
+        """
+
+        threshold = float(custom_threshold) if custom_threshold is not None else float(VERIFICATION_THRESHOLD)
+        n = 1   # error results to return if the input cannot even be counted
+
+        try:
+            n = len(candidate_embeddings)
+            if n and np.ndim(candidate_embeddings[0]) == 0:
+                n = 1   # a single 1-D embedding
+            candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+            if candidates.ndim == 1:
+                candidates = candidates[np.newaxis, :]
+            if n == 0:
+                return []
+
+            cand_norms = np.sqrt(_row_dots(candidates, candidates))
+            valid = cand_norms != 0
+            candidates = candidates / np.where(valid, cand_norms, 1.0)[:, np.newaxis]
+
+            if per_candidate:
+                if len(references) != n:
+                    raise ValueError(f"Expected {n} reference sets, got {len(references)}")
+                similarities = self._grouped_similarities(candidates, references)
+            else:
+                ref_matrix = _unit_rows(references)
+                if len(ref_matrix) == 0:
+                    raise ValueError("No valid reference embeddings to compare against")
+                similarities = _row_dots(ref_matrix[np.newaxis, :, :], candidates[:, np.newaxis, :])
+
+            # Padded (-inf) slots only matter when a candidate has < TOP_K_MEAN references
+            counts = np.isfinite(similarities).sum(axis=1)
+            scores = _top_k_mean(similarities)
+        except Exception as e:
+            logger.exception("Error during batch face verification: %s", e)
+            return [self._error(e, threshold) for _ in range(n)]
+
+        results: List[Dict[str, Any]] = []
+        for i in range(n):
+            if not valid[i]:
+                results.append(self._error(ValueError("Candidate embedding has zero norm"), threshold))
+            elif counts[i] == 0:
+                results.append(self._error(ValueError("No valid reference embeddings to compare against"), threshold))
+            else:
+                score = float(scores[i]) if counts[i] >= TOP_K_MEAN else float(
+                    np.sort(similarities[i])[::-1][:counts[i]].astype(np.float64).mean()
+                )
+                results.append({"match": score >= threshold, "similarity": score, "threshold": threshold})
+        return results
+
+    @staticmethod
+    def _grouped_similarities(candidates: np.ndarray, references: Sequence[Sequence[np.ndarray]]) -> np.ndarray:
+        """N x Kmax similarities of each candidate to its own reference set, padded with -inf."""
+        groups = [_unit_rows(refs) if len(refs) else np.empty((0, candidates.shape[1]), np.float32)
+                  for refs in references]
+        k_max = max((len(g) for g in groups), default=0)
+        padded = np.zeros((len(groups), max(k_max, 1), candidates.shape[1]), dtype=np.float32)
+        mask = np.zeros((len(groups), max(k_max, 1)), dtype=bool)
+        for i, g in enumerate(groups):
+            padded[i, :len(g)] = g
+            mask[i, :len(g)] = True
+        similarities = _row_dots(padded, candidates[:, np.newaxis, :])
+        similarities[~mask] = -np.inf
+        return similarities
+
+    @staticmethod
+    def _score(candidate_embedding: np.ndarray, reference_matrix: np.ndarray, threshold: float) -> Dict[str, Any]:
+        """Top-K mean cosine similarity of a candidate against unit-norm reference rows."""
+        candidate_vec = np.asarray(candidate_embedding, dtype=np.float32).ravel()
+
+        # L2 normalise candidate
+        cand_norm = np.linalg.norm(candidate_vec)
+        if cand_norm == 0:
+            raise ValueError("Candidate embedding has zero norm")
+        candidate_vec = candidate_vec / cand_norm
+
+        if len(reference_matrix) == 0:
+            raise ValueError("No valid reference embeddings to compare against")
+
+        similarities = _row_dots(reference_matrix, candidate_vec)
+        score = float(_top_k_mean(similarities))
+
+        return {
+            "match": score >= threshold,
+            "similarity": score,
+            "threshold": threshold,
+        }
+
+    @staticmethod
+    def _error(e: Exception, threshold: float) -> Dict[str, Any]:
+        return {
+            "match": False,
+            "similarity": 0.0,
+            "threshold": threshold,
+            "error": str(e),
+            "error_code": "AI_SERVICE_ERROR",
+        }
@@ -0,0 +1,337 @@
+"""
+Pre-fork launcher for running several uvicorn workers on one host.
+
+Started N times independently, every worker would import torch, OpenCV,
+onnxruntime and InsightFace and load MiniFASNet on its own. Here the master
+process does that once:
+
+1. bind the listening socket
+2. ``preload()``: import the app and the heavy libraries, load the torch
+   anti-spoofing weights on CPU (no inference, so no torch threads yet)
+3. ``gc.freeze()`` so the workers' garbage collector never touches, and
+   therefore never copies, the preloaded objects
+4. fork the workers; each runs uvicorn on the inherited socket
+
+The workers share the preloaded pages copy-on-write. onnxruntime sessions
+(InsightFace, MiniFASNet in onnx mode) are not fork-safe, so each worker
+still creates them itself in its startup task (``FaceService.load_models``).
+
+State that lives in one process cannot be served by several workers, so
+``run`` refuses to start (``check_worker_config``) unless:
+
+- FACE_GALLERY_ENABLED=false: the embedding gallery is per-process memory and
+  a gallery write would reach one worker only
+- liveness sessions are shared: SESSION_STORAGE_TYPE=redis (with the redis
+  package installed), or LIVENESS_SESSION_MODE=token with a
+  LIVENESS_TOKEN_SECRET (without one each worker signs with its own random
+  key)
+
+The master restarts workers that exit, stops them on SIGTERM/SIGINT and
+logs the RSS/PSS/private memory of every process ``report_after`` seconds
+after start and on SIGUSR1. PSS splits shared pages between the processes
+that map them, so the PSS total is the memory the group really uses.
+"""
+import gc
+import importlib
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Imported in the master so the workers inherit them
+# (app.main imports none of them itself, see tests/test_import_time.py)
+PRELOAD_MODULES = (
+    "numpy", "cv2", "PIL.Image", "onnxruntime", "insightface.app",
+    "app.services.face_service", "app.services.rag_service",
+)
+
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS, private and shared memory of ``pid`` in MB (Linux /proc)."""
+    values = {field: 0 for field in _SMAPS_FIELDS}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in values:
+                values[name] = int(rest.split()[0])   # kB
+    return {
+        "rss_mb": round(values["Rss"] / 1024, 1),
+        "pss_mb": round(values["Pss"] / 1024, 1),
+        "private_mb": round((values["Private_Clean"] + values["Private_Dirty"]) / 1024, 1),
+        "shared_mb": round((values["Shared_Clean"] + values["Shared_Dirty"]) / 1024, 1),
+    }
+
+
+def memory_report(master_pid: int, worker_pids: List[int]) -> Dict[str, object]:
+    """Per-process memory plus totals for the master and its workers."""
+    rows = []
+    for role, pid in [("master", master_pid)] + [("worker", pid) for pid in worker_pids]:
+        try:
+            rows.append({"role": role, "pid": pid, **process_memory(pid)})
+        except OSError:
+            continue   # exited meanwhile
+    workers = [row for row in rows if row["role"] == "worker"]
+    return {
+        "processes": rows,
+        "total_rss_mb": round(sum(row["rss_mb"] for row in rows), 1),
+        "total_pss_mb": round(sum(row["pss_mb"] for row in rows), 1),
+        # A worker started on its own would hold the shared pages privately
+        "independent_estimate_mb": round(sum(row["rss_mb"] for row in workers), 1),
+    }
+
+
+def preload() -> Dict[str, float]:
+    """Import the app and heavy libraries and load fork-safe weights; returns timings (ms)."""
+    timings: Dict[str, float] = {}
+
+    def timed(step: str, fn: Callable[[], object]) -> None:
+        started = time.perf_counter()
+        fn()
+        timings[step] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Pre-fork step '{step}' took {timings[step]:.0f} ms")
+
+    timed("app", lambda: importlib.import_module("app.main"))
+
+    def import_libraries() -> None:
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning(f"Pre-fork: cannot import {name}: {e}")
+
+    timed("libraries", import_libraries)
+
+    from app.utils.config import ANTI_SPOOFING_BACKEND
+
+    anti_spoofing = os.getenv("ANTI_SPOOFING_ENABLED", "true").lower() == "true"
+    if anti_spoofing and ANTI_SPOOFING_BACKEND.lower() == "torch":
+        def load_torch_weights() -> None:
+            from app.services.anti_spoofing_detector import preload_torch_model
+
+            try:
+                preload_torch_model()
+            except Exception as e:
+                # The workers log the same failure when they fall back to texture only
+                logger.warning(f"Pre-fork: MiniFASNet weights not preloaded: {e}")
+
+        timed("anti_spoofing_weights", load_torch_weights)
+
+    gc.collect()
+    gc.freeze()
+    return timings
+
+
+class PreforkMaster:
+    """
+    Fork ``workers`` processes that each call ``target(index)``.
+
+    Usage:
+        master = PreforkMaster(4, target=serve)
+        master.start()
+        master.supervise()     # until SIGTERM/SIGINT
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        target: Callable[[int], None],
+        report_after: Optional[float] = None,
+        stop_timeout: float = 30.0,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.target = target
+        self.report_after = report_after if report_after and report_after > 0 else None
+        self.stop_timeout = stop_timeout
+        self.pids: Dict[int, int] = {}   # pid -> worker index
+        self.restarts = 0
+        self._stopping = False
+        self._report_requested = False
+
+    def _spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                    signal.signal(signum, signal.SIG_DFL)
+                self.target(index)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.pids[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+        return pid
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def reap(self) -> List[int]:
+        """Collect exited workers and start replacements; returns the exited pids."""
+        exited = []
+        while self.pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+            exited.append(pid)
+            if not self._stopping:
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {status}; restarting")
+                self.restarts += 1
+                self._spawn(index)
+        return exited
+
+    def log_memory(self) -> Dict[str, object]:
+        report = memory_report(os.getpid(), sorted(self.pids))
+        for row in report["processes"]:
+            logger.info(
+                f"{row['role']} pid {row['pid']}: rss {row['rss_mb']} MB, pss {row['pss_mb']} MB, "
+                f"private {row['private_mb']} MB, shared {row['shared_mb']} MB"
+            )
+        logger.info(
+            f"Memory total: pss {report['total_pss_mb']} MB for {len(self.pids)} workers + master "
+            f"(independent workers: ~{report['independent_estimate_mb']} MB)"
+        )
+        return report
+
+    def stop(self) -> None:
+        """SIGTERM every worker, then SIGKILL whatever is left after stop_timeout."""
+        self._stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.stop_timeout
+        while self.pids and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.pids.pop(pid, None)
+
+    def supervise(self, poll_interval: float = 0.5) -> None:
+        """Run until SIGTERM/SIGINT, restarting workers that exit."""
+        def request_stop(signum, frame):
+            self._stopping = True
+
+        def request_report(signum, frame):
+            self._report_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGUSR1, request_report)
+
+        report_at = time.monotonic() + self.report_after if self.report_after else None
+        while not self._stopping:
+            self.reap()
+            if self._report_requested or (report_at is not None and time.monotonic() >= report_at):
+                self._report_requested = False
+                report_at = None
+                self.log_memory()
+            time.sleep(poll_interval)
+        logger.info("Stopping workers...")
+        self.stop()
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def check_worker_config(
+    workers: int,
+    *,
+    gallery_enabled: bool,
+    session_mode: str,
+    session_storage: str,
+    token_secret: str,
+) -> None:
+    """Raise if the configuration cannot be served by ``workers`` processes."""
+    if workers <= 1:
+        return
+    problems = []
+    if gallery_enabled:
+        problems.append(
+            "the embedding gallery is in process memory, so gallery writes would reach a "
+            "single worker: set FACE_GALLERY_ENABLED=false (send reference embeddings with /verify)"
+        )
+    if session_mode == "token":
+        if not token_secret:
+            problems.append(
+                "LIVENESS_SESSION_MODE=token without LIVENESS_TOKEN_SECRET: every worker would "
+                "sign with its own random key and reject the others' tokens"
+            )
+    elif session_storage != "redis":
+        problems.append(
+            f"SESSION_STORAGE_TYPE={session_storage} keeps liveness sessions in one worker: "
+            "use SESSION_STORAGE_TYPE=redis or LIVENESS_SESSION_MODE=token"
+        )
+    elif importlib.util.find_spec("redis") is None:
+        problems.append(
+            "SESSION_STORAGE_TYPE=redis but the redis package is not installed "
+            "(the store would fall back to per-worker memory)"
+        )
+    if problems:
+        raise RuntimeError(
+            f"WEB_WORKERS={workers} cannot run this configuration (or run one worker per process):\n- "
+            + "\n- ".join(problems)
+        )
+
+
+def run(workers: int, host: str, port: int, log_level: str, report_after: Optional[float] = None) -> None:
+    """Bind, preload, fork ``workers`` uvicorn servers and supervise them."""
+    import uvicorn
+
+    from app.utils.config import (
+        FACE_GALLERY_ENABLED, LIVENESS_SESSION_MODE, LIVENESS_TOKEN_SECRET, SESSION_STORAGE_TYPE,
+    )
+
+    check_worker_config(
+        workers,
+        gallery_enabled=FACE_GALLERY_ENABLED,
+        session_mode=LIVENESS_SESSION_MODE,
+        session_storage=SESSION_STORAGE_TYPE,
+        token_secret=LIVENESS_TOKEN_SECRET,
+    )
+    sock = bind_socket(host, port)
+    timings = preload()
+    logger.info(f"Pre-fork master ready in {sum(timings.values()):.0f} ms; forking {workers} workers")
+
+    from app.utils.config import FACE_PIPELINE_MODE
+
+    if FACE_PIPELINE_MODE == "process":
+        logger.warning(
+            "FACE_PIPELINE_MODE=process with WEB_WORKERS > 1: every web worker starts "
+            "its own pipeline processes"
+        )
+
+    def serve(index: int) -> None:
+        from app.main import app
+
+        config = uvicorn.Config(app, log_level=log_level.lower())
+        uvicorn.Server(config).run(sockets=[sock])
+
+    master = PreforkMaster(workers, serve, report_after=report_after)
+    master.start()
+    master.supervise()
@@ -1,19 +1,131 @@
 from app.limiter import limiter
-from fastapi import APIRouter, File, UploadFile, HTTPException, status, Form, Header, Depends, Request
+from fastapi import APIRouter, File, UploadFile, HTTPException, status, Form, Header, Depends, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from pydantic import BaseModel
+import asyncio
 import json
 import os
-from app.services.face_service import FaceService
-from app.utils.config import VERIFICATION_THRESHOLD
+import sys
+import threading
+from app.services.inference_executor import (
+    InferenceExecutor,
+    InferenceOverloaded,
+    PRIORITY_BACKGROUND,
+    PRIORITY_CRITICAL,
+    PRIORITY_STANDARD,
+)
+from app.utils.config import (
+    VERIFICATION_THRESHOLD,
+    FACE_GALLERY_ENABLED,
+    FACE_IDENTIFY_TOP_K,
+    INFERENCE_WORKERS,
+    INFERENCE_MAX_QUEUE,
+    INFERENCE_QUEUE_TIMEOUT_MS,
+    INFERENCE_RESERVED_WORKERS,
+    INFERENCE_CRITICAL_RESERVE,
+    INFERENCE_STARVATION_MS,
+    INFERENCE_DEADLINES_MS,
+)
+from app.utils.deadline import TIMEOUT_HEADER, DeadlineExceeded, deadline_scope, parse_deadlines
+from app.utils.metrics import REGISTRY
+from app.utils import embedding_codec
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/face", tags=["Face Recognition"])
 
-face_service = FaceService()
+
+
+def __getattr__(name: str):
+    # FaceService pulls in numpy, OpenCV, PIL and torch; imported on first use
+    # (still reachable as face_router.FaceService, e.g. for patching in tests)
+    if name == "FaceService":
+        from app.services.face_service import FaceService
+        return FaceService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazyFaceService:
+    """
+    Stands in for the FaceService singleton until it is first used.
+
+    Importing the router (and therefore app.main) stays cheap: the face stack
+    is imported and the service built by the startup task, or by whichever
+    request touches it first.
+    """
+
+    def __init__(self) -> None:
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = getattr(sys.modules[__name__], "FaceService")()
+        return self._instance
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+
+face_service = _LazyFaceService()
+
+
+def face_service_created() -> bool:
+    """False until the FaceService has been built (nothing to report or shut down yet)"""
+    return not isinstance(face_service, _LazyFaceService) or face_service.created
+
+
+async def _require_face_service() -> None:
+    """
+    503 + Retry-After until the startup task has built the FaceService
+
+    Endpoints touch face_service on the event loop; before it exists that
+    would import the face stack and build it right there, or block on the
+    proxy lock while startup builds it, stalling every connection.
+    """
+    if not face_service_created():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI models are still loading, please retry later",
+            headers={"Retry-After": str(MODELS_LOADING_RETRY_AFTER)}
+        )
+
+def _require_gallery() -> None:
+    """404 for the gallery endpoints when the server-side gallery is disabled"""
+    if not FACE_GALLERY_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Server-side gallery is disabled (FACE_GALLERY_ENABLED=false)"
+        )
+
+# Blocking inference runs here, never on the event loop
+inference_executor = InferenceExecutor(
+    workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_MAX_QUEUE,
+    max_wait_s=INFERENCE_QUEUE_TIMEOUT_MS / 1000.0,
+    reserved_workers=INFERENCE_RESERVED_WORKERS,
+    starvation_s=INFERENCE_STARVATION_MS / 1000.0,
+    critical_reserve=INFERENCE_CRITICAL_RESERVE,
+)
+
+_active_streams = REGISTRY.gauge("liveness_streams_active", "Open liveness WebSocket streams")
+
+# How long a liveness stream without an X-API-Key header waits for its auth message
+STREAM_AUTH_TIMEOUT_S = 5.0
+
+# Retry-After (seconds) for requests that arrive before the models are ready
+MODELS_LOADING_RETRY_AFTER = 5
+
+# Default time budget per endpoint (seconds); the X-Request-Timeout-Ms header overrides it
+DEFAULT_DEADLINES = parse_deadlines(INFERENCE_DEADLINES_MS)
 
 # Get minimum/maximum images from environment
 MIN_IMAGES = int(os.getenv("MIN_REGISTRATION_IMAGES", "4"))
@@ -57,12 +169,132 @@ async def verify_api_key(x_api_key: Optional[str] = Header(None, alias="X-API-Ke
     return True
 
 
+def request_timeout(endpoint: str):
+    """Dependency factory: the request's time budget in seconds (header, else the endpoint default)"""
+    default = DEFAULT_DEADLINES.get(endpoint)
+
+    async def _timeout(
+        x_request_timeout_ms: Optional[str] = Header(None, alias=TIMEOUT_HEADER)
+    ) -> Optional[float]:
+        if x_request_timeout_ms is None:
+            return default
+        try:
+            timeout_ms = float(x_request_timeout_ms)
+        except ValueError:
+            timeout_ms = 0.0
+        if not timeout_ms > 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{TIMEOUT_HEADER} must be a positive number of milliseconds"
+            )
+        return timeout_ms / 1000.0
+
+    return _timeout
+
+
+async def _run_inference(
+    fn, *args, priority: str = PRIORITY_STANDARD, timeout_s: Optional[float] = None, **kwargs
+):
+    """
+    Run a blocking face_service call on the inference executor
+
+    503 + Retry-After when overloaded or while the models are still loading,
+    504 once timeout_s has passed (queued work is dropped, running work stops
+    at the next pipeline stage).
+    """
+    if not face_service.models_ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI models are still loading, please retry later",
+            headers={"Retry-After": str(MODELS_LOADING_RETRY_AFTER)}
+        )
+    try:
+        with deadline_scope(timeout_s):
+            return await inference_executor.run(fn, *args, priority=priority, **kwargs)
+    except DeadlineExceeded as e:
+        logger.warning(f"Dropping inference request past its deadline (before {e.stage})")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
+    except InferenceOverloaded as e:
+        logger.warning(f"Rejecting inference request: {e.reason} (retry after {e.retry_after}s)")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service is overloaded, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _resolve_references(
+    reference_embeddings_json: Optional[str],
+    company_id: Optional[str],
+    user_id: Optional[str],
+    reference_embeddings: Optional[str] = None,
+    reference_embeddings_file: Optional[UploadFile] = None,
+    embedding_format: Optional[str] = None
+):
+    """
+    Work out where /verify gets its reference embeddings from.
+
+    In order of preference:
+    - user_id (+ company_id): the server-side gallery, returns None
+    - reference_embeddings_file: raw little-endian bytes (application/octet-stream)
+    - reference_embeddings: base64 payload in embedding_format (f32/f16)
+    - reference_embeddings_json: legacy JSON list
+    Binary payloads come back as an N x D float32 matrix.
+    """
+    if user_id:
+        if not company_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="company_id is required when verifying by user_id"
+            )
+        _require_gallery()
+        return None
+
+    try:
+        if reference_embeddings_file is not None or reference_embeddings:
+            fmt = embedding_codec.normalize_format(embedding_format or embedding_codec.FORMAT_F32)
+            if reference_embeddings_file is not None:
+                return embedding_codec.decode_binary(await reference_embeddings_file.read(), fmt)
+            return embedding_codec.decode_base64(reference_embeddings, fmt)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if not reference_embeddings_json:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either user_id/company_id or reference embeddings are required"
+        )
+
+    try:
+        parsed = embedding_codec.decode_json(reference_embeddings_json)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid JSON format for reference_embeddings"
+        )
+
+    if not parsed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reference embeddings are required"
+        )
+    return parsed
+
+
 class RegisterResponse(BaseModel):
     success: bool
     faces: Optional[List[dict]] = None
     total_images: Optional[int] = None
     valid_faces: Optional[int] = None
     errors: Optional[List[str]] = None
+    gallery: Optional[dict] = None
+    embedding_format: str = embedding_codec.FORMAT_JSON
     error: Optional[str] = None
     error_code: Optional[str] = None
     error_details: Optional[dict] = None
@@ -82,8 +314,8 @@ class VerifyResponse(BaseModel):
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    # Check if model is loaded
-    model_loaded = face_service.detector.app is not None if hasattr(face_service, 'detector') else False
+    # Check if model is loaded (never build the service from here)
+    model_loaded = face_service_created() and face_service.detector.app is not None
     
     return {
         "status": "healthy" if model_loaded else "starting",
@@ -93,7 +325,37 @@ async def health_check():
     }
 
 
-@router.post("/register", response_model=RegisterResponse, dependencies=[Depends(verify_api_key)])
+@router.get("/stats", dependencies=[Depends(verify_api_key)])
+async def inference_stats():
+    """
+    Inference scheduler statistics
+
+    Returns micro-batching state (batch size and queue wait distributions)
+    plus every metric recorded by the face pipeline so far.
+    """
+    if not face_service_created():
+        # Still starting: only the executor and the metrics exist yet
+        return {
+            "status": "starting",
+            "executor": inference_executor.get_stats(),
+            "metrics": REGISTRY.snapshot()
+        }
+    detector = getattr(face_service, 'detector', None)
+    pipeline_pool = getattr(face_service, 'pipeline_pool', None)
+    # The session count is a Redis round trip in redis mode
+    liveness_sessions = await asyncio.to_thread(face_service.liveness_sessions.get_stats)
+    return {
+        "batching": detector.get_batching_stats() if detector is not None else None,
+        "pipeline": pipeline_pool.get_stats() if pipeline_pool is not None else {"mode": "thread"},
+        "executor": inference_executor.get_stats(),
+        "gallery": face_service.gallery.get_stats(),
+        "liveness_sessions": liveness_sessions,
+        "liveness_tokens": face_service.liveness_tokens.get_stats() if face_service.liveness_tokens else None,
+        "metrics": REGISTRY.snapshot()
+    }
+
+
+@router.post("/register", response_model=RegisterResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 @limiter.limit("10/minute")
 async def register_faces(
     request: Request,
@@ -101,7 +363,11 @@ async def register_faces(
     liveness_success: Optional[str] = Form(None),
     liveness_passed: Optional[str] = Form(None),
     liveness_confidence: Optional[str] = Form(None),
-    liveness_challenge: Optional[str] = Form(None)
+    liveness_challenge: Optional[str] = Form(None),
+    company_id: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    embedding_format: str = Form(embedding_codec.FORMAT_JSON),
+    timeout_s: Optional[float] = Depends(request_timeout("register"))
 ):
     """
     Register face images for a user
@@ -109,9 +375,17 @@ async def register_faces(
     - Accepts multiple images (minimum {MIN_IMAGES}, maximum {MAX_IMAGES})
     - Each image should contain exactly one face
     - Optional liveness verification data for security
-    - Returns face embeddings for storage
+    - Optional company_id + user_id also store the embeddings in the
+      server-side gallery so /verify can be called with just user_id
+    - Returns face embeddings for storage, as float lists (embedding_format=json)
+      or base64 little-endian float32/float16 strings (f32/f16)
     """
     try:
+        try:
+            embedding_format = embedding_codec.normalize_format(embedding_format)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
         if not images or len(images) == 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,6 +404,9 @@ async def register_faces(
                 detail=f"Maximum {MAX_IMAGES} images allowed. Provided: {len(images)}"
             )
         
+        if company_id and user_id:
+            _require_gallery()
+
         # Read image bytes
         image_bytes_list = []
         for image_file in images:
@@ -150,10 +427,15 @@ async def register_faces(
                 logger.warning(f"Invalid liveness data format: {e}")
         
         # Process faces with optional liveness verification for registration
-        result = face_service.register_faces(
+        result = await _run_inference(
+            face_service.register_faces,
             image_bytes_list,
             require_liveness=REQUIRE_LIVENESS_FOR_REGISTRATION,
-            liveness_result=liveness_result
+            liveness_result=liveness_result,
+            company_id=company_id,
+            user_id=user_id,
+            priority=PRIORITY_STANDARD,
+            timeout_s=timeout_s
         )
         
         if not result['success']:
@@ -168,6 +450,11 @@ async def register_faces(
                 }
             )
         
+        if embedding_format != embedding_codec.FORMAT_JSON:
+            for face in result.get('faces') or []:
+                face['embedding'] = embedding_codec.encode_embedding(face['embedding'], embedding_format)
+            result['embedding_format'] = embedding_format
+
         return RegisterResponse(**result)
         
     except HTTPException:
@@ -180,19 +467,29 @@ async def register_faces(
         )
 
 
-@router.post("/verify", response_model=VerifyResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/verify", response_model=VerifyResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 @limiter.limit("30/minute")
 async def verify_face(
     request: Request,
     image: UploadFile = File(...),
-    reference_embeddings_json: str = Form(...),
-    threshold: Optional[float] = Form(None)
+    reference_embeddings_json: Optional[str] = Form(None),
+    threshold: Optional[float] = Form(None),
+    company_id: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    reference_embeddings: Optional[str] = Form(None),
+    reference_embeddings_file: Optional[UploadFile] = File(None),
+    embedding_format: Optional[str] = Form(None),
+    timeout_s: Optional[float] = Depends(request_timeout("verify"))
 ):
     """
     Verify if a face matches reference embeddings
     
     - Accepts one candidate image
-    - Requires reference_embeddings_json (JSON string) in form data
+    - References come from the gallery (company_id + user_id), from a binary
+      payload (reference_embeddings as base64 or reference_embeddings_file as
+      application/octet-stream, embedding_format f32/f16, default f32) or from
+      reference_embeddings_json (JSON string) in form data
+    - Returns FACE_NOT_REGISTERED when the user is not in the gallery
     - Optional threshold parameter to override default verification threshold
     - Returns match result with similarity score
     
@@ -205,36 +502,25 @@ async def verify_face(
         # Read image bytes
         image_bytes = await image.read()
         
-        # Parse reference embeddings from JSON string
-        try:
-            embeddings_data = json.loads(reference_embeddings_json)
-            if isinstance(embeddings_data, dict):
-                reference_embeddings = embeddings_data.get('reference_embeddings', [])
-            elif isinstance(embeddings_data, list):
-                reference_embeddings = embeddings_data
-            else:
-                reference_embeddings = []
-        except json.JSONDecodeError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid JSON format for reference_embeddings"
-            )
-        
-        if not reference_embeddings:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Reference embeddings are required"
-            )
+        reference_embeddings = await _resolve_references(
+            reference_embeddings_json, company_id, user_id,
+            reference_embeddings, reference_embeddings_file, embedding_format
+        )
         
         # Use provided threshold or fall back to config default
         verification_threshold = threshold if threshold is not None else VERIFICATION_THRESHOLD
         
         # Verify face
-        result = face_service.verify_face(
+        result = await _run_inference(
+            face_service.verify_face,
             image_bytes,
             reference_embeddings,
             custom_threshold=verification_threshold,
-            enable_anti_spoofing=face_service._anti_spoofing_enabled
+            enable_anti_spoofing=face_service._anti_spoofing_enabled,
+            company_id=company_id,
+            user_id=user_id,
+            priority=PRIORITY_CRITICAL,
+            timeout_s=timeout_s
         )
         
         if 'error' in result:
@@ -261,6 +547,127 @@ async def verify_face(
         )
 
 
+class IdentifyResponse(BaseModel):
+    match: bool
+    user_id: Optional[str] = None
+    similarity: float = 0.0
+    threshold: Optional[float] = None
+    candidates: Optional[List[dict]] = None
+    anti_spoofing: Optional[dict] = None
+    face_detection: Optional[dict] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+    error_details: Optional[dict] = None
+
+
+@router.post("/identify", response_model=IdentifyResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service), Depends(_require_gallery)])
+@limiter.limit("60/minute")
+async def identify_face(
+    request: Request,
+    image: UploadFile = File(...),
+    company_id: str = Form(...),
+    top_k: Optional[int] = Form(None),
+    threshold: Optional[float] = Form(None),
+    timeout_s: Optional[float] = Depends(request_timeout("identify"))
+):
+    """
+    Identify a face among all users enrolled in a company's gallery (1:N)
+    
+    - Used by check-in kiosks that do not know the user in advance
+    - Returns the best candidates with similarity scores, best first
+    - match/user_id are set when the best candidate reaches the threshold
+    """
+    try:
+        image_bytes = await image.read()
+        k = top_k if top_k is not None else FACE_IDENTIFY_TOP_K
+        if k < 1 or k > 50:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="top_k must be between 1 and 50"
+            )
+
+        result = await _run_inference(
+            face_service.identify_face,
+            image_bytes,
+            company_id,
+            top_k=k,
+            custom_threshold=threshold if threshold is not None else VERIFICATION_THRESHOLD,
+            enable_anti_spoofing=face_service._anti_spoofing_enabled,
+            priority=PRIORITY_CRITICAL,
+            timeout_s=timeout_s
+        )
+
+        if 'error' in result:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    'match': False,
+                    'error': result.get('error', 'Identification failed'),
+                    'error_code': result.get('error_code', 'AI_SERVICE_ERROR'),
+                    'error_details': result.get('error_details', {}),
+                    'anti_spoofing': result.get('anti_spoofing')
+                }
+            )
+
+        return IdentifyResponse(**result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in identify_face endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
+# =========================================================================
+# Embedding Gallery Endpoints
+# =========================================================================
+
+class GalleryUpsertRequest(BaseModel):
+    embeddings: List[List[float]]
+
+
+class GalleryResponse(BaseModel):
+    success: bool
+    company_id: str
+    user_id: Optional[str] = None
+    embeddings: Optional[int] = None
+    removed: Optional[int] = None
+
+
+@router.put("/gallery/{company_id}/{user_id}", response_model=GalleryResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service), Depends(_require_gallery)])
+async def upsert_gallery_user(company_id: str, user_id: str, body: GalleryUpsertRequest):
+    """
+    Store (or replace) a user's reference embeddings in the server-side gallery
+    """
+    try:
+        stored = face_service.gallery.upsert(company_id, user_id, body.embeddings)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return GalleryResponse(success=True, company_id=company_id, user_id=user_id, embeddings=stored)
+
+
+@router.delete("/gallery/{company_id}/{user_id}", response_model=GalleryResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service), Depends(_require_gallery)])
+async def delete_gallery_user(company_id: str, user_id: str):
+    """
+    Remove a user's reference embeddings (face deleted / consent withdrawn)
+    """
+    if not face_service.gallery.delete(company_id, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found in gallery")
+    return GalleryResponse(success=True, company_id=company_id, user_id=user_id)
+
+
+@router.delete("/gallery/{company_id}", response_model=GalleryResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service), Depends(_require_gallery)])
+async def delete_gallery_company(company_id: str):
+    """
+    Remove every reference embedding of a company
+    """
+    removed = face_service.gallery.delete_company(company_id)
+    return GalleryResponse(success=True, company_id=company_id, removed=removed)
+
+
 # =========================================================================
 # Liveness Detection Endpoints
 # =========================================================================
@@ -270,6 +677,7 @@ class LivenessChallengeResponse(BaseModel):
     session_id: str
     challenge: dict
     pose: Optional[dict] = None
+    token: Optional[str] = None
 
 
 class LivenessBaselineResponse(BaseModel):
@@ -277,6 +685,7 @@ class LivenessBaselineResponse(BaseModel):
     challenge: Optional[dict] = None
     baseline_pose: Optional[dict] = None
     instruction: Optional[str] = None
+    token: Optional[str] = None
     error: Optional[str] = None
 
 
@@ -290,7 +699,7 @@ class LivenessVerifyResponse(BaseModel):
     error_message: Optional[str] = None
 
 
-@router.post("/liveness/session", response_model=LivenessChallengeResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/liveness/session", response_model=LivenessChallengeResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 async def create_liveness_session():
     """
     Create a new liveness verification session with a random challenge
@@ -298,7 +707,8 @@ async def create_liveness_session():
     try:
         import uuid
         session_id = str(uuid.uuid4())[:8]
-        result = face_service.create_liveness_session(session_id)
+        # Blocking store call (Redis in multi-worker deployments): keep it off the loop
+        result = await asyncio.to_thread(face_service.create_liveness_session, session_id)
         # Include session_id in the response
         result['session_id'] = session_id
         return LivenessChallengeResponse(**result)
@@ -310,18 +720,28 @@ async def create_liveness_session():
         )
 
 
-@router.post("/liveness/baseline/{session_id}", response_model=LivenessBaselineResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/liveness/baseline/{session_id}", response_model=LivenessBaselineResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 async def capture_liveness_baseline(
     session_id: str,
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    liveness_token: Optional[str] = Form(None),
+    timeout_s: Optional[float] = Depends(request_timeout("liveness"))
 ):
     """
     Capture baseline pose for liveness challenge
+
+    In token mode send the session token as liveness_token; the response
+    carries the next token (with the baseline pose) for the verify call.
     """
     try:
         image_bytes = await image.read()
-        result = face_service.capture_liveness_baseline(session_id, image_bytes)
+        result = await _run_inference(
+            face_service.capture_liveness_baseline, session_id, image_bytes, liveness_token,
+            priority=PRIORITY_CRITICAL, timeout_s=timeout_s
+        )
         return LivenessBaselineResponse(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error capturing liveness baseline: {str(e)}")
         raise HTTPException(
@@ -330,18 +750,27 @@ async def capture_liveness_baseline(
         )
 
 
-@router.post("/liveness/verify/{session_id}", response_model=LivenessVerifyResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/liveness/verify/{session_id}", response_model=LivenessVerifyResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 async def verify_liveness_challenge(
     session_id: str,
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    liveness_token: Optional[str] = Form(None),
+    timeout_s: Optional[float] = Depends(request_timeout("liveness"))
 ):
     """
     Verify liveness challenge response
+
+    In token mode send the baseline token as liveness_token (single use).
     """
     try:
         image_bytes = await image.read()
-        result = face_service.verify_liveness_response(session_id, image_bytes)
+        result = await _run_inference(
+            face_service.verify_liveness_response, session_id, image_bytes, liveness_token,
+            priority=PRIORITY_CRITICAL, timeout_s=timeout_s
+        )
         return LivenessVerifyResponse(**result)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error verifying liveness: {str(e)}")
         raise HTTPException(
@@ -350,6 +779,141 @@ async def verify_liveness_challenge(
         )
 
 
+async def _receive_stream_auth(websocket: WebSocket) -> dict:
+    """First message of a stream without an X-API-Key header: {"type": "auth", ...}"""
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), STREAM_AUTH_TIMEOUT_S)
+    except (asyncio.TimeoutError, KeyError, TypeError, ValueError):
+        # Timed out, binary frame or invalid JSON before authenticating
+        message = None
+    if not isinstance(message, dict) or message.get("type") != "auth":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key required")
+    return message
+
+
+@router.websocket("/liveness/stream/{session_id}")
+async def stream_liveness(websocket: WebSocket, session_id: str):
+    """
+    Complete a liveness challenge over one WebSocket connection
+
+    Replaces the baseline + verify uploads. The API key is sent in the
+    X-API-Key header or, where the client cannot set headers (browsers), in
+    a first text message; never in the URL, which ends up in access logs.
+
+    Protocol:
+    - client (without X-API-Key header): {"type": "auth", "api_key": "...", "token": "..."}
+      (token: the session token, token mode only)
+    - server: {"type": "ready", "challenge": {...}, "frame_stride": N, "remaining_ms": ...}
+    - client: binary JPEG/PNG/WEBP frames (low resolution, e.g. 320x240)
+    - server: {"type": "baseline" | "progress", "pose": {...}, ...} per analysed frame
+    - server: {"type": "verdict", "passed": ..., ...} as soon as the challenge is
+      satisfied or its time is up, then closes. The client may send the text
+      message "end" to get the verdict early.
+    """
+    await websocket.accept()
+    token = websocket.query_params.get("token")
+    try:
+        api_key = websocket.headers.get("x-api-key")
+        if api_key is None:
+            auth = await _receive_stream_auth(websocket)
+            api_key = auth.get("api_key")
+            token = auth.get("token") or token
+        await verify_api_key(api_key)
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "error": e.detail, "error_code": "UNAUTHORIZED"})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if not face_service_created() or not face_service.models_ready:
+        await websocket.send_json({
+            "type": "error",
+            "error": "AI models are still loading, please retry later",
+            "error_code": "MODELS_LOADING",
+        })
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    tracker, error = await asyncio.to_thread(face_service.open_liveness_stream, session_id, token)
+    if error:
+        await websocket.send_json({"type": "error", **error})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.send_json({
+        "type": "ready",
+        "challenge": tracker.session.challenge_data,
+        "frame_stride": tracker.frame_stride,
+        "remaining_ms": round(tracker.remaining() * 1000),
+    })
+
+    async def analyse(frame: bytes) -> dict:
+        # Detection must finish within the challenge time; a frame still
+        # queued after that is dropped by the executor
+        with deadline_scope(tracker.remaining()):
+            return await inference_executor.run(
+                face_service.detect_stream_frame, frame, priority=PRIORITY_CRITICAL
+            )
+
+    receiving = asyncio.ensure_future(websocket.receive())
+    pending: Optional[asyncio.Task] = None
+    _active_streams.inc()
+    try:
+        while tracker.verdict is None:
+            waiting = {receiving} if pending is None else {receiving, pending}
+            done, _ = await asyncio.wait(
+                waiting, timeout=tracker.remaining(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+
+            if pending is not None and pending in done:
+                task, pending = pending, None
+                try:
+                    detection = task.result()
+                except (DeadlineExceeded, InferenceOverloaded) as e:
+                    # Frame dropped; the next one is only a few ms away
+                    logger.debug(f"Liveness stream frame dropped: {e}")
+                    continue
+                if detection['success']:
+                    event = tracker.update(detection['landmarks'])
+                else:
+                    event = tracker.no_face()
+                    event['error_code'] = detection.get('error_code')
+                if tracker.verdict is None:
+                    await websocket.send_json(event)
+
+            if receiving in done:
+                message = receiving.result()
+                if message["type"] == "websocket.disconnect":
+                    return
+                receiving = asyncio.ensure_future(websocket.receive())
+                frame = message.get("bytes")
+                if frame is None:
+                    if (message.get("text") or "").strip() == "end":
+                        break
+                    continue
+                if tracker.accept_frame(busy=pending is not None):
+                    pending = asyncio.ensure_future(analyse(frame))
+
+        await websocket.send_json(tracker.verdict or tracker.timed_out())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in liveness stream: {str(e)}")
+        try:
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        except RuntimeError:
+            pass  # already closed
+    finally:
+        _active_streams.dec()
+        receiving.cancel()
+        if pending is not None:
+            pending.cancel()
+
+
 @router.get("/liveness/instruction/{challenge_type}")
 async def get_liveness_instruction(challenge_type: str):
     """
@@ -392,12 +956,13 @@ class AntiSpoofingStatusResponse(BaseModel):
     sfas_info: Optional[dict] = None
 
 
-@router.post("/anti-spoofing/check", response_model=AntiSpoofingResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/anti-spoofing/check", response_model=AntiSpoofingResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 @limiter.limit("20/minute")
 async def check_anti_spoofing(
     request: Request,
     image: UploadFile = File(...),
-    method: str = Form("hybrid")
+    method: str = Form("hybrid"),
+    timeout_s: Optional[float] = Depends(request_timeout("anti_spoofing"))
 ):
     """
     Check if a face image is real or spoofed (without verification)
@@ -423,7 +988,10 @@ async def check_anti_spoofing(
                 detail=f"Invalid method. Must be one of: {valid_methods}"
             )
         
-        result = face_service.check_anti_spoofing_only(image_bytes, method)
+        result = await _run_inference(
+            face_service.check_anti_spoofing_only, image_bytes, method,
+            priority=PRIORITY_BACKGROUND, timeout_s=timeout_s
+        )
         
         if result.get('error_code'):
             return JSONResponse(
@@ -443,7 +1011,7 @@ async def check_anti_spoofing(
         )
 
 
-@router.get("/anti-spoofing/status", response_model=AntiSpoofingStatusResponse)
+@router.get("/anti-spoofing/status", response_model=AntiSpoofingStatusResponse, dependencies=[Depends(_require_face_service)])
 async def get_anti_spoofing_status():
     """
     Get anti-spoofing system status
@@ -454,13 +1022,19 @@ async def get_anti_spoofing_status():
     return AntiSpoofingStatusResponse(**face_service.get_anti_spoofing_status())
 
 
-@router.post("/verify-with-anti-spoofing", response_model=VerifyResponse, dependencies=[Depends(verify_api_key)])
+@router.post("/verify-with-anti-spoofing", response_model=VerifyResponse, dependencies=[Depends(verify_api_key), Depends(_require_face_service)])
 async def verify_face_with_anti_spoofing(
     image: UploadFile = File(...),
-    reference_embeddings_json: str = Form(...),
+    reference_embeddings_json: Optional[str] = Form(None),
     threshold: Optional[float] = Form(None),
     enable_anti_spoofing: bool = Form(True),
-    anti_spoofing_method: str = Form("hybrid")
+    anti_spoofing_method: str = Form("hybrid"),
+    company_id: Optional[str] = Form(None),
+    user_id: Optional[str] = Form(None),
+    reference_embeddings: Optional[str] = Form(None),
+    reference_embeddings_file: Optional[UploadFile] = File(None),
+    embedding_format: Optional[str] = Form(None),
+    timeout_s: Optional[float] = Depends(request_timeout("verify"))
 ):
     """
     Verify face with explicit anti-spoofing control
@@ -472,36 +1046,25 @@ async def verify_face_with_anti_spoofing(
     try:
         image_bytes = await image.read()
         
-        # Parse reference embeddings
-        try:
-            embeddings_data = json.loads(reference_embeddings_json)
-            if isinstance(embeddings_data, dict):
-                reference_embeddings = embeddings_data.get('reference_embeddings', [])
-            elif isinstance(embeddings_data, list):
-                reference_embeddings = embeddings_data
-            else:
-                reference_embeddings = []
-        except json.JSONDecodeError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid JSON format for reference_embeddings"
-            )
-        
-        if not reference_embeddings:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Reference embeddings are required"
-            )
+        reference_embeddings = await _resolve_references(
+            reference_embeddings_json, company_id, user_id,
+            reference_embeddings, reference_embeddings_file, embedding_format
+        )
         
         verification_threshold = threshold if threshold is not None else VERIFICATION_THRESHOLD
         
         # Verify face with anti-spoofing
-        result = face_service.verify_face(
+        result = await _run_inference(
+            face_service.verify_face,
             image_bytes,
             reference_embeddings,
             custom_threshold=verification_threshold,
             enable_anti_spoofing=enable_anti_spoofing,
-            anti_spoofing_method=anti_spoofing_method
+            anti_spoofing_method=anti_spoofing_method,
+            company_id=company_id,
+            user_id=user_id,
+            priority=PRIORITY_CRITICAL,
+            timeout_s=timeout_s
         )
         
         if 'error' in result:
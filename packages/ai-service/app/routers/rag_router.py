@@ -2,14 +2,17 @@
 from app.limiter import limiter
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Literal
+from typing import List, Optional, Dict, Any, Literal, TYPE_CHECKING
 from datetime import datetime, timezone
 import logging
 
-from app.services.rag_service import RAGService
 from app.utils.auth import get_current_user, UserPrincipal
 from app.utils.config import RAG_COLLECTION_NAME
 
+if TYPE_CHECKING:
+    # langchain + Google GenAI take ~2 s to import; loaded on first use instead
+    from app.services.rag_service import RAGService
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -58,13 +61,23 @@ class ConversationListResponse(BaseModel):
     conversations: List[Dict[str, Any]]
 
 # Singleton instance for RAGService (avoids re-initialization per request)
-_rag_service_instance: RAGService = None
+_rag_service_instance: Optional["RAGService"] = None
+
+def load_rag_module():
+    """Import the RAG stack (langchain, vector store clients); returns the RAGService class"""
+    from app.services.rag_service import RAGService
+    return RAGService
 
-def get_rag_service() -> RAGService:
+def get_rag_service() -> "RAGService":
     """Dependency to get RAGService singleton instance"""
     global _rag_service_instance
     if _rag_service_instance is None:
-        _rag_service_instance = RAGService()
+        try:
+            rag_service_class = load_rag_module()
+        except ImportError as e:
+            logger.error(f"RAG dependencies are not installed: {e}")
+            raise HTTPException(status_code=503, detail=f"RAG service is unavailable: {e}")
+        _rag_service_instance = rag_service_class()
     return _rag_service_instance
 
 @router.post("/chat", response_model=ConversationResponse)
@@ -74,7 +87,7 @@ async def chat_with_rag(
     body: ConversationRequest,
     background_tasks: BackgroundTasks,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Process a chat message using RAG (Retrieval-Augmented Generation)
@@ -122,7 +135,7 @@ async def chat_with_rag(
 async def ingest_documents(
     request: DataIngestionRequest,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Ingest documents into the vector database for RAG
@@ -173,7 +186,7 @@ async def ingest_documents(
 async def ingest_regulation(
     request: RegulationIngestRequest,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Ingest a single company regulation document into the vector store.
@@ -250,7 +263,7 @@ async def ingest_regulation(
 async def delete_regulation_vectors(
     regulation_id: str,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Delete all vector chunks associated with a regulation document.
@@ -303,7 +316,7 @@ async def get_user_conversations(
     page: int = 1,
     limit: int = 10,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Get authenticated user's conversation history
@@ -328,7 +341,7 @@ async def get_user_conversations(
 async def get_conversation(
     conversation_id: str,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Get specific conversation details
@@ -351,7 +364,7 @@ async def get_conversation(
 async def delete_conversation(
     conversation_id: str,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Delete a conversation
@@ -376,7 +389,7 @@ async def search_documents(
     collection_name: str = RAG_COLLECTION_NAME,
     limit: int = 5,
     current_user: UserPrincipal = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     """
     Search documents using vector similarity
@@ -415,7 +428,7 @@ async def search_documents(
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 @router.get("/health")
-async def rag_health_check(rag_service: RAGService = Depends(get_rag_service)):
+async def rag_health_check(rag_service: "RAGService" = Depends(get_rag_service)):
     """Health check for RAG service"""
     try:
         health_status = await rag_service.health_check()
@@ -0,0 +1,200 @@
+"""
+IVF-PQ approximate nearest-neighbour index in plain numpy.
+
+Used by the embedding gallery for 1:N identification in large tenants,
+where an exact scan over every enrolled embedding gets too slow for a kiosk.
+
+- IVF: a k-means coarse quantizer splits the vectors into ``nlist`` cells;
+  a query only scans the ``nprobe`` cells closest to it.
+- PQ: the residual (vector - cell centroid) is split into ``m`` sub-vectors,
+  each encoded as one byte (256 sub-centroids). For inner-product search the
+  score decomposes into ``q·centroid + sum_j LUT[j, code_j]``, so one lookup
+  table per query serves every probed cell.
+- The top ``rerank`` approximate hits are re-scored exactly against the
+  original float32 rows, so returned similarities are exact.
+"""
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means (L2) returning k x D float32 centroids."""
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        # Per-cluster sums via one sort + reduceat (np.add.at is unbuffered and slow)
+        order = np.argsort(assign, kind="stable")
+        occupied = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[occupied])[:-1]))
+        centroids = centroids.copy()
+        centroids[occupied] = np.add.reduceat(data[order], starts, axis=0) / counts[occupied, np.newaxis]
+        empty = counts == 0
+        # Re-seed empty cells with random points so every cell stays usable
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+    """Index of the closest centroid (L2) per row, chunked to bound memory."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk):
+        block = data[start:start + chunk]
+        # argmin ||x - c||^2 == argmax (x·c - ||c||^2 / 2)
+        out[start:start + chunk] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return out
+
+
+class IVFPQIndex:
+    """
+    Inner-product IVF-PQ index over unit-norm float32 vectors.
+
+    Usage:
+        index = IVFPQIndex(dim=512)
+        index.build(matrix)                     # N x 512, unit rows
+        scores, ids = index.search(query, k=5)  # exact scores of the top-k rows
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: Optional[int] = None,
+        m: int = 32,
+        nprobe: int = 16,
+        rerank: int = 256,
+        train_size: int = 20000,
+        iterations: int = 12,
+        seed: int = 0,
+    ) -> None:
+        if dim % m != 0:
+            raise ValueError(f"dim ({dim}) must be divisible by m ({m})")
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.dsub = dim // m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.train_size = train_size
+        self.iterations = iterations
+        self._rng = np.random.default_rng(seed)
+
+        self.coarse: Optional[np.ndarray] = None      # nlist x D
+        self.codebooks: Optional[np.ndarray] = None   # m x 256 x dsub
+        self.trained_size = 0                         # vectors the quantizers were trained on
+        self._vectors: Optional[np.ndarray] = None    # N x D, for exact re-ranking
+        self._list_ids: list = []                     # per cell: row ids (int64)
+        self._list_codes: list = []                   # per cell: n x m uint8 codes
+
+    @property
+    def size(self) -> int:
+        return 0 if self._vectors is None else len(self._vectors)
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        """The indexed float32 rows (kept for exact re-ranking)."""
+        return self._vectors
+
+    def build(self, vectors: np.ndarray, trained: Optional["IVFPQIndex"] = None) -> "IVFPQIndex":
+        """
+        Index ``vectors``. With ``trained`` (an index over similar data) its
+        coarse centroids and PQ codebooks are reused and the vectors are only
+        encoded, skipping the k-means training that dominates the build time.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot build an index over zero vectors")
+
+        if trained is not None:
+            if trained.dim != self.dim or trained.m != self.m:
+                raise ValueError("Trained index has a different dimension or sub-vector count")
+            self.coarse, self.codebooks = trained.coarse, trained.codebooks
+            self.nlist, self.trained_size = trained.nlist, trained.trained_size
+        else:
+            self._train(vectors)
+
+        assign = _nearest(vectors, self.coarse)
+        codes = self._encode(vectors - self.coarse[assign])
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self._list_ids = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+        self._list_codes = [codes[ids] for ids in self._list_ids]
+        self._vectors = vectors
+
+        logger.info(
+            "IVF-PQ index built: %d vectors, nlist=%d, m=%d%s",
+            n, self.nlist, self.m, " (reused quantizers)" if trained is not None else "",
+        )
+        return self
+
+    def _train(self, vectors: np.ndarray) -> None:
+        n = len(vectors)
+        nlist = self.nlist or max(1, min(4096, int(np.sqrt(n))))
+
+        sample = vectors
+        if n > self.train_size:
+            sample = vectors[self._rng.choice(n, size=self.train_size, replace=False)]
+
+        self.coarse = _kmeans(sample, nlist, self.iterations, self._rng)
+        self.nlist = len(self.coarse)
+
+        residuals = sample - self.coarse[_nearest(sample, self.coarse)]
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(residuals[:, j * self.dsub:(j + 1) * self.dsub]),
+                    256, self.iterations, self._rng)
+            for j in range(self.m)
+        ])
+        self.trained_size = n
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(residuals[:, j * self.dsub:(j + 1) * self.dsub])
+            codes[:, j] = _nearest(sub, self.codebooks[j])
+        return codes
+
+    def search(self, query: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, row ids) by inner product, best first."""
+        if self.coarse is None:
+            raise RuntimeError("Index has not been built")
+        q = np.asarray(query, dtype=np.float32).ravel()
+
+        coarse_scores = self.coarse @ q
+        nprobe = min(self.nprobe, self.nlist)
+        probes = np.argpartition(-coarse_scores, nprobe - 1)[:nprobe]
+
+        # m x 256 table of q_j · codebook_j[c]
+        lut = np.einsum("jd,jcd->jc", q.reshape(self.m, self.dsub), self.codebooks)
+        cols = np.arange(self.m)
+
+        ids_parts, score_parts = [], []
+        for cell in probes:
+            ids = self._list_ids[cell]
+            if len(ids) == 0:
+                continue
+            codes = self._list_codes[cell]
+            score_parts.append(coarse_scores[cell] + lut[cols, codes].sum(axis=1))
+            ids_parts.append(ids)
+        if not ids_parts:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        ids = np.concatenate(ids_parts)
+        approx = np.concatenate(score_parts)
+
+        shortlist = min(len(ids), max(self.rerank, k))
+        if shortlist < len(ids):
+            keep = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            ids = ids[keep]
+
+        exact = self._vectors[ids] @ q
+        k = min(k, len(ids))
+        top = np.argpartition(-exact, k - 1)[:k]
+        top = top[np.argsort(-exact[top])]
+        return exact[top], ids[top]
@@ -0,0 +1,164 @@
+"""
+Cascaded scheduler for the hybrid anti-spoofing method.
+
+The hybrid decision is fail-closed: the face is real only if every available
+stage says it is real. The first stage that rejects therefore already decides
+the outcome, so the cascade runs stages in a configurable order (cheap
+texture analysis first by default) and skips the rest once one rejects.
+
+Per-stage counters record how often each stage ran, rejected or was skipped,
+which shows how much SFAS compute the early exit saves. Later stages are also
+not started once the request deadline has passed.
+"""
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.utils.deadline import check_deadline
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STAGE_TEXTURE = "texture"
+STAGE_SFAS = "sfas"
+CASCADE_STAGES = (STAGE_TEXTURE, STAGE_SFAS)
+
+_stage_runs = REGISTRY.counter(
+    "anti_spoofing_stage_runs_total",
+    "Anti-spoofing cascade stage executions",
+)
+_stage_rejects = REGISTRY.counter(
+    "anti_spoofing_stage_rejects_total",
+    "Anti-spoofing cascade stages that rejected the face",
+)
+_stage_skipped = REGISTRY.counter(
+    "anti_spoofing_stage_skipped_total",
+    "Anti-spoofing cascade stages skipped because an earlier stage rejected",
+)
+_stage_seconds = REGISTRY.histogram(
+    "anti_spoofing_stage_seconds",
+    "Time spent in one anti-spoofing cascade stage",
+)
+
+Stage = Callable[[], Optional[Dict[str, Any]]]
+
+
+def parse_order(value: str) -> List[str]:
+    """Parse a comma-separated stage order, e.g. "texture,sfas"."""
+    order = [s.strip().lower() for s in (value or "").split(",") if s.strip()]
+    unknown = [s for s in order if s not in CASCADE_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown anti-spoofing stage(s) {unknown}. Must be from: {list(CASCADE_STAGES)}")
+    # Every stage runs exactly once; stages missing from the order go last
+    seen: List[str] = []
+    for stage in order + list(CASCADE_STAGES):
+        if stage not in seen:
+            seen.append(stage)
+    return seen
+
+
+class AntiSpoofingCascade:
+    """
+    Runs the hybrid stages in order with fail-closed early exit.
+
+    Usage:
+        cascade = AntiSpoofingCascade(order=["texture", "sfas"])
+        result = cascade.run({"texture": lambda: ..., "sfas": lambda: ...})
+
+    A stage callable is passed only when that detector is available; the
+    result format matches the previous sequential hybrid implementation.
+    """
+
+    def __init__(self, order: Sequence[str] = CASCADE_STAGES, early_exit: bool = True) -> None:
+        self.order = parse_order(",".join(order))
+        self.early_exit = early_exit
+
+    def run(self, stages: Dict[str, Stage]) -> Dict[str, Any]:
+        available = [name for name in self.order if stages.get(name) is not None]
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        rejected_by: Optional[str] = None
+
+        for position, name in enumerate(available):
+            if position:
+                check_deadline(name)
+            started = time.perf_counter()
+            result = stages[name]()
+            _stage_seconds.observe(time.perf_counter() - started, {"stage": name})
+            _stage_runs.inc(labels={"stage": name})
+            results[name] = result
+
+            if result is not None and not result.get('is_real', True):
+                _stage_rejects.inc(labels={"stage": name})
+                if rejected_by is None:
+                    rejected_by = name
+                if self.early_exit:
+                    for skipped in available[position + 1:]:
+                        _stage_skipped.inc(labels={"stage": skipped})
+                    break
+
+        sfas_result = results.get(STAGE_SFAS)
+        texture_result = results.get(STAGE_TEXTURE)
+
+        skipped_stages = [name for name in available if name not in results]
+        if skipped_stages:
+            # Early exit: the rejecting stage decides (fail-closed)
+            decisive = results[rejected_by]
+            return {
+                'is_real': False,
+                'confidence': decisive.get('confidence', 0.0),
+                'attack_type': decisive.get('attack_type', 'unknown'),
+                'method': 'SFAS+Texture',
+                'decided_by': rejected_by,
+                'skipped_stages': skipped_stages,
+                'sfas': sfas_result,
+                'texture': texture_result,
+            }
+
+        if not (sfas_result and texture_result):
+            # Single detector available: its verdict is returned unchanged
+            if sfas_result:
+                return sfas_result
+            if texture_result:
+                return texture_result
+            return {'is_real': True, 'confidence': 0.0, 'error': 'No anti-spoofing method available'}
+
+        # Both stages ran. Fail-closed: if EITHER detector flags the face as
+        # fake, reject it; SFAS names the attack type when it rejects.
+        sfas_real = sfas_result.get('is_real', True)
+        texture_real = texture_result.get('is_real', True)
+        if not sfas_real:
+            attack_type = sfas_result.get('attack_type', 'unknown')
+        elif not texture_real:
+            attack_type = texture_result.get('attack_type', 'unknown')
+        else:
+            attack_type = 'none'
+        return {
+            'is_real': sfas_real and texture_real,
+            'confidence': min(
+                sfas_result.get('confidence', 0.0),
+                texture_result.get('confidence', 0.0),
+            ),
+            'attack_type': attack_type,
+            'method': 'SFAS+Texture',
+            'sfas': sfas_result,
+            'texture': texture_result,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-stage run/reject/skip counts and hit rates since start-up."""
+        stats: Dict[str, Any] = {'order': list(self.order), 'early_exit': self.early_exit, 'stages': {}}
+        for name in self.order:
+            labels = {"stage": name}
+            runs = _stage_runs.value(labels)
+            rejects = _stage_rejects.value(labels)
+            skipped = _stage_skipped.value(labels)
+            stats['stages'][name] = {
+                'runs': int(runs),
+                'rejects': int(rejects),
+                'skipped': int(skipped),
+                # Share of runs where this stage rejected the face
+                'reject_rate': round(rejects / runs, 4) if runs else 0.0,
+                # Share of hybrid checks where this stage was not needed
+                'skip_rate': round(skipped / (runs + skipped), 4) if runs + skipped else 0.0,
+            }
+        return stats
@@ -5,21 +5,127 @@ Uses the real MiniFASNetV2 checkpoint from minivision-ai Silent-Face-Anti-Spoofi
 Checkpoint name encodes the crop-scale and input size, e.g. ``2.7_80x80_MiniFASNetV2.pth``:
 the face bbox is expanded by 2.7x (keeping context around the face) and resized to 80x80
 before inference. The model outputs 3 classes — index 1 = real, 0 and 2 = fake variants.
+
+Two inference backends are available (``ANTI_SPOOFING_BACKEND``):
+- ``torch``: loads the ``.pth`` checkpoint with PyTorch (default).
+- ``onnx``: runs an exported ``.onnx`` graph on onnxruntime (optionally the
+  static int8 variant). torch is never imported in this mode — export the
+  model once with ``scripts/export_anti_spoofing_onnx.py``.
 """
 
 import os
 import logging
 import numpy as np
 import cv2
-import torch
-import torch.nn.functional as F
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 from pathlib import Path
 
-from app.models.anti_spoofing_model import load_pretrained_model
+from app.utils.config import (
+    ANTI_SPOOFING_BACKEND,
+    ANTI_SPOOFING_ONNX_PATH,
+    ANTI_SPOOFING_ONNX_QUANTIZED,
+    ANTI_SPOOFING_BATCHING_ENABLED,
+    ANTI_SPOOFING_BATCH_MAX_SIZE,
+    ANTI_SPOOFING_BATCH_WINDOW_MS,
+)
 
 logger = logging.getLogger(__name__)
 
+VALID_BACKENDS = ("torch", "onnx")
+
+
+# Checkpoint path -> MiniFASNet torch module loaded by preload_torch_model()
+_PRELOADED_TORCH_MODELS: Dict[str, Any] = {}
+
+
+def default_model_path() -> str:
+    return os.environ.get(
+        "ANTI_SPOOFING_MODEL_PATH",
+        str(Path(__file__).parent.parent.parent / "models" / "2.7_80x80_MiniFASNetV2.pth"),
+    )
+
+
+def preload_torch_model(model_path: Optional[str] = None) -> None:
+    """
+    Load the MiniFASNet checkpoint on CPU now, for the pre-fork launcher.
+
+    The weights are loaded in the master process before fork and shared
+    copy-on-write by the workers; ``_TorchBackend`` reuses this module
+    instead of reading the checkpoint again. No inference runs here, so
+    torch has not started its thread pool when the master forks.
+    """
+    from app.models.anti_spoofing_model import load_pretrained_model
+
+    model_path = model_path or default_model_path()
+    if model_path not in _PRELOADED_TORCH_MODELS:
+        _PRELOADED_TORCH_MODELS[model_path] = load_pretrained_model(model_path, "cpu")
+
+
+def quantized_onnx_path(onnx_path: str) -> str:
+    """``model.onnx`` -> ``model.int8.onnx`` (naming used by the export script)."""
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}.int8{ext or '.onnx'}"
+
+
+class _TorchBackend:
+    """MiniFASNetV2 on PyTorch. Imports torch lazily so the ONNX path never pays for it."""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, device: Optional[str] = None):
+        import torch
+        import torch.nn.functional as F
+        from app.models.anti_spoofing_model import load_pretrained_model
+
+        self._torch = torch
+        self._softmax = F.softmax
+        if device is None:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        else:
+            self.device = torch.device(device)
+        self.model_path = model_path
+        preloaded = _PRELOADED_TORCH_MODELS.get(model_path)
+        if preloaded is not None and self.device.type == "cpu":
+            self.model = preloaded
+        else:
+            self.model = load_pretrained_model(model_path, str(self.device))
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """N x 3 x 80 x 80 float32 -> N x 3 softmax probabilities."""
+        with self._torch.no_grad():
+            logits = self.model(self._torch.from_numpy(batch).to(self.device))
+            return self._softmax(logits, dim=1).cpu().numpy()
+
+
+class _OnnxBackend:
+    """MiniFASNetV2 exported to ONNX, executed by onnxruntime on CPU."""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str):
+        import onnxruntime as ort
+
+        if not os.path.isfile(onnx_path):
+            raise FileNotFoundError(
+                f"Anti-spoofing ONNX model not found at {onnx_path}. "
+                "Export it with: python scripts/export_anti_spoofing_onnx.py"
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.device = "cpu"
+        self.model_path = onnx_path
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """N x 3 x 80 x 80 float32 -> N x 3 softmax probabilities."""
+        logits = self.session.run(None, {self._input_name: batch})[0].astype(np.float32)
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
 
 class AntiSpoofingDetector:
     """
@@ -31,6 +137,12 @@ class AntiSpoofingDetector:
 
     Usage (legacy — pre-cropped face, accuracy degraded):
         result = detector.predict(face_crop)
+
+    Usage (batch — one forward pass for many faces):
+        results = detector.predict_batch([(image_a, bbox_a), (image_b, bbox_b)])
+
+    With ANTI_SPOOFING_BATCHING_ENABLED, concurrent ``predict`` calls are
+    queued and stacked into a single ``predict_batch`` forward pass.
     """
 
     # Training-time input spec for the 2.7_80x80 checkpoint
@@ -48,23 +160,48 @@ class AntiSpoofingDetector:
         model_path: Optional[str] = None,
         threshold: float = DEFAULT_THRESHOLD,
         device: Optional[str] = None,
+        backend: Optional[str] = None,
+        onnx_path: Optional[str] = None,
+        quantized: Optional[bool] = None,
     ):
         self.threshold = threshold
 
-        if device is None:
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        else:
-            self.device = torch.device(device)
-        logger.info(f"AntiSpoofingDetector using device: {self.device}")
+        backend = (backend or ANTI_SPOOFING_BACKEND).lower()
+        if backend not in VALID_BACKENDS:
+            raise ValueError(f"Invalid anti-spoofing backend '{backend}'. Must be one of: {VALID_BACKENDS}")
 
         if model_path is None:
-            model_path = os.environ.get(
-                "ANTI_SPOOFING_MODEL_PATH",
-                str(Path(__file__).parent.parent.parent / "models" / "2.7_80x80_MiniFASNetV2.pth"),
+            model_path = default_model_path()
+
+        if backend == "onnx":
+            onnx_path = onnx_path or ANTI_SPOOFING_ONNX_PATH or str(Path(model_path).with_suffix(".onnx"))
+            quantized = ANTI_SPOOFING_ONNX_QUANTIZED if quantized is None else quantized
+            if quantized:
+                onnx_path = quantized_onnx_path(onnx_path)
+            self._backend = _OnnxBackend(onnx_path)
+        else:
+            quantized = False
+            self._backend = _TorchBackend(model_path, device)
+
+        self.backend = backend
+        self.quantized = bool(quantized)
+        self.device = self._backend.device
+        self.model_path = self._backend.model_path
+        logger.info(
+            f"Loaded anti-spoofing model from {self.model_path} "
+            f"(backend={self.backend}, device={self.device}, int8={self.quantized})"
+        )
+
+        self._batcher = None
+        if ANTI_SPOOFING_BATCHING_ENABLED:
+            from app.services.inference_batcher import MicroBatcher
+
+            self._batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=ANTI_SPOOFING_BATCH_MAX_SIZE,
+                max_wait_ms=ANTI_SPOOFING_BATCH_WINDOW_MS,
+                name="anti_spoofing",
             )
-        self.model_path = model_path
-        self.model = load_pretrained_model(self.model_path, str(self.device))
-        logger.info(f"Loaded anti-spoofing model from {self.model_path}")
 
     # ------------------------------------------------------------------
     # Cropping (matches CropImage from minivision-ai repo)
@@ -102,7 +239,7 @@ class AntiSpoofingDetector:
 
         return image[int(lt_y):int(rb_y) + 1, int(lt_x):int(rb_x) + 1]
 
-    def _preprocess(self, face_patch: np.ndarray) -> torch.Tensor:
+    def _preprocess(self, face_patch: np.ndarray) -> np.ndarray:
         """Resize to 80x80 and convert to tensor KEEPING pixel range [0, 255].
 
         The minivision checkpoint was trained with a custom ToTensor that
@@ -111,12 +248,61 @@ class AntiSpoofingDetector:
         by ``return img.float()``). Dividing by 255 here breaks the model.
         Channel order stays as BGR from cv2 — matches their training pipeline.
         """
-        if face_patch is None or face_patch.size == 0:
-            raise ValueError("Empty face patch for preprocessing")
+        return self._preprocess_batch([face_patch])
+
+    def _preprocess_batch(self, face_patches: Sequence[np.ndarray]) -> np.ndarray:
+        """Stack several face patches into one N x 3 x 80 x 80 float32 array (same rules as ``_preprocess``)."""
+        batch = np.empty((len(face_patches), 3, self.INPUT_SIZE[1], self.INPUT_SIZE[0]), dtype=np.float32)
+        for i, face_patch in enumerate(face_patches):
+            if face_patch is None or face_patch.size == 0:
+                raise ValueError("Empty face patch for preprocessing")
+            resized = cv2.resize(face_patch, self.INPUT_SIZE, interpolation=cv2.INTER_LINEAR)
+            batch[i] = resized.transpose(2, 0, 1)
+        return batch
+
+    def _extract_patch(
+        self,
+        image: np.ndarray,
+        bbox: Optional[Tuple[int, int, int, int]],
+    ) -> Union[np.ndarray, Dict[str, Any]]:
+        """Return the model input patch, or an error result dict if the input is unusable."""
+        if image is None or image.size == 0:
+            return {
+                "is_real": False,
+                "confidence": 0.0,
+                "error": "Invalid image",
+                "error_code": "INVALID_IMAGE",
+            }
+
+        patch = self._scaled_crop(image, bbox) if bbox is not None else image
+
+        if patch is None or patch.size == 0 or min(patch.shape[:2]) < 10:
+            return {
+                "is_real": False,
+                "confidence": 0.0,
+                "error": "Face region too small after crop",
+                "error_code": "FACE_TOO_SMALL",
+            }
+        return patch
 
-        resized = cv2.resize(face_patch, self.INPUT_SIZE, interpolation=cv2.INTER_LINEAR)
-        tensor = torch.from_numpy(resized.transpose(2, 0, 1)).float()
-        return tensor.unsqueeze(0).to(self.device)
+    def _build_result(self, probs: np.ndarray) -> Dict[str, Any]:
+        """Turn one row of softmax probabilities into the public result dict."""
+        real_prob = float(probs[self.REAL_CLASS_INDEX])
+        fake_prob = float(1.0 - real_prob)
+        label = int(np.argmax(probs))
+        is_real = (label == self.REAL_CLASS_INDEX) and (real_prob >= self.threshold)
+
+        return {
+            "is_real": is_real,
+            "confidence": round(max(real_prob, fake_prob), 4),
+            "real_prob": round(real_prob, 4),
+            "fake_prob": round(fake_prob, 4),
+            "score": round(real_prob - fake_prob, 4),
+            "attack_type": "none" if is_real else "unknown",
+            "threshold": self.threshold,
+            "method": "MiniFASNetV2",
+            "raw_probs": [round(float(p), 4) for p in probs],
+        }
 
     # ------------------------------------------------------------------
     # Public inference API
@@ -135,59 +321,68 @@ class AntiSpoofingDetector:
                    and fed to the model directly (less accurate).
             bbox: Optional (x1, y1, x2, y2) face bounding box within ``image``.
         """
-        try:
-            if image is None or image.size == 0:
+        if self._batcher is not None:
+            try:
+                return self._batcher.run((image, bbox))
+            except Exception as e:
+                logger.error(f"Anti-spoofing batched prediction error: {e}")
                 return {
                     "is_real": False,
                     "confidence": 0.0,
-                    "error": "Invalid image",
-                    "error_code": "INVALID_IMAGE",
+                    "error": str(e),
+                    "error_code": "PREDICTION_ERROR",
                 }
+        return self.predict_batch([(image, bbox)])[0]
 
-            if bbox is not None:
-                patch = self._scaled_crop(image, bbox)
-            else:
-                patch = image
+    def predict_batch(
+        self,
+        items: Sequence[Tuple[np.ndarray, Optional[Tuple[int, int, int, int]]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict real vs spoof for several (image, bbox) pairs in one forward pass.
 
-            if patch is None or patch.size == 0 or min(patch.shape[:2]) < 10:
-                return {
+        Each result is identical to what ``predict`` returns for that pair;
+        unusable inputs get their own error dict without failing the batch.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        patches: List[np.ndarray] = []
+        positions: List[int] = []
+
+        for i, (image, bbox) in enumerate(items):
+            try:
+                patch = self._extract_patch(image, bbox)
+            except Exception as e:
+                logger.error(f"Anti-spoofing prediction error: {e}")
+                patch = {
                     "is_real": False,
                     "confidence": 0.0,
-                    "error": "Face region too small after crop",
-                    "error_code": "FACE_TOO_SMALL",
+                    "error": str(e),
+                    "error_code": "PREDICTION_ERROR",
                 }
+            if isinstance(patch, dict):
+                results[i] = patch
+            else:
+                patches.append(patch)
+                positions.append(i)
 
-            input_tensor = self._preprocess(patch)
-
-            with torch.no_grad():
-                logits = self.model(input_tensor)
-                probs = F.softmax(logits, dim=1)[0].cpu().numpy()
+        if patches:
+            try:
+                probs = self._backend.infer(self._preprocess_batch(patches))
 
-            real_prob = float(probs[self.REAL_CLASS_INDEX])
-            fake_prob = float(1.0 - real_prob)
-            label = int(np.argmax(probs))
-            is_real = (label == self.REAL_CLASS_INDEX) and (real_prob >= self.threshold)
+                for row, i in enumerate(positions):
+                    results[i] = self._build_result(probs[row])
 
-            return {
-                "is_real": is_real,
-                "confidence": round(max(real_prob, fake_prob), 4),
-                "real_prob": round(real_prob, 4),
-                "fake_prob": round(fake_prob, 4),
-                "score": round(real_prob - fake_prob, 4),
-                "attack_type": "none" if is_real else "unknown",
-                "threshold": self.threshold,
-                "method": "MiniFASNetV2",
-                "raw_probs": [round(float(p), 4) for p in probs],
-            }
+            except Exception as e:
+                logger.error(f"Anti-spoofing prediction error: {e}")
+                for i in positions:
+                    results[i] = {
+                        "is_real": False,
+                        "confidence": 0.0,
+                        "error": str(e),
+                        "error_code": "PREDICTION_ERROR",
+                    }
 
-        except Exception as e:
-            logger.error(f"Anti-spoofing prediction error: {e}")
-            return {
-                "is_real": False,
-                "confidence": 0.0,
-                "error": str(e),
-                "error_code": "PREDICTION_ERROR",
-            }
+        return results  # type: ignore[return-value]
 
     def set_threshold(self, threshold: float):
         self.threshold = max(0.0, min(1.0, threshold))
@@ -197,8 +392,11 @@ class AntiSpoofingDetector:
         return {
             "model_path": self.model_path,
             "device": str(self.device),
+            "backend": self.backend,
+            "quantized": self.quantized,
             "threshold": self.threshold,
             "model_type": "MiniFASNetV2",
             "input_size": self.INPUT_SIZE,
             "crop_scale": self.CROP_SCALE,
+            "batching": self._batcher.get_stats() if self._batcher is not None else None,
         }
@@ -0,0 +1,415 @@
+"""
+In-process face embedding gallery keyed by (company_id, user_id).
+
+Each company owns one contiguous float32 matrix of L2-normalised rows, so a
+verify only has to gather the user's rows and run a dot product — no JSON
+parsing or re-normalisation on the check-in path. Rows are filled by the
+register flow and kept in sync by the backend through the gallery
+upsert/delete endpoints. The gallery is not persisted: after a restart the
+backend re-syncs it (or falls back to sending ``reference_embeddings_json``).
+
+``identify`` searches a whole company (1:N). Small companies are scanned
+exactly with one matrix-vector product; companies above
+``FACE_IDENTIFY_ANN_MIN_SIZE`` embeddings get an IVF-PQ index built in the
+background from a snapshot, and use the exact scan until it exists.
+
+Registrations do not invalidate the index. Users changed since the
+snapshot (upserted or deleted) are skipped in the index results and scored
+exactly from the live rows instead, so the index stays in use. It is
+rebuilt once those users exceed ``FACE_IDENTIFY_ANN_REBUILD_FRACTION`` of
+the snapshot, at most every ``FACE_IDENTIFY_ANN_REBUILD_INTERVAL_S``, and
+the rebuild reuses the trained quantizers (encoding only) until the
+company has grown or shrunk by 2x since they were trained.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.ann_index import IVFPQIndex
+from app.utils.config import (
+    FACE_IDENTIFY_ANN_MIN_SIZE,
+    FACE_IDENTIFY_ANN_REBUILD_FRACTION,
+    FACE_IDENTIFY_ANN_REBUILD_INTERVAL_S,
+    FACE_IDENTIFY_NPROBE,
+)
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 64
+# Per-user score = mean of the user's top-2 row similarities (same as 1:1 verify)
+_USER_TOP_K = 2
+# Rows shortlisted per requested candidate before per-user aggregation
+_ROWS_PER_CANDIDATE = 8
+# Retrain the IVF-PQ quantizers once the company size moved this much since training
+_RETRAIN_RATIO = 2.0
+
+_identify_seconds = REGISTRY.histogram(
+    "face_identify_search_seconds",
+    "Gallery search time of one 1:N identification",
+)
+
+
+def _user_score(similarities: np.ndarray) -> float:
+    k = min(_USER_TOP_K, similarities.shape[0])
+    if k == similarities.shape[0]:
+        return float(np.mean(similarities))
+    return float(np.mean(np.partition(similarities, -k)[-k:]))
+
+
+def normalize_rows(embeddings: Any) -> np.ndarray:
+    """Stack embeddings into an N x D float32 matrix with unit-norm rows.
+
+    Rows with zero norm are dropped (they would match nothing anyway).
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    if matrix.ndim != 2 or matrix.shape[1] == 0:
+        raise ValueError(f"Expected a list of embedding vectors, got shape {matrix.shape}")
+    norms = np.linalg.norm(matrix, axis=1)
+    keep = norms > 0
+    return np.ascontiguousarray(matrix[keep] / norms[keep, np.newaxis])
+
+
+class _CompanyShard:
+    """Dense row store for one company. Callers hold the gallery lock."""
+
+    __slots__ = ("matrix", "size", "owners", "rows", "version", "changed")
+
+    def __init__(self, dim: int) -> None:
+        self.matrix = np.empty((_INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.size = 0
+        self.owners: List[str] = []            # row index -> user_id
+        self.rows: Dict[str, List[int]] = {}   # user_id -> row indices
+        self.version = 0                       # bumped on every change
+        self.changed: Dict[str, int] = {}      # user_id -> version of its last change
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.size + extra
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+        grown[:self.size] = self.matrix[:self.size]
+        self.matrix = grown
+
+    def add(self, user_id: str, rows: np.ndarray) -> None:
+        self._reserve(len(rows))
+        start = self.size
+        self.matrix[start:start + len(rows)] = rows
+        self.size += len(rows)
+        self.owners.extend([user_id] * len(rows))
+        self.rows[user_id] = list(range(start, start + len(rows)))
+        self.version += 1
+        self.changed[user_id] = self.version
+
+    def remove(self, user_id: str) -> int:
+        indices = self.rows.pop(user_id, None)
+        if not indices:
+            return 0
+        # Swap-remove from the highest index down so the matrix stays dense
+        for idx in sorted(indices, reverse=True):
+            last = self.size - 1
+            if idx != last:
+                moved_user = self.owners[last]
+                self.matrix[idx] = self.matrix[last]
+                self.owners[idx] = moved_user
+                moved_rows = self.rows[moved_user]
+                moved_rows[moved_rows.index(last)] = idx
+            self.owners.pop()
+            self.size -= 1
+        self.version += 1
+        self.changed[user_id] = self.version
+        return len(indices)
+
+    def changed_since(self, version: int) -> List[str]:
+        """Users upserted or deleted after ``version``."""
+        return [user_id for user_id, changed in self.changed.items() if changed > version]
+
+    def view(self) -> np.ndarray:
+        return self.matrix[:self.size]
+
+
+class _AnnSnapshot:
+    """IVF-PQ index over a frozen copy of one company's rows."""
+
+    __slots__ = ("version", "index", "owners", "rows")
+
+    def __init__(self, version: int, index: IVFPQIndex, owners: List[str], rows: Dict[str, List[int]]):
+        self.version = version
+        self.index = index
+        self.owners = owners
+        self.rows = rows
+
+
+class EmbeddingGallery:
+    """
+    Thread-safe registry of pre-normalised reference embeddings per company.
+
+    Usage:
+        gallery.upsert("company-1", "user-42", [[...512 floats...], ...])
+        refs = gallery.get("company-1", "user-42")   # K x 512, unit rows
+        gallery.delete("company-1", "user-42")
+    """
+
+    def __init__(self, ann_min_size: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+        self._shards: Dict[str, _CompanyShard] = {}
+        self._dim: Optional[int] = None
+        self._lock = threading.RLock()
+
+        self.ann_min_size = FACE_IDENTIFY_ANN_MIN_SIZE if ann_min_size is None else ann_min_size
+        self.nprobe = FACE_IDENTIFY_NPROBE if nprobe is None else nprobe
+        self.rebuild_fraction = FACE_IDENTIFY_ANN_REBUILD_FRACTION
+        self.rebuild_interval_s = FACE_IDENTIFY_ANN_REBUILD_INTERVAL_S
+        self._ann: Dict[str, _AnnSnapshot] = {}
+        self._building: set = set()
+        self._last_build: Dict[str, float] = {}   # company_id -> monotonic start of last build
+
+    def upsert(self, company_id: str, user_id: str, embeddings: Sequence[Sequence[float]]) -> int:
+        """Replace the user's reference embeddings. Returns the number of rows stored."""
+        rows = normalize_rows(embeddings)
+        if len(rows) == 0:
+            raise ValueError("No non-zero embeddings provided")
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = rows.shape[1]
+            elif rows.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {rows.shape[1]} does not match gallery dimension {self._dim}"
+                )
+            shard = self._shards.get(company_id)
+            if shard is None:
+                shard = self._shards[company_id] = _CompanyShard(self._dim)
+            shard.remove(user_id)
+            shard.add(user_id, rows)
+            self._forget_changes(company_id, shard)
+
+        logger.debug("Gallery upsert %s/%s: %d embeddings", company_id, user_id, len(rows))
+        return len(rows)
+
+    def delete(self, company_id: str, user_id: str) -> bool:
+        """Drop a user's embeddings. Returns False if the user was not present."""
+        with self._lock:
+            shard = self._shards.get(company_id)
+            if shard is None:
+                return False
+            removed = shard.remove(user_id)
+            if shard.size == 0:
+                del self._shards[company_id]
+                self._ann.pop(company_id, None)
+            else:
+                self._forget_changes(company_id, shard)
+            return removed > 0
+
+    def _forget_changes(self, company_id: str, shard: _CompanyShard) -> None:
+        # Changes only matter relative to an index; without one (or a build
+        # that will snapshot the rows) there is nothing to reconcile (lock held)
+        if company_id not in self._ann and company_id not in self._building:
+            shard.changed.clear()
+
+    def delete_company(self, company_id: str) -> int:
+        """Drop every embedding of a company. Returns the number of users removed."""
+        with self._lock:
+            shard = self._shards.pop(company_id, None)
+            self._ann.pop(company_id, None)
+            self._last_build.pop(company_id, None)
+            return len(shard.rows) if shard else 0
+
+    def get(self, company_id: str, user_id: str) -> Optional[np.ndarray]:
+        """Copy of the user's unit-norm reference rows, or None if not registered."""
+        with self._lock:
+            shard = self._shards.get(company_id)
+            if shard is None:
+                return None
+            indices = shard.rows.get(user_id)
+            if not indices:
+                return None
+            return shard.matrix[indices]
+
+    def company_size(self, company_id: str) -> int:
+        """Number of embeddings stored for a company."""
+        with self._lock:
+            shard = self._shards.get(company_id)
+            return shard.size if shard else 0
+
+    def contains(self, company_id: str, user_id: str) -> bool:
+        with self._lock:
+            shard = self._shards.get(company_id)
+            return shard is not None and user_id in shard.rows
+
+    # ------------------------------------------------------------------
+    # 1:N identification
+    # ------------------------------------------------------------------
+    def identify(self, company_id: str, embedding: Any, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Best ``top_k`` users of a company for one probe embedding.
+
+        Returns ``[{"user_id": str, "similarity": float}, ...]`` sorted by
+        similarity (mean of the user's top-2 row similarities), best first.
+        """
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            raise ValueError("Probe embedding has zero norm")
+        query = query / norm
+        top_k = max(1, int(top_k))
+
+        started = time.perf_counter()
+        with self._lock:
+            shard = self._shards.get(company_id)
+            if shard is None or shard.size == 0:
+                return []
+            if query.shape[0] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {query.shape[0]} does not match gallery dimension {self._dim}"
+                )
+            snapshot = self._ann.get(company_id)
+            use_ann = snapshot is not None
+            if not use_ann:
+                if shard.size >= self.ann_min_size:
+                    self._schedule_build(company_id)
+                candidates = self._identify_exact(shard, query, top_k)
+            else:
+                # Users changed since the snapshot are scored from the live rows
+                changed = shard.changed_since(snapshot.version)
+                delta = [
+                    (_user_score(shard.matrix[shard.rows[user_id]] @ query), user_id)
+                    for user_id in changed if user_id in shard.rows
+                ]
+                if len(changed) > self.rebuild_fraction * max(1, len(snapshot.rows)):
+                    self._schedule_build(company_id, min_interval_s=self.rebuild_interval_s)
+
+        if use_ann:
+            # The snapshot is immutable, so the search runs without the lock
+            candidates = self._identify_ann(snapshot, query, top_k, set(changed), delta)
+
+        _identify_seconds.observe(
+            time.perf_counter() - started, {"mode": "ivfpq" if use_ann else "exact"}
+        )
+        return candidates
+
+    def _identify_exact(self, shard: _CompanyShard, query: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        similarities = shard.view() @ query
+        shortlist = min(len(similarities), top_k * _ROWS_PER_CANDIDATE)
+        top_rows = np.argpartition(-similarities, shortlist - 1)[:shortlist]
+        users = {shard.owners[i] for i in top_rows}
+        scored = [
+            (_user_score(similarities[shard.rows[user_id]]), user_id)
+            for user_id in users
+        ]
+        return self._rank(scored, top_k)
+
+    def _identify_ann(
+        self,
+        snapshot: _AnnSnapshot,
+        query: np.ndarray,
+        top_k: int,
+        changed: set,
+        delta: List[Any],
+    ) -> List[Dict[str, Any]]:
+        _, ids = snapshot.index.search(query, k=top_k * _ROWS_PER_CANDIDATE)
+        users = {snapshot.owners[i] for i in ids} - changed
+        vectors = snapshot.index.vectors
+        scored = [
+            (_user_score(vectors[snapshot.rows[user_id]] @ query), user_id)
+            for user_id in users
+        ]
+        return self._rank(scored + delta, top_k)
+
+    @staticmethod
+    def _rank(scored: List[Any], top_k: int) -> List[Dict[str, Any]]:
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [{"user_id": user_id, "similarity": score} for score, user_id in scored[:top_k]]
+
+    def build_index(self, company_id: str) -> bool:
+        """Build (or rebuild) the IVF-PQ index of a company synchronously."""
+        with self._lock:
+            shard = self._shards.get(company_id)
+            if shard is None or shard.size == 0:
+                return False
+            # Keeps changes made while indexing (see _forget_changes)
+            self._building.add(company_id)
+            version = shard.version
+            vectors = shard.view().copy()
+            owners = list(shard.owners)
+            rows = {user_id: list(indices) for user_id, indices in shard.rows.items()}
+            previous = self._ann.get(company_id)
+
+        # Reuse the trained quantizers while the company size stays within 2x
+        trained = None
+        if previous is not None:
+            ratio = len(vectors) / previous.index.trained_size
+            if 1 / _RETRAIN_RATIO <= ratio <= _RETRAIN_RATIO:
+                trained = previous.index
+        try:
+            index = IVFPQIndex(dim=vectors.shape[1], nprobe=self.nprobe).build(vectors, trained=trained)
+        except Exception:
+            with self._lock:
+                self._building.discard(company_id)
+            raise
+
+        with self._lock:
+            self._building.discard(company_id)
+            if self._shards.get(company_id) is not shard:
+                return False  # company dropped (or re-created) while indexing
+            current = self._ann.get(company_id)
+            if current is not None and current.version > version:
+                return False  # a newer snapshot was installed meanwhile
+            self._ann[company_id] = _AnnSnapshot(version, index, owners, rows)
+            # Changes up to the snapshot are in the index now
+            shard.changed = {user_id: v for user_id, v in shard.changed.items() if v > version}
+        return True
+
+    def _schedule_build(self, company_id: str, min_interval_s: float = 0.0) -> None:
+        """
+        Start a background index build (lock held), unless one is already
+        running or the last one started less than ``min_interval_s`` ago.
+        """
+        if company_id in self._building:
+            return
+        now = time.monotonic()
+        last = self._last_build.get(company_id)
+        if last is not None and now - last < min_interval_s:
+            return
+        self._last_build[company_id] = now
+        self._building.add(company_id)
+
+        def _run() -> None:
+            try:
+                self.build_index(company_id)
+            except Exception as e:
+                logger.error(f"IVF-PQ index build failed for {company_id}: {e}")
+            finally:
+                with self._lock:
+                    self._building.discard(company_id)
+
+        threading.Thread(target=_run, name=f"gallery-index-{company_id}", daemon=True).start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            companies = {
+                company_id: {
+                    "users": len(shard.rows),
+                    "embeddings": shard.size,
+                    "ann_index": company_id in self._ann,
+                    "ann_pending_changes": (
+                        len(shard.changed_since(self._ann[company_id].version))
+                        if company_id in self._ann else None
+                    ),
+                }
+                for company_id, shard in self._shards.items()
+            }
+        return {
+            "dimension": self._dim,
+            "companies": len(companies),
+            "users": sum(c["users"] for c in companies.values()),
+            "embeddings": sum(c["embeddings"] for c in companies.values()),
+            "per_company": companies,
+        }
@@ -2,13 +2,40 @@
 from typing import List, Optional, Dict, Any
 import numpy as np
 import os
-from concurrent.futures import ThreadPoolExecutor
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from app.models.face_detector import FaceDetector
 from app.models.face_recognizer import FaceRecognizer
-from app.utils.image_utils import ImageUtils
+from app.services.model_loader import ModelLoader
+from app.utils.image_utils import ImageUtils, DecodedImage
 from app.services.liveness_detector import LivenessDetector, LivenessSession, HeadPose
+from app.services.liveness_session_store import LivenessSessionStore, create_session_store
+from app.services.liveness_token import InvalidLivenessToken, LivenessTokenSigner, create_token_signer
+from app.services.liveness_stream import STREAM_CHALLENGES, LivenessStreamTracker
 from app.services.anti_spoofing_detector import AntiSpoofingDetector
+from app.services.anti_spoofing_cascade import AntiSpoofingCascade, STAGE_SFAS, STAGE_TEXTURE
+from app.services.embedding_gallery import EmbeddingGallery
+from app.services.pipeline_pool import FacePipelinePool
+from app.utils.config import (
+    VERIFICATION_THRESHOLD,
+    ANTI_SPOOFING_MIN_FACE_PX,
+    ANTI_SPOOFING_CASCADE_ORDER,
+    ANTI_SPOOFING_CASCADE_EARLY_EXIT,
+    TEXTURE_CANONICAL_SIZE,
+    FACE_PIPELINE_MODE,
+    FACE_PIPELINE_WORKERS,
+    FACE_PIPELINE_START_METHOD,
+    LIVENESS_SESSION_MODE,
+    LIVENESS_STREAM_FRAME_STRIDE,
+    LIVENESS_STREAM_MAX_SIDE,
+    LIVENESS_STREAM_MAX_FRAME_KB,
+    MODEL_WARMUP_ENABLED,
+)
 from app.services.texture_analyzer import TextureAnalyzer
+from app.utils.deadline import DeadlineExceeded, STAGE_ANTI_SPOOFING, STAGE_DETECTION, check_deadline
+from app.utils.metrics import REGISTRY
+from app.utils.stage_timer import operation_scope, stage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,40 +48,191 @@ logger = logging.getLogger(__name__)
 # worker thread gives real parallelism.
 _VERIFY_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="verify-")
 
+_model_load_seconds = REGISTRY.gauge(
+    "model_load_seconds", "Duration of each startup step of the face models (load, warm-up, total)",
+)
+_models_ready = REGISTRY.gauge(
+    "models_ready", "1 once the face models are loaded and warmed up",
+)
+
+
+def _submit(fn, *args) -> Future:
+    """Submit to _VERIFY_POOL in the caller's context (so the request deadline applies there too)."""
+    return _VERIFY_POOL.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _in_stage(name: str, fn, *args) -> Any:
+    """Run ``fn`` as stage ``name`` of the current operation (for _submit)."""
+    with stage(name):
+        return fn(*args)
+
+
+def _completed(value: Any) -> Future:
+    """A Future that already holds ``value`` (results computed in a worker process)."""
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
 
 class FaceService:
     """Service layer for face recognition operations with Liveness Detection"""
     
-    def __init__(self):
-        self.detector = FaceDetector()
+    def __init__(self, use_pipeline_pool: Optional[bool] = None):
+        """
+        Args:
+            use_pipeline_pool: Run detection + anti-spoofing in worker processes
+                (default: FACE_PIPELINE_MODE == 'process'). Workers pass False.
+        """
+        # Models are loaded by load_models() (startup task), not here
+        self.detector = FaceDetector(load=False)
         self.recognizer = FaceRecognizer()
         self.image_utils = ImageUtils()
-        self._liveness_sessions: Dict[str, LivenessSession] = {}
+        self.gallery = EmbeddingGallery()
+        self.liveness_sessions: LivenessSessionStore = create_session_store()
+        # Token mode: sessions travel in signed tokens instead of the store
+        self.liveness_tokens: Optional[LivenessTokenSigner] = (
+            create_token_signer() if LIVENESS_SESSION_MODE == "token" else None
+        )
         
         # Anti-spoofing components
         self._anti_spoofing_enabled = os.getenv("ANTI_SPOOFING_ENABLED", "true").lower() == "true"
         self._anti_spoofing_method = os.getenv("ANTI_SPOOFING_METHOD", "hybrid")
+        self.anti_spoofing_cascade = AntiSpoofingCascade(
+            order=ANTI_SPOOFING_CASCADE_ORDER.split(","),
+            early_exit=ANTI_SPOOFING_CASCADE_EARLY_EXIT,
+        )
         
+        self.anti_spoofing = None
         if self._anti_spoofing_enabled:
-            try:
-                self.anti_spoofing = AntiSpoofingDetector()
-                logger.info("AntiSpoofingDetector initialized successfully")
-            except Exception as e:
-                logger.error(
-                    "SFAS deep-learning anti-spoofing DISABLED: %s "
-                    "Anti-spoofing now relies ONLY on texture analysis (LBP+FFT), "
-                    "which is less robust against high-quality print/screen attacks. "
-                    "Place a trained checkpoint at ANTI_SPOOFING_MODEL_PATH to re-enable SFAS.",
-                    e,
-                )
-                self.anti_spoofing = None
-
-            self.texture_analyzer = TextureAnalyzer()
+            self.texture_analyzer = TextureAnalyzer(canonical_size=TEXTURE_CANONICAL_SIZE)
             logger.info("TextureAnalyzer initialized successfully")
         else:
-            self.anti_spoofing = None
             self.texture_analyzer = None
             logger.info("Anti-spoofing is disabled")
+
+        if use_pipeline_pool is None:
+            use_pipeline_pool = FACE_PIPELINE_MODE == "process"
+        self.pipeline_pool: Optional[FacePipelinePool] = None
+        if use_pipeline_pool:
+            self.pipeline_pool = FacePipelinePool(
+                workers=FACE_PIPELINE_WORKERS,
+                start_method=FACE_PIPELINE_START_METHOD,
+            )
+
+        self.models_ready = False
+        self.models_error: Optional[str] = None
+        # Step name -> milliseconds, filled by load_models()
+        self.startup_timings: Dict[str, float] = {}
+    
+    # =========================================================================
+    # Model Loading
+    # =========================================================================
+    
+    def _timed(self, step: str, fn, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.startup_timings[step] = elapsed_ms
+            _model_load_seconds.set(elapsed_ms / 1000, {"step": step})
+            logger.info(f"Startup step '{step}' took {elapsed_ms:.0f} ms")
+    
+    def _load_anti_spoofing(self) -> None:
+        try:
+            self.anti_spoofing = AntiSpoofingDetector()
+            logger.info("AntiSpoofingDetector initialized successfully")
+        except Exception as e:
+            logger.error(
+                "SFAS deep-learning anti-spoofing DISABLED: %s "
+                "Anti-spoofing now relies ONLY on texture analysis (LBP+FFT), "
+                "which is less robust against high-quality print/screen attacks. "
+                "Place a trained checkpoint at ANTI_SPOOFING_MODEL_PATH to re-enable SFAS.",
+                e,
+            )
+            self.anti_spoofing = None
+    
+    def load_models(self, warm_up: bool = MODEL_WARMUP_ENABLED) -> bool:
+        """
+        Load every model in parallel, warm them up and mark the service ready
+        
+        InsightFace and MiniFASNet are independent, so they are loaded on
+        separate threads (onnxruntime and torch release the GIL
+        while building sessions / reading weights). The warm-up then runs each
+        network once on a synthetic frame. In process mode the pipeline
+        workers are started (each loads its own models) before the service
+        reports ready.
+        
+        Returns:
+            True when the service is ready (face detection available)
+        """
+        started = time.perf_counter()
+        loader = ModelLoader()
+        steps = {
+            'insightface': loader.load_model,
+        }
+        if self._anti_spoofing_enabled:
+            steps['anti_spoofing'] = self._load_anti_spoofing
+        
+        errors = []
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="model-load-") as pool:
+            futures = {name: pool.submit(self._timed, name, fn) for name, fn in steps.items()}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                    logger.error(f"Loading {name} failed: {str(e)}")
+        
+        # Picks up the model loaded above
+        self.detector.load()
+        if self.detector.app is None:
+            self.models_error = "; ".join(errors) or "InsightFace model is not loaded"
+            logger.error(f"Face models unavailable, service stays not ready: {self.models_error}")
+            return False
+        
+        if warm_up:
+            try:
+                self._timed('warm_up', self.warm_up)
+            except Exception as e:
+                # A failed warm-up only costs the first request its latency
+                logger.warning(f"Model warm-up failed: {str(e)}")
+        
+        if self.pipeline_pool is not None:
+            # Start the worker processes so each loads its models before traffic
+            self._timed('pipeline_workers', self.pipeline_pool.warm_up)
+        
+        self.startup_timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        _model_load_seconds.set(self.startup_timings['total'] / 1000, {"step": "total"})
+        self.models_ready = True
+        _models_ready.set(1)
+        logger.info(f"Face models ready in {self.startup_timings['total']:.0f} ms")
+        return True
+    
+    def warm_up(self) -> None:
+        """
+        Run detection, recognition and anti-spoofing once on a synthetic frame
+
+        The anti-spoofing backends are called directly, not through the
+        cascade, so the warm-up frame is not counted in its stage metrics.
+        """
+        image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        self.detector.warm_up(image)
+        if self._anti_spoofing_enabled:
+            bbox = (220, 140, 420, 340)
+            if self.anti_spoofing is not None:
+                self.anti_spoofing.predict(image, bbox=bbox)
+            if self.texture_analyzer is not None:
+                self.texture_analyzer.comprehensive_check(image[bbox[1]:bbox[3], bbox[0]:bbox[2]])
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Readiness state for the /ready probe"""
+        return {
+            'ready': self.models_ready,
+            'error': self.models_error,
+            'anti_spoofing_model': self.anti_spoofing is not None,
+            'timings_ms': dict(self.startup_timings),
+        }
     
     # =========================================================================
     # Liveness Detection Methods
@@ -68,20 +246,63 @@ class FaceService:
             session_id: Unique session identifier
             
         Returns:
-            Dict with challenge information for frontend
+            Dict with challenge information for frontend (plus the signed
+            session 'token' in token mode)
         """
         session = LivenessSession()
-        self._liveness_sessions[session_id] = session
-
         result = session.start_challenge()
+        if self.liveness_tokens is not None:
+            result["token"] = self.liveness_tokens.issue(session_id, session)
+        else:
+            self.liveness_sessions.create(session_id, session)
+
         # Ensure response matches LivenessChallengeResponse model
         result["success"] = True
         return result
     
+    def _open_liveness_session(self, session_id: str, token: Optional[str], consume: bool = False) -> tuple:
+        """
+        (session, token nonce or None, error dict or None) for a baseline/verify call
+
+        consume=True takes the session out of the store atomically, so two
+        workers cannot both own it (token mode spends the nonce instead).
+        """
+        nonce = None
+        if self.liveness_tokens is not None:
+            try:
+                if not token:
+                    raise InvalidLivenessToken('INVALID_SESSION', 'missing')
+                session, nonce = self.liveness_tokens.load(token, session_id)
+            except InvalidLivenessToken as e:
+                return None, None, self._liveness_session_error(e.error_code)
+        else:
+            if consume:
+                session = self.liveness_sessions.pop(session_id)
+            else:
+                session = self.liveness_sessions.get(session_id)
+            if not session:
+                return None, None, self._liveness_session_error('INVALID_SESSION')
+        
+        if session.is_expired():
+            if nonce is None and not consume:
+                self.liveness_sessions.delete(session_id)
+            return None, None, self._liveness_session_error('SESSION_EXPIRED')
+        return session, nonce, None
+    
+    @staticmethod
+    def _liveness_session_error(error_code: str) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': 'Session đã hết hạn' if error_code == 'SESSION_EXPIRED' else 'Session không tồn tại',
+            'error_code': error_code
+        }
+    
+    @operation_scope("liveness_baseline")
     def capture_liveness_baseline(
         self, 
         session_id: str, 
-        image_bytes: bytes
+        image_bytes: bytes,
+        token: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Capture baseline pose for liveness challenge
@@ -89,29 +310,21 @@ class FaceService:
         Args:
             session_id: Session identifier
             image_bytes: Image bytes from frontend
+            token: Signed session token (token mode)
             
         Returns:
-            Dict with baseline pose and instruction
+            Dict with baseline pose and instruction (plus the updated
+            'token' carrying the baseline pose in token mode)
         """
-        session = self._liveness_sessions.get(session_id)
-        if not session:
-            return {
-                'success': False,
-                'error': 'Session không tồn tại',
-                'error_code': 'INVALID_SESSION'
-            }
-        
-        if session.is_expired():
-            del self._liveness_sessions[session_id]
-            return {
-                'success': False,
-                'error': 'Session đã hết hạn',
-                'error_code': 'SESSION_EXPIRED'
-            }
+        session, nonce, error = self._open_liveness_session(session_id, token)
+        if error:
+            return error
         
         try:
-            # Validate and process image
-            validation = self.image_utils.validate_image(image_bytes)
+            # Validate and decode image (single pass)
+            with stage("decode"):
+                decoded = self.image_utils.decode_image(image_bytes)
+            validation = decoded.validation
             if not validation['valid']:
                 return {
                     'success': False,
@@ -119,11 +332,12 @@ class FaceService:
                     'error_code': validation.get('error_code', 'POOR_IMAGE_QUALITY')
                 }
             
-            image = self.image_utils.bytes_to_numpy(image_bytes)
-            image = self.image_utils.resize_image(image)
+            image = decoded.image
             
             # Detect face
-            detection_result = self.detector.detect_single_face(image)
+            check_deadline(STAGE_DETECTION)
+            with stage("detect"):
+                detection_result = self.detector.detect_single_face(image, with_embedding=False)
             if not detection_result['success']:
                 return {
                     'success': False,
@@ -147,11 +361,21 @@ class FaceService:
                 }
             
             # Capture baseline pose
-            result = session.capture_baseline(landmarks)
+            with stage("pose"):
+                result = session.capture_baseline(landmarks)
+            if nonce is not None:
+                self.liveness_tokens.mark_used(nonce)
+                result['token'] = self.liveness_tokens.issue(session_id, session)
+            else:
+                self.liveness_sessions.save(session_id, session)
             result['success'] = True
             
             return result
             
+        except DeadlineExceeded:
+            raise
+        except InvalidLivenessToken as e:
+            return self._liveness_session_error(e.error_code)
         except Exception as e:
             logger.error(f"Error capturing liveness baseline: {str(e)}")
             return {
@@ -160,10 +384,12 @@ class FaceService:
                 'error_code': 'LIVENESS_ERROR'
             }
     
+    @operation_scope("liveness_verify")
     def verify_liveness_response(
         self, 
         session_id: str, 
-        image_bytes: bytes
+        image_bytes: bytes,
+        token: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Capture response pose and verify liveness challenge
@@ -171,29 +397,20 @@ class FaceService:
         Args:
             session_id: Session identifier
             image_bytes: Image bytes after challenge completion
+            token: Baseline token (token mode); accepted once
             
         Returns:
             Dict with verification result
         """
-        session = self._liveness_sessions.get(session_id)
-        if not session:
-            return {
-                'success': False,
-                'error': 'Session không tồn tại',
-                'error_code': 'INVALID_SESSION'
-            }
-        
-        if session.is_expired():
-            del self._liveness_sessions[session_id]
-            return {
-                'success': False,
-                'error': 'Session đã hết hạn',
-                'error_code': 'SESSION_EXPIRED'
-            }
+        session, nonce, error = self._open_liveness_session(session_id, token)
+        if error:
+            return error
         
         try:
-            # Validate and process image
-            validation = self.image_utils.validate_image(image_bytes)
+            # Validate and decode image (single pass)
+            with stage("decode"):
+                decoded = self.image_utils.decode_image(image_bytes)
+            validation = decoded.validation
             if not validation['valid']:
                 return {
                     'success': False,
@@ -201,11 +418,12 @@ class FaceService:
                     'error_code': validation.get('error_code', 'POOR_IMAGE_QUALITY')
                 }
             
-            image = self.image_utils.bytes_to_numpy(image_bytes)
-            image = self.image_utils.resize_image(image)
+            image = decoded.image
             
             # Detect face
-            detection_result = self.detector.detect_single_face(image)
+            check_deadline(STAGE_DETECTION)
+            with stage("detect"):
+                detection_result = self.detector.detect_single_face(image, with_embedding=False)
             if not detection_result['success']:
                 return {
                     'success': False,
@@ -227,25 +445,108 @@ class FaceService:
                     'error_code': 'NO_LANDMARKS'
                 }
             
-            # Verify challenge
-            result = session.capture_response(landmarks)
-            
-            # Clean up session
-            del self._liveness_sessions[session_id]
+            # Verify challenge (the session is spent before the result is computed;
+            # of two concurrent verifies only the one that pops it goes on)
+            if nonce is not None:
+                self.liveness_tokens.mark_used(nonce)
+            elif self.liveness_sessions.pop(session_id) is None:
+                return self._liveness_session_error('INVALID_SESSION')
+            with stage("pose"):
+                result = session.capture_response(landmarks)
             
             return result
             
+        except DeadlineExceeded:
+            raise
+        except InvalidLivenessToken as e:
+            return self._liveness_session_error(e.error_code)
         except Exception as e:
             logger.error(f"Error verifying liveness: {str(e)}")
             # Clean up on error
-            if session_id in self._liveness_sessions:
-                del self._liveness_sessions[session_id]
+            self.liveness_sessions.delete(session_id)
             return {
                 'success': False,
                 'error': f'Lỗi: {str(e)}',
                 'error_code': 'LIVENESS_ERROR'
             }
     
+    def open_liveness_stream(self, session_id: str, token: Optional[str] = None) -> tuple:
+        """
+        Take over a liveness session for a WebSocket frame stream
+
+        The stream owns the session from here on: it is removed from the
+        store (or its token spent) immediately, so the same session cannot
+        also be completed over the HTTP endpoints. A BLINK challenge is
+        replaced by one the stream can verify (sent in the "ready" message).
+
+        Returns:
+            (LivenessStreamTracker, None) or (None, error dict)
+        """
+        session, nonce, error = self._open_liveness_session(session_id, token, consume=True)
+        if error:
+            return None, error
+        try:
+            if nonce is not None:
+                self.liveness_tokens.mark_used(nonce)
+        except InvalidLivenessToken as e:
+            return None, self._liveness_session_error(e.error_code)
+        if session.challenge not in STREAM_CHALLENGES:
+            # Stream frames carry 5-point kps only: no eyelids to measure a blink on
+            session.start_challenge(STREAM_CHALLENGES)
+        return LivenessStreamTracker(session, frame_stride=LIVENESS_STREAM_FRAME_STRIDE), None
+    
+    @operation_scope("liveness_stream_frame")
+    def detect_stream_frame(self, frame_bytes: bytes) -> Dict[str, Any]:
+        """
+        Landmarks of the single face in one low-resolution stream frame
+        
+        Detection-only (no embedding, no anti-spoofing). Small frames are
+        accepted; large ones are decoded down to LIVENESS_STREAM_MAX_SIDE.
+        
+        Returns:
+            {'success': True, 'landmarks': [...]} or an error dict
+        """
+        if len(frame_bytes) > LIVENESS_STREAM_MAX_FRAME_KB * 1024:
+            return {
+                'success': False,
+                'error': f'Frame vượt quá {LIVENESS_STREAM_MAX_FRAME_KB}KB',
+                'error_code': 'FRAME_TOO_LARGE'
+            }
+        with stage("decode"):
+            decoded = self.image_utils.decode_image(
+                frame_bytes,
+                max_size=LIVENESS_STREAM_MAX_SIDE,
+                min_size_mb=0,
+                min_width=64,
+                min_height=64,
+            )
+        validation = decoded.validation
+        if not validation['valid']:
+            return {
+                'success': False,
+                'error': validation['error'],
+                'error_code': validation.get('error_code', 'POOR_IMAGE_QUALITY')
+            }
+        
+        check_deadline(STAGE_DETECTION)
+        with stage("detect"):
+            detection_result = self.detector.detect_single_face(decoded.image, with_embedding=False)
+        if not detection_result['success']:
+            return {
+                'success': False,
+                'error': detection_result.get('error_message', 'Không phát hiện khuôn mặt'),
+                'error_code': detection_result.get('error_code', 'NO_FACE_DETECTED')
+            }
+        face_data = detection_result['face']
+        landmarks = face_data.get('landmark') or face_data.get('kps') or []
+        if not landmarks:
+            return {
+                'success': False,
+                'error': 'Không lấy được landmarks',
+                'error_code': 'NO_LANDMARKS'
+            }
+        return {'success': True, 'landmarks': landmarks}
+    
     def get_liveness_instruction(self, challenge_type: str) -> str:
         """Get human-readable instruction for liveness challenge"""
         instructions = {
@@ -262,12 +563,15 @@ class FaceService:
     # Face Registration Methods
     # =========================================================================
     
+    @operation_scope("register")
     def register_faces(
         self, 
         image_bytes_list: List[bytes],
         require_liveness: bool = True,
         liveness_session_id: str = None,
-        liveness_result: dict = None
+        liveness_result: dict = None,
+        company_id: Optional[str] = None,
+        user_id: Optional[str] = None
     ) -> dict:
         """
         Register multiple face images for a user with optional liveness verification
@@ -277,12 +581,15 @@ class FaceService:
             require_liveness: Whether to require liveness verification
             liveness_session_id: Session ID if liveness was verified
             liveness_result: Result from liveness verification
+            company_id: Company of the user (with user_id, stores embeddings in the gallery)
+            user_id: User the faces belong to
             
         Returns:
             dict: {
                 'success': bool,
                 'faces': List[dict],  # Detected faces with embeddings
                 'liveness': dict,     # Liveness verification result
+                'gallery': dict,      # Gallery upsert result (if company_id/user_id given)
                 'error': str (if failed),
                 'error_code': str (if failed),
                 'error_details': dict (if failed)
@@ -320,8 +627,10 @@ class FaceService:
             error_details = []
             
             for idx, image_bytes in enumerate(image_bytes_list):
-                # Validate image
-                validation = self.image_utils.validate_image(image_bytes)
+                # Validate and decode image (single pass)
+                with stage("decode"):
+                    decoded = self.image_utils.decode_image(image_bytes)
+                validation = decoded.validation
                 if not validation['valid']:
                     error_info = {
                         'image_index': idx + 1,
@@ -333,14 +642,12 @@ class FaceService:
                     error_details.append(error_info)
                     continue
                 
-                # Convert to numpy
-                image = self.image_utils.bytes_to_numpy(image_bytes)
-                
-                # Resize if too large
-                image = self.image_utils.resize_image(image)
+                image = decoded.image
                 
                 # Detect face
-                detection_result = self.detector.detect_single_face(image)
+                check_deadline(STAGE_DETECTION)
+                with stage("detect"):
+                    detection_result = self.detector.detect_single_face(image)
                 
                 if not detection_result['success']:
                     error_info = {
@@ -389,6 +696,14 @@ class FaceService:
                     'liveness': liveness_check
                 }
             
+            gallery_result = None
+            if company_id and user_id:
+                with stage("gallery"):
+                    stored = self.gallery.upsert(
+                        company_id, user_id, [face['embedding'] for face in detected_faces]
+                    )
+                gallery_result = {'stored': True, 'embeddings': stored}
+
             return {
                 'success': True,
                 'faces': detected_faces,
@@ -396,9 +711,12 @@ class FaceService:
                 'valid_faces': len(detected_faces),
                 'errors': errors if errors else None,
                 'error_details': error_details if error_details else None,
-                'liveness': liveness_check
+                'liveness': liveness_check,
+                'gallery': gallery_result
             }
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error in register_faces: {str(e)}")
             return {
@@ -414,21 +732,26 @@ class FaceService:
     # Face Verification Methods
     # =========================================================================
     
+    @operation_scope("verify")
     def verify_face(
         self,
         candidate_image_bytes: bytes,
-        reference_embeddings: List[List[float]],
+        reference_embeddings: Optional[List[List[float]]] = None,
         custom_threshold: Optional[float] = None,
         enable_anti_spoofing: Optional[bool] = None,
-        anti_spoofing_method: Optional[str] = None
+        anti_spoofing_method: Optional[str] = None,
+        company_id: Optional[str] = None,
+        user_id: Optional[str] = None
     ) -> dict:
         """
         Verify if candidate face matches reference embeddings
         
         Args:
             candidate_image_bytes: Image to verify
-            reference_embeddings: List of reference face embeddings
+            reference_embeddings: Reference face embeddings (list of lists or N x D array)
             custom_threshold: Optional custom threshold for verification
+            company_id, user_id: Compare against the user's gallery rows
+                instead of reference_embeddings
             
         Returns:
             dict: {
@@ -441,8 +764,26 @@ class FaceService:
             }
         """
         try:
-            # Validate image
-            validation = self.image_utils.validate_image(candidate_image_bytes)
+            # Resolve references first: an unknown user is rejected before any decoding
+            reference_matrix = None
+            if user_id:
+                with stage("gallery"):
+                    reference_matrix = self.gallery.get(company_id, user_id)
+                if reference_matrix is None:
+                    return {
+                        'match': False,
+                        'error': 'Người dùng chưa đăng ký khuôn mặt',
+                        'error_code': 'FACE_NOT_REGISTERED',
+                        'error_details': {
+                            'company_id': company_id,
+                            'user_id': user_id
+                        }
+                    }
+
+            # Validate and decode image (single pass)
+            with stage("decode"):
+                decoded = self.image_utils.decode_image(candidate_image_bytes)
+            validation = decoded.validation
             if not validation['valid']:
                 return {
                     'match': False,
@@ -451,12 +792,29 @@ class FaceService:
                     'error_details': validation.get('details', {})
                 }
             
-            # Convert to numpy
-            image = self.image_utils.bytes_to_numpy(candidate_image_bytes)
-            image = self.image_utils.resize_image(image)
+            image = decoded.image
             
-            # Detect face
-            detection_result = self.detector.detect_single_face(image)
+            # Per kehoach.md Phase 1: anti-spoofing is always-on for verification.
+            # The only way to skip is explicit enable_anti_spoofing=False.
+            should_check_spoofing = (
+                enable_anti_spoofing if enable_anti_spoofing is not None
+                else True
+            )
+            spoof_method = anti_spoofing_method or self._anti_spoofing_method
+            
+            # Detect face (process mode: detection + anti-spoofing in one worker task)
+            check_deadline(STAGE_DETECTION)
+            spoof_future = None
+            if self.pipeline_pool is not None:
+                with stage("pipeline"):
+                    detection_result, spoof_result = self.pipeline_pool.analyze(
+                        decoded, spoof_method=spoof_method if should_check_spoofing else None
+                    )
+                if spoof_result is not None:
+                    spoof_future = _completed(spoof_result)
+            else:
+                with stage("detect"):
+                    detection_result = self.detector.detect_single_face(image)
             
             if not detection_result['success']:
                 return {
@@ -471,13 +829,6 @@ class FaceService:
             
             # Extract face data
             face_data = detection_result['face']
-            
-            # Per kehoach.md Phase 1: anti-spoofing is always-on for verification.
-            # The only way to skip is explicit enable_anti_spoofing=False.
-            should_check_spoofing = (
-                enable_anti_spoofing if enable_anti_spoofing is not None
-                else True
-            )
 
             # Prepare both pipelines then run in parallel (Phase 3.3).
             # Recognition is typically fast (~1-5ms numpy cosine) while
@@ -485,33 +836,40 @@ class FaceService:
             # the gain here is small when the user has few reference
             # embeddings. With larger embedding sets or a slower recognizer
             # the savings compound.
-            spoof_method = anti_spoofing_method or self._anti_spoofing_method
-            bbox = face_data['bbox']
-            x1, y1, x2, y2 = map(int, bbox)
-            h, w = image.shape[:2]
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(w, x2), min(h, y2)
-            face_crop = image[y1:y2, x1:x2] if (x2 > x1 and y2 > y1) else None
-
             candidate_embedding = np.array(face_data['embedding'])
-            reference_arrays = [np.array(emb) for emb in reference_embeddings]
 
-            spoof_future = None
-            if should_check_spoofing and face_crop is not None:
-                spoof_future = _VERIFY_POOL.submit(
-                    self._check_anti_spoofing,
-                    face_crop,
-                    spoof_method,
-                    image,
-                    (x1, y1, x2, y2),
-                )
+            check_deadline(STAGE_ANTI_SPOOFING)
+            if self.pipeline_pool is None and should_check_spoofing:
+                face_crop, spoof_image, spoof_bbox = self._spoof_region(decoded, face_data['bbox'])
+                if face_crop is not None:
+                    spoof_future = _submit(
+                        _in_stage,
+                        "anti_spoofing",
+                        self._check_anti_spoofing,
+                        face_crop,
+                        spoof_method,
+                        spoof_image,
+                        spoof_bbox,
+                    )
 
-            recognize_future = _VERIFY_POOL.submit(
-                self.recognizer.verify_against_multiple,
-                candidate_embedding,
-                reference_arrays,
-                custom_threshold,
-            )
+            if reference_matrix is not None:
+                recognize_future = _submit(
+                    _in_stage,
+                    "recognize",
+                    self.recognizer.verify_against_normalized,
+                    candidate_embedding,
+                    reference_matrix,
+                    custom_threshold,
+                )
+            else:
+                recognize_future = _submit(
+                    _in_stage,
+                    "recognize",
+                    self.recognizer.verify_against_multiple,
+                    candidate_embedding,
+                    reference_embeddings,
+                    custom_threshold,
+                )
 
             spoof_result = spoof_future.result() if spoof_future else None
             if spoof_result is not None and not spoof_result.get('is_real', True):
@@ -543,6 +901,8 @@ class FaceService:
 
             return result
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error in verify_face: {str(e)}")
             return {
@@ -554,6 +914,146 @@ class FaceService:
                 }
             }
     
+    @operation_scope("identify")
+    def identify_face(
+        self,
+        candidate_image_bytes: bytes,
+        company_id: str,
+        top_k: int = 5,
+        custom_threshold: Optional[float] = None,
+        enable_anti_spoofing: Optional[bool] = None,
+        anti_spoofing_method: Optional[str] = None
+    ) -> dict:
+        """
+        Identify who is in the image among a company's enrolled users (1:N)
+        
+        Args:
+            candidate_image_bytes: Image from the kiosk camera
+            company_id: Company whose gallery is searched
+            top_k: Number of candidates to return
+            custom_threshold: Minimum similarity for a match
+            
+        Returns:
+            dict: {
+                'match': bool,             # best candidate >= threshold
+                'user_id': str or None,    # best candidate if matched
+                'similarity': float,
+                'threshold': float,
+                'candidates': List[dict],  # [{'user_id', 'similarity'}], best first
+                'error': str (if failed),
+                'error_code': str (if failed)
+            }
+        """
+        threshold = float(custom_threshold) if custom_threshold is not None else float(VERIFICATION_THRESHOLD)
+        try:
+            if self.gallery.company_size(company_id) == 0:
+                return {
+                    'match': False,
+                    'error': 'Công ty chưa có khuôn mặt nào được đăng ký',
+                    'error_code': 'FACE_NOT_REGISTERED',
+                    'error_details': {'company_id': company_id}
+                }
+
+            with stage("decode"):
+                decoded = self.image_utils.decode_image(candidate_image_bytes)
+            validation = decoded.validation
+            if not validation['valid']:
+                return {
+                    'match': False,
+                    'error': validation['error'],
+                    'error_code': validation.get('error_code', 'POOR_IMAGE_QUALITY'),
+                    'error_details': validation.get('details', {})
+                }
+
+            image = decoded.image
+            should_check_spoofing = enable_anti_spoofing if enable_anti_spoofing is not None else True
+            spoof_method = anti_spoofing_method or self._anti_spoofing_method
+
+            check_deadline(STAGE_DETECTION)
+            spoof_future = None
+            if self.pipeline_pool is not None:
+                with stage("pipeline"):
+                    detection_result, spoof_result = self.pipeline_pool.analyze(
+                        decoded, spoof_method=spoof_method if should_check_spoofing else None
+                    )
+                if spoof_result is not None:
+                    spoof_future = _completed(spoof_result)
+            else:
+                with stage("detect"):
+                    detection_result = self.detector.detect_single_face(image)
+            if not detection_result['success']:
+                return {
+                    'match': False,
+                    'error': detection_result['error_message'],
+                    'error_code': detection_result['error_code'],
+                    'error_details': {
+                        'detected_faces_count': detection_result['detected_faces_count'],
+                        'faces': detection_result.get('faces', [])
+                    }
+                }
+
+            face_data = detection_result['face']
+
+            check_deadline(STAGE_ANTI_SPOOFING)
+            if self.pipeline_pool is None and should_check_spoofing:
+                face_crop, spoof_image, spoof_bbox = self._spoof_region(decoded, face_data['bbox'])
+                if face_crop is not None:
+                    spoof_future = _submit(
+                        _in_stage,
+                        "anti_spoofing",
+                        self._check_anti_spoofing,
+                        face_crop,
+                        spoof_method,
+                        spoof_image,
+                        spoof_bbox,
+                    )
+
+            # The gallery search runs here while anti-spoofing runs on the pool
+            with stage("search"):
+                candidates = self.gallery.identify(company_id, face_data['embedding'], top_k=top_k)
+
+            face_detection = {
+                'bbox': face_data['bbox'],
+                'confidence': face_data['confidence'],
+                'score': face_data['score']
+            }
+            spoof_result = spoof_future.result() if spoof_future else None
+            if spoof_result is not None and not spoof_result.get('is_real', True):
+                return {
+                    'match': False,
+                    'error': f"Phát hiện tấn công giả mạo: {spoof_result.get('attack_type', 'unknown')}",
+                    'error_code': 'SPOOF_DETECTED',
+                    'anti_spoofing': spoof_result,
+                    'face_detection': face_detection
+                }
+
+            best = candidates[0] if candidates else None
+            matched = best is not None and best['similarity'] >= threshold
+            result = {
+                'match': matched,
+                'user_id': best['user_id'] if matched else None,
+                'similarity': best['similarity'] if best else 0.0,
+                'threshold': threshold,
+                'candidates': candidates,
+                'face_detection': face_detection
+            }
+            if spoof_result is not None:
+                result['anti_spoofing'] = spoof_result
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error in identify_face: {str(e)}")
+            return {
+                'match': False,
+                'error': f'Identification failed: {str(e)}',
+                'error_code': 'AI_SERVICE_ERROR',
+                'error_details': {
+                    'exception': str(e)
+                }
+            }
+    
     # =========================================================================
     # Utility Methods
     # =========================================================================
@@ -569,17 +1069,17 @@ class FaceService:
             Dict with landmarks and pose information
         """
         try:
-            validation = self.image_utils.validate_image(image_bytes)
+            decoded = self.image_utils.decode_image(image_bytes)
+            validation = decoded.validation
             if not validation['valid']:
                 return {
                     'success': False,
                     'error': validation['error']
                 }
             
-            image = self.image_utils.bytes_to_numpy(image_bytes)
-            image = self.image_utils.resize_image(image)
+            image = decoded.image
             
-            detection_result = self.detector.detect_single_face(image)
+            detection_result = self.detector.detect_single_face(image, with_embedding=False)
             
             if not detection_result['success']:
                 return {
@@ -620,28 +1120,53 @@ class FaceService:
                 'error': str(e)
             }
     
-    def cleanup_expired_sessions(self, max_age_seconds: int = 30):
-        """Clean up expired liveness sessions"""
-        import datetime
-        now = datetime.datetime.now()
-        expired_sessions = []
-        
-        for session_id, session in self._liveness_sessions.items():
-            if session.started_at:
-                elapsed = (now - session.started_at).total_seconds()
-                if elapsed > max_age_seconds:
-                    expired_sessions.append(session_id)
-        
-        for session_id in expired_sessions:
-            del self._liveness_sessions[session_id]
-        
-        if expired_sessions:
-            logger.info(f"Cleaned up {len(expired_sessions)} expired liveness sessions")
+    def cleanup_expired_sessions(self) -> int:
+        """Remove expired liveness sessions now (the store also sweeps in the background)"""
+        return self.liveness_sessions.sweep()
     
     # =========================================================================
     # Anti-Spoofing Methods
     # =========================================================================
     
+    def analyze_decoded(self, decoded: DecodedImage, spoof_method: Optional[str] = None) -> tuple:
+        """
+        Detection (with embedding) and optional anti-spoofing of a decoded frame
+        
+        Runs sequentially in the calling thread; this is the unit of work of a
+        pipeline worker process.
+        
+        Returns:
+            tuple: (detection_result, spoof_result or None)
+        """
+        detection_result = self.detector.detect_single_face(decoded.image)
+        spoof_result = None
+        if detection_result['success'] and spoof_method:
+            face_crop, spoof_image, spoof_bbox = self._spoof_region(decoded, detection_result['face']['bbox'])
+            if face_crop is not None:
+                spoof_result = self._check_anti_spoofing(face_crop, spoof_method, spoof_image, spoof_bbox)
+        return detection_result, spoof_result
+
+    @staticmethod
+    def _spoof_region(decoded: DecodedImage, bbox) -> tuple:
+        """
+        (face_crop, image, clamped bbox) for anti-spoofing.
+
+        Uses the shared decoded array unless the face is too small after a
+        reduced-scale JPEG decode, in which case ``image`` is the face region
+        (with the SFAS context) cut from a native-resolution decode.
+        """
+        x1, y1, x2, y2 = map(int, bbox)
+        h, w = decoded.image.shape[:2]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x2 <= x1 or y2 <= y1:
+            return None, decoded.image, (x1, y1, x2, y2)
+
+        image, (x1, y1, x2, y2) = decoded.region_for_face(
+            (x1, y1, x2, y2), ANTI_SPOOFING_MIN_FACE_PX, context=AntiSpoofingDetector.CROP_SCALE
+        )
+        return image[y1:y2, x1:x2], image, (x1, y1, x2, y2)
+
     def _check_anti_spoofing(
         self,
         face_crop: np.ndarray,
@@ -659,61 +1184,39 @@ class FaceService:
         def _sfas():
             if not self.anti_spoofing:
                 return None
-            if full_image is not None and bbox is not None:
-                return self.anti_spoofing.predict(full_image, bbox=bbox)
-            return self.anti_spoofing.predict(face_crop)
+            with stage(STAGE_SFAS):
+                if full_image is not None and bbox is not None:
+                    return self.anti_spoofing.predict(full_image, bbox=bbox)
+                return self.anti_spoofing.predict(face_crop)
+
+        def _texture():
+            with stage(STAGE_TEXTURE):
+                return self.texture_analyzer.comprehensive_check(face_crop)
 
         if method == "sfas":
             sfas_result = _sfas()
             if sfas_result is not None:
                 return sfas_result
             # Fallback to texture if SFAS not available
-            return self.texture_analyzer.comprehensive_check(face_crop)
+            return _texture()
 
         elif method == "texture":
             if self.texture_analyzer:
-                return self.texture_analyzer.comprehensive_check(face_crop)
+                return _texture()
             else:
                 return {'is_real': True, 'confidence': 0.0, 'error': 'TextureAnalyzer not initialized'}
 
         else:  # hybrid
-            # Run both methods and combine. Fail-closed: if EITHER detector
-            # flags the face as fake, reject it. The previous logic trusted
-            # texture alone when its confidence exceeded 0.85, which let
-            # high-quality printed photos through.
-            texture_result = (
-                self.texture_analyzer.comprehensive_check(face_crop)
-                if self.texture_analyzer else None
-            )
-            sfas_result = _sfas()
-
-            if sfas_result and texture_result:
-                sfas_real = sfas_result.get('is_real', True)
-                texture_real = texture_result.get('is_real', True)
-                is_real = sfas_real and texture_real
-                if not sfas_real:
-                    attack_type = sfas_result.get('attack_type', 'unknown')
-                elif not texture_real:
-                    attack_type = texture_result.get('attack_type', 'unknown')
-                else:
-                    attack_type = 'none'
-                return {
-                    'is_real': is_real,
-                    'confidence': min(
-                        sfas_result.get('confidence', 0.0),
-                        texture_result.get('confidence', 0.0),
-                    ),
-                    'attack_type': attack_type,
-                    'method': 'SFAS+Texture',
-                    'sfas': sfas_result,
-                    'texture': texture_result,
-                }
-            if sfas_result:
-                return sfas_result
-            if texture_result:
-                return texture_result
-            return {'is_real': True, 'confidence': 0.0, 'error': 'No anti-spoofing method available'}
+            # Fail-closed cascade: stages run in ANTI_SPOOFING_CASCADE_ORDER and
+            # the remaining ones are skipped as soon as one flags the face as fake.
+            stages = {}
+            if self.texture_analyzer:
+                stages[STAGE_TEXTURE] = _texture
+            if self.anti_spoofing:
+                stages[STAGE_SFAS] = _sfas
+            return self.anti_spoofing_cascade.run(stages)
     
+    @operation_scope("anti_spoofing_check")
     def check_anti_spoofing_only(
         self,
         image_bytes: bytes,
@@ -732,8 +1235,10 @@ class FaceService:
             Anti-spoofing result dict
         """
         try:
-            # Validate image
-            validation = self.image_utils.validate_image(image_bytes)
+            # Validate and decode image (single pass)
+            with stage("decode"):
+                decoded = self.image_utils.decode_image(image_bytes)
+            validation = decoded.validation
             if not validation['valid']:
                 return {
                     'is_real': False,
@@ -741,12 +1246,12 @@ class FaceService:
                     'error_code': 'INVALID_IMAGE'
                 }
             
-            # Convert to numpy
-            image = self.image_utils.bytes_to_numpy(image_bytes)
-            image = self.image_utils.resize_image(image)
+            image = decoded.image
             
             # Detect face
-            detection_result = self.detector.detect_single_face(image)
+            check_deadline(STAGE_DETECTION)
+            with stage("detect"):
+                detection_result = self.detector.detect_single_face(image, with_embedding=False)
             
             if not detection_result['success']:
                 return {
@@ -757,17 +1262,12 @@ class FaceService:
             
             # Crop face
             face_data = detection_result['face']
-            bbox = face_data['bbox']
-            x1, y1, x2, y2 = map(int, bbox)
-            
-            h, w = image.shape[:2]
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(w, x2), min(h, y2)
-            
-            face_crop = image[y1:y2, x1:x2]
+            face_crop, spoof_image, spoof_bbox = self._spoof_region(decoded, face_data['bbox'])
 
             # Run anti-spoofing
-            result = self._check_anti_spoofing(face_crop, method, image, (x1, y1, x2, y2))
+            check_deadline(STAGE_ANTI_SPOOFING)
+            with stage("anti_spoofing"):
+                result = self._check_anti_spoofing(face_crop, method, spoof_image, spoof_bbox)
             result['face_detection'] = {
                 'bbox': face_data['bbox'],
                 'confidence': face_data['confidence']
@@ -775,6 +1275,8 @@ class FaceService:
             
             return result
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error in check_anti_spoofing_only: {str(e)}")
             return {
@@ -790,6 +1292,7 @@ class FaceService:
             'default_method': self._anti_spoofing_method,
             'sfas_available': self.anti_spoofing is not None,
             'texture_available': self.texture_analyzer is not None,
-            'sfas_info': self.anti_spoofing.get_model_info() if self.anti_spoofing else None
+            'sfas_info': self.anti_spoofing.get_model_info() if self.anti_spoofing else None,
+            'cascade': self.anti_spoofing_cascade.get_stats()
         }
 
@@ -0,0 +1,366 @@
+"""
+Bounded, priority-aware executor for blocking face inference called from
+async handlers.
+
+The face pipeline is synchronous (hundreds of milliseconds of CPU per
+request). Running it directly inside an ``async def`` handler blocks the
+event loop, so every other request, ``/health`` included, stalls behind it.
+``InferenceExecutor.run`` moves the call onto dedicated worker threads and
+applies admission control:
+
+- at most ``workers`` calls run at once, and at most ``max_queue`` more wait;
+  beyond that a call is rejected immediately (``InferenceOverloaded``)
+- a queued call that has not started within ``max_wait_s`` is dropped
+  instead of being run for a client that has likely given up
+
+Calls carry a priority class. Check-in traffic (verify / identify /
+liveness) is ``critical``; registration is ``standard``; diagnostics such as
+``/anti-spoofing/check`` are ``background``. Workers always take the oldest
+call of the highest non-empty class, with three guards:
+
+- ``reserved_workers`` threads are kept for critical calls only, so a bulk
+  registration drive can never occupy every thread
+- ``critical_reserve`` queue places are kept for critical calls only: the
+  standard and background classes together may fill at most
+  ``max_queue - critical_reserve`` of the queue (and each at most half of
+  it), so a registration flood is rejected while check-ins are still
+  admitted
+- starvation guard: a call that has waited longer than ``starvation_s`` is
+  served next regardless of its class
+
+Rejections carry a ``retry_after`` estimate (seconds) computed from the
+current backlog and the recent average service time.
+
+A call made inside ``deadline_scope`` carries that deadline: it is dropped
+unstarted once the deadline passes, the awaiting handler gets
+``DeadlineExceeded`` at the deadline, and the caller's context (deadline
+included) is copied into the worker thread so the pipeline can stop between
+stages.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.utils.deadline import STAGE_QUEUE, DeadlineExceeded, current_deadline, dropped, expired
+from app.utils.metrics import REGISTRY
+from app.utils.stage_timer import record_stage
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CRITICAL = "critical"
+PRIORITY_STANDARD = "standard"
+PRIORITY_BACKGROUND = "background"
+# Highest first
+PRIORITY_CLASSES = (PRIORITY_CRITICAL, PRIORITY_STANDARD, PRIORITY_BACKGROUND)
+
+_queue_wait_seconds = REGISTRY.histogram(
+    "inference_queue_wait_seconds",
+    "Time a blocking inference call waited for an executor thread",
+)
+_service_seconds = REGISTRY.histogram(
+    "inference_service_seconds",
+    "Executor time of one blocking inference call",
+)
+_rejected_total = REGISTRY.counter(
+    "inference_rejected_total",
+    "Inference calls rejected by admission control",
+)
+_promoted_total = REGISTRY.counter(
+    "inference_starvation_promotions_total",
+    "Queued inference calls served ahead of higher classes by the starvation guard",
+)
+_queue_depth = REGISTRY.gauge(
+    "inference_queue_depth", "Admitted inference calls waiting for a thread",
+)
+_in_flight = REGISTRY.gauge(
+    "inference_in_flight", "Inference calls currently running",
+)
+
+
+class InferenceOverloaded(Exception):
+    """Raised when a call is not admitted (queue full or waited too long)."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Inference executor overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "priority", "enqueued", "deadline", "context", "future")
+
+    def __init__(self, fn, args, kwargs, priority: str) -> None:
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.deadline = current_deadline()
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+
+
+class InferenceExecutor:
+    """
+    Worker threads with a bounded, per-class admission queue for blocking inference.
+
+    Usage:
+        executor = InferenceExecutor(workers=4, max_queue=32, reserved_workers=1)
+        result = await executor.run(face_service.verify_face, image_bytes, ..., priority="critical")
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        max_wait_s: Optional[float] = None,
+        name: str = "inference",
+        reserved_workers: int = 0,
+        starvation_s: Optional[float] = None,
+        critical_reserve: Optional[int] = None,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait_s = max_wait_s if max_wait_s and max_wait_s > 0 else None
+        self.name = name
+        # Non-critical calls always get at least one thread
+        self.reserved_workers = min(max(0, int(reserved_workers)), self.workers - 1)
+        self.starvation_s = starvation_s if starvation_s and starvation_s > 0 else None
+        # Queue places only critical calls may take (default: a quarter of the queue)
+        if critical_reserve is None:
+            critical_reserve = self.max_queue // 4 if self.max_queue >= 2 else 0
+        self.critical_reserve = min(max(0, int(critical_reserve)), self.max_queue)
+        # Critical calls are bounded by the overall capacity only
+        self.queue_limits = {
+            cls: max(1, self.max_queue // 2) for cls in PRIORITY_CLASSES if cls != PRIORITY_CRITICAL
+        }
+        # Standard + background together
+        self.noncritical_limit = max(1, self.max_queue - self.critical_reserve)
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Job]] = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._admitted = 0   # queued + running
+        self._running = 0
+        self._running_noncritical = 0
+        self._closed = False
+        # Exponential moving average of service time, for Retry-After
+        self._avg_service_s = 0.2
+
+        # Started on the first call, so an executor built at import time
+        # survives the pre-fork launcher's fork (threads are not inherited)
+        self._threads: List[threading.Thread] = []
+
+    def _start_workers(self) -> None:
+        """Start the worker threads (lock held)."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._admitted - self._running)
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (>= 1)."""
+        backlog = self._admitted / self.workers
+        return max(1, math.ceil(backlog * self._avg_service_s))
+
+    def _reject(self, reason: str, priority: str) -> InferenceOverloaded:
+        _rejected_total.inc(labels={"reason": reason, "priority": priority})
+        return InferenceOverloaded(reason, self.retry_after())
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: str = PRIORITY_STANDARD,
+        **kwargs: Any,
+    ) -> Any:
+        """Run ``fn(*args, **kwargs)`` on the executor, or raise InferenceOverloaded."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown inference priority '{priority}'. Must be one of: {list(PRIORITY_CLASSES)}")
+
+        job = _Job(fn, args, kwargs, priority)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inference executor is shut down")
+            if not self._threads:
+                self._start_workers()
+            if self._admitted >= self.capacity:
+                raise self._reject("queue_full", priority)
+            queue = self._queues[priority]
+            if priority != PRIORITY_CRITICAL and (
+                self._waiting(priority) >= self.queue_limits[priority]
+                or self._waiting_noncritical() >= self.noncritical_limit
+            ):
+                raise self._reject("queue_full", priority)
+            self._admitted += 1
+            queue.append(job)
+            self._publish_depth(priority)
+            self._cond.notify_all()
+        job.future.add_done_callback(lambda future: self._discard(job) if future.cancelled() else None)
+
+        # Cancelling the await cancels a job that has not started yet; it
+        # leaves the queue at once, so it no longer counts toward capacity
+        waiter = asyncio.wrap_future(job.future)
+        if job.deadline is None:
+            return await waiter
+        try:
+            return await asyncio.wait_for(waiter, timeout=max(0.0, job.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            if job.future.cancel():
+                raise dropped(STAGE_QUEUE)
+            # Already running: the pipeline stops (and counts) at its next stage check
+            raise DeadlineExceeded("completion")
+
+    def _discard(self, job: _Job) -> None:
+        """Drop a cancelled job from its queue and free its slot (no-op once a worker took it)."""
+        with self._cond:
+            try:
+                self._queues[job.priority].remove(job)
+            except ValueError:
+                return   # already picked up (the worker frees the slot) or shut down
+            self._admitted -= 1
+            self._publish_depth(job.priority)
+            self._cond.notify_all()
+
+    def _free_noncritical(self) -> int:
+        return max(0, self.workers - self.reserved_workers - self._running_noncritical)
+
+    def _waiting(self, priority: str) -> int:
+        """Queued calls of a non-critical class that no free thread can pick up yet (lock held)."""
+        return len(self._queues[priority]) - self._free_noncritical()
+
+    def _waiting_noncritical(self) -> int:
+        """Same, over the standard and background classes together (lock held)."""
+        queued = sum(len(self._queues[cls]) for cls in self.queue_limits)
+        return queued - self._free_noncritical()
+
+    # ------------------------------------------------------------------
+    # Dispatch (worker threads)
+    # ------------------------------------------------------------------
+    def _can_start(self, priority: str) -> bool:
+        if priority == PRIORITY_CRITICAL:
+            return True
+        return self._running_noncritical < self.workers - self.reserved_workers
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pop the job to run next, or None if nothing may start now (lock held)."""
+        eligible = [cls for cls in PRIORITY_CLASSES if self._queues[cls] and self._can_start(cls)]
+        if not eligible:
+            return None
+
+        chosen = eligible[0]
+        if self.starvation_s is not None and len(eligible) > 1:
+            now = time.perf_counter()
+            oldest = min(eligible, key=lambda cls: self._queues[cls][0].enqueued)
+            if oldest != chosen and now - self._queues[oldest][0].enqueued > self.starvation_s:
+                _promoted_total.inc(labels={"priority": oldest})
+                chosen = oldest
+
+        job = self._queues[chosen].popleft()
+        self._publish_depth(chosen)
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running += 1
+                if job.priority != PRIORITY_CRITICAL:
+                    self._running_noncritical += 1
+                _in_flight.set(self._running)
+            try:
+                self._execute(job)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    if job.priority != PRIORITY_CRITICAL:
+                        self._running_noncritical -= 1
+                    self._admitted -= 1
+                    _in_flight.set(self._running)
+                    self._cond.notify_all()
+
+    def _execute(self, job: _Job) -> None:
+        if not job.future.set_running_or_notify_cancel():
+            return
+        if expired(job.deadline):
+            job.future.set_exception(dropped(STAGE_QUEUE))
+            return
+        labels = {"priority": job.priority}
+        started = time.perf_counter()
+        waited = started - job.enqueued
+        _queue_wait_seconds.observe(waited, labels)
+        job.context.run(record_stage, STAGE_QUEUE, waited)
+        if self.max_wait_s is not None and waited > self.max_wait_s:
+            job.future.set_exception(self._reject("queue_timeout", job.priority))
+            return
+        try:
+            result = job.context.run(job.fn, *job.args, **job.kwargs)
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+        finally:
+            elapsed = time.perf_counter() - started
+            _service_seconds.observe(elapsed, labels)
+            with self._cond:
+                self._avg_service_s = 0.9 * self._avg_service_s + 0.1 * elapsed
+
+    def _publish_depth(self, priority: str) -> None:
+        _queue_depth.set(len(self._queues[priority]), {"priority": priority})
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = {cls: len(q) for cls, q in self._queues.items()}
+        return {
+            "workers": self.workers,
+            "reserved_workers": self.reserved_workers,
+            "max_queue": self.max_queue,
+            "critical_reserve": self.critical_reserve,
+            "max_wait_s": self.max_wait_s,
+            "starvation_s": self.starvation_s,
+            "running": self._running,
+            "queue_depth": self.queue_depth,
+            "queued": queued,
+            "avg_service_ms": round(self._avg_service_s * 1000, 1),
+            "rejected": {
+                cls: {
+                    reason: int(_rejected_total.value({"reason": reason, "priority": cls}))
+                    for reason in ("queue_full", "queue_timeout")
+                }
+                for cls in PRIORITY_CLASSES
+            },
+            "starvation_promotions": {
+                cls: int(_promoted_total.value({"priority": cls})) for cls in PRIORITY_CLASSES
+            },
+        }
+
+    def shutdown(self) -> None:
+        """Stop the workers; queued calls that never started are cancelled."""
+        with self._cond:
+            self._closed = True
+            pending = [job for q in self._queues.values() for job in q]
+            for cls, q in self._queues.items():
+                q.clear()
+                self._publish_depth(cls)
+            self._admitted -= len(pending)
+            self._cond.notify_all()
+        for job in pending:
+            job.future.cancel()
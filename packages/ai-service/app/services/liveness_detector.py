@@ -6,7 +6,7 @@ Uses InsightFace landmarks to estimate head pose and detect eye blinks.
 import math
 import random
 import logging
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, Sequence
 from dataclasses import dataclass
 from enum import Enum
 
@@ -150,7 +150,8 @@ class LivenessDetector:
         Calculate Eye Aspect Ratio (EAR) for blink detection
         
         Args:
-            eye_landmarks: 6 eye landmark points
+            eye_landmarks: 6 eye contour points (corner, 2 upper lid, corner,
+                2 lower lid), or 4 points (left, top, right, bottom)
             
         Returns:
             EAR value (blink when < threshold)
@@ -158,6 +159,15 @@ class LivenessDetector:
         try:
             import numpy as np
             
+            if len(eye_landmarks) >= 6:
+                p = np.array(eye_landmarks[:6], dtype=np.float64)
+                # EAR = (|p2-p6| + |p3-p5|) / (2 * |p1-p4|)
+                horizontal = np.linalg.norm(p[0] - p[3])
+                if horizontal > 0:
+                    vertical = np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])
+                    return round(float(vertical / (2 * horizontal)), 3)
+                return 0.3
+            
             # Eye landmarks order: [0]left, [1]top, [2]right, [3]bottom, [4]left_corner, [5]right_corner
             # But InsightFace provides 5 points, adjust accordingly
             if len(eye_landmarks) >= 4:
@@ -212,14 +222,19 @@ class LivenessDetector:
         return False, 0.0
     
     @classmethod
-    def generate_challenge(cls) -> Tuple[LivenessChallenge, Dict[str, Any]]:
+    def generate_challenge(
+        cls, choices: Optional[Sequence[LivenessChallenge]] = None
+    ) -> Tuple[LivenessChallenge, Dict[str, Any]]:
         """
         Generate a random liveness challenge
         
+        Args:
+            choices: Challenges to pick from (default: all)
+        
         Returns:
             Tuple of (challenge, challenge_data for frontend)
         """
-        challenge = random.choice(list(LivenessChallenge))
+        challenge = random.choice(list(choices or LivenessChallenge))
         
         challenge_data = {
             "type": challenge.value,
@@ -479,9 +494,9 @@ class LivenessSession:
         self.started_at = None
         self.completed_at = None
     
-    def start_challenge(self) -> Dict[str, Any]:
-        """Start a new liveness challenge"""
-        self.challenge, self.challenge_data = LivenessDetector.generate_challenge()
+    def start_challenge(self, choices: Optional[Sequence[LivenessChallenge]] = None) -> Dict[str, Any]:
+        """Start a new liveness challenge (drawn from ``choices`` when given)"""
+        self.challenge, self.challenge_data = LivenessDetector.generate_challenge(choices)
         self.started_at = __import__('datetime').datetime.now()
         self.blink_sequence = []
         
@@ -564,3 +579,31 @@ class LivenessSession:
     def get_timeout(self) -> int:
         """Get timeout for current challenge"""
         return LivenessDetector.CHALLENGE_TIMEOUTS.get(self.challenge, 5)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe snapshot of the session (for shared session stores)"""
+        pose = self.baseline_pose
+        return {
+            "challenge": self.challenge.value if self.challenge else None,
+            "challenge_data": self.challenge_data,
+            "baseline_pose": [float(pose.yaw), float(pose.pitch), float(pose.roll)] if pose else None,
+            "blink_sequence": [[float(v) for v in point] for point in self.blink_sequence],
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LivenessSession":
+        """Rebuild a session from ``to_dict`` output"""
+        from datetime import datetime
+
+        session = cls()
+        session.challenge = LivenessChallenge(data["challenge"]) if data.get("challenge") else None
+        session.challenge_data = data.get("challenge_data") or {}
+        pose = data.get("baseline_pose")
+        session.baseline_pose = HeadPose(*pose) if pose else None
+        session.blink_sequence = [list(point) for point in data.get("blink_sequence") or []]
+        started_at, completed_at = data.get("started_at"), data.get("completed_at")
+        session.started_at = datetime.fromisoformat(started_at) if started_at else None
+        session.completed_at = datetime.fromisoformat(completed_at) if completed_at else None
+        return session
@@ -0,0 +1,306 @@
+"""
+Storage for active liveness sessions.
+
+A liveness session lives from ``/liveness/session`` until the challenge is
+verified, which takes a few seconds. Abandoned sessions must still go away,
+so every session is stored with a fixed TTL from its creation:
+
+- ``MemorySessionStore`` keeps sessions in a dict plus a min-heap of
+  ``(expires_at, session_id)``. Expiry pops only the entries that are due
+  (O(log n) each) instead of scanning every session, and a daemon sweeper
+  thread runs it every ``sweep_interval`` seconds.
+- ``RedisSessionStore`` keeps each session as a JSON string with a native
+  Redis TTL, so several uvicorn workers or replicas share sessions. A sorted
+  set of (session id, expiry) next to the keys gives the active count
+  without scanning the keyspace.
+
+``pop`` reads and removes a session in one step (a MULTI transaction on
+Redis), so a session is consumed by exactly one request even when several
+workers race for it. The Redis calls are blocking: callers on the event
+loop run them with ``asyncio.to_thread``.
+
+``create_session_store()`` picks the backend from ``SESSION_STORAGE_TYPE``.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.liveness_detector import LivenessSession
+from app.utils.config import (
+    LIVENESS_SESSION_TTL,
+    REDIS_URL,
+    SESSION_CLEANUP_INTERVAL,
+    SESSION_STORAGE_TYPE,
+)
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "liveness:session:"
+
+_expired_total = REGISTRY.counter(
+    "liveness_sessions_expired_total",
+    "Liveness sessions removed after their TTL without being completed",
+)
+_active_sessions = REGISTRY.gauge(
+    "liveness_sessions_active", "Liveness sessions currently stored (read on scrape)",
+)
+
+
+class LivenessSessionStore(ABC):
+    """
+    Session id -> LivenessSession with a fixed TTL from creation.
+
+    ``save`` writes back a mutated session (e.g. after the baseline capture)
+    without extending its lifetime; it is a no-op for sessions that have
+    already expired or been deleted.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+
+    @abstractmethod
+    def create(self, session_id: str, session: LivenessSession) -> None: ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[LivenessSession]: ...
+
+    @abstractmethod
+    def save(self, session_id: str, session: LivenessSession) -> None: ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+    @abstractmethod
+    def pop(self, session_id: str) -> Optional[LivenessSession]:
+        """Remove and return a live session; None if another caller got it first."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions now; returns how many were removed."""
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "active": len(self),
+            "ttl_seconds": self.ttl_seconds,
+            "expired": int(_expired_total.value({"backend": self.backend})),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(LivenessSessionStore):
+    """In-process store with heap-ordered expiry and a lazy background sweeper."""
+
+    backend = "memory"
+
+    def __init__(self, ttl_seconds: float, sweep_interval: Optional[float] = None) -> None:
+        super().__init__(ttl_seconds)
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, Tuple[float, LivenessSession]] = {}
+        # (expires_at, session_id); entries whose expiry no longer matches
+        # self._sessions (deleted or re-created ids) are skipped when popped
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def create(self, session_id: str, session: LivenessSession) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._sessions[session_id] = (expires_at, session)
+            heapq.heappush(self._heap, (expires_at, session_id))
+        self._ensure_sweeper()
+
+    def get(self, session_id: str) -> Optional[LivenessSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._sessions[session_id]
+                _expired_total.inc(labels={"backend": self.backend})
+                return None
+            return entry[1]
+
+    def save(self, session_id: str, session: LivenessSession) -> None:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], session)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def pop(self, session_id: str) -> Optional[LivenessSession]:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            _expired_total.inc(labels={"backend": self.backend})
+            return None
+        return entry[1]
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, session_id = heapq.heappop(self._heap)
+                entry = self._sessions.get(session_id)
+                if entry is not None and entry[0] == expires_at:
+                    del self._sessions[session_id]
+                    removed += 1
+            # Stale heap entries (completed sessions) would otherwise pile up
+            # under a steady stream of sessions that are all finished in time
+            if len(self._heap) > 2 * len(self._sessions) + 64:
+                self._heap = [(exp, sid) for sid, (exp, _) in self._sessions.items()]
+                heapq.heapify(self._heap)
+        if removed:
+            _expired_total.inc(removed, labels={"backend": self.backend})
+            logger.info(f"Cleaned up {removed} expired liveness sessions")
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _ensure_sweeper(self) -> None:
+        if self.sweep_interval is None or self.sweep_interval <= 0 or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="liveness-session-sweeper", daemon=True
+            )
+        self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:  # pragma: no cover - keep the sweeper alive
+                logger.error(f"Liveness session sweep failed: {str(e)}")
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+class RedisSessionStore(LivenessSessionStore):
+    """
+    Shared store on Redis: one JSON string per session with a native TTL.
+
+    ``client`` is a ``redis.Redis`` (or compatible) instance; the calls used
+    are ``set`` (px / xx / keepttl), ``get``, ``delete``, ``zadd``, ``zrem``,
+    ``zremrangebyscore``, ``zcard`` and ``pipeline``.
+    """
+
+    backend = "redis"
+
+    def __init__(self, client: Any, ttl_seconds: float, prefix: str = REDIS_KEY_PREFIX) -> None:
+        super().__init__(ttl_seconds)
+        self.client = client
+        self.prefix = prefix
+        # session id -> expiry (epoch ms); the active count without a SCAN
+        self.index_key = f"{prefix}_index"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    @staticmethod
+    def _dumps(session: LivenessSession) -> str:
+        return json.dumps(session.to_dict(), separators=(",", ":"))
+
+    @staticmethod
+    def _loads(raw: Any) -> Optional[LivenessSession]:
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return LivenessSession.from_dict(json.loads(raw))
+
+    def create(self, session_id: str, session: LivenessSession) -> None:
+        ttl_ms = int(self.ttl_seconds * 1000)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(self._key(session_id), self._dumps(session), px=ttl_ms)
+        pipe.zadd(self.index_key, {session_id: self._now_ms() + ttl_ms})
+        pipe.execute()
+
+    def get(self, session_id: str) -> Optional[LivenessSession]:
+        return self._loads(self.client.get(self._key(session_id)))
+
+    def save(self, session_id: str, session: LivenessSession) -> None:
+        # xx: never resurrect an expired/deleted session; keepttl: no extension
+        self.client.set(self._key(session_id), self._dumps(session), xx=True, keepttl=True)
+
+    def delete(self, session_id: str) -> None:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key(session_id))
+        pipe.zrem(self.index_key, session_id)
+        pipe.execute()
+
+    def pop(self, session_id: str) -> Optional[LivenessSession]:
+        # GET + DEL in one MULTI: of two workers racing, only one sees the value
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(self._key(session_id))
+        pipe.delete(self._key(session_id))
+        pipe.zrem(self.index_key, session_id)
+        raw, _, _ = pipe.execute()
+        return self._loads(raw)
+
+    def sweep(self) -> int:
+        # Redis expires the keys itself; drop their index entries
+        removed = int(self.client.zremrangebyscore(self.index_key, "-inf", self._now_ms()))
+        if removed:
+            _expired_total.inc(removed, labels={"backend": self.backend})
+        return removed
+
+    def __len__(self) -> int:
+        self.sweep()
+        return int(self.client.zcard(self.index_key))
+
+    def close(self) -> None:
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+def create_session_store(
+    storage_type: str = SESSION_STORAGE_TYPE,
+    redis_url: str = REDIS_URL,
+    ttl_seconds: float = LIVENESS_SESSION_TTL,
+) -> LivenessSessionStore:
+    """Build the configured store; falls back to memory when Redis is unavailable."""
+    store = _build_session_store(storage_type, redis_url, ttl_seconds)
+    _active_sessions.set_callback(store.__len__)
+    return store
+
+
+def _build_session_store(storage_type: str, redis_url: str, ttl_seconds: float) -> LivenessSessionStore:
+    if storage_type.lower() == "redis":
+        try:
+            import redis
+        except ImportError:
+            logger.warning(
+                "SESSION_STORAGE_TYPE=redis but the redis package is not installed; "
+                "liveness sessions stay in process memory"
+            )
+        else:
+            logger.info(f"Liveness sessions stored in Redis ({redis_url})")
+            return RedisSessionStore(redis.Redis.from_url(redis_url), ttl_seconds)
+    return MemorySessionStore(ttl_seconds, sweep_interval=SESSION_CLEANUP_INTERVAL)
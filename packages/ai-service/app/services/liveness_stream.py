@@ -0,0 +1,223 @@
+"""
+Incremental liveness verification over a frame stream.
+
+The HTTP flow sees exactly two frames (baseline, response), so a blink can
+never be observed and the user waits on two uploads. Over
+``/liveness/stream/{session_id}`` the client streams low-resolution frames
+instead; a subset of them (every ``frame_stride``-th, and never more than
+one in flight) goes through face detection only and its landmarks are
+fed to ``LivenessStreamTracker``:
+
+- the first frame with a face sets the baseline pose (unless the session
+  already has one from ``/liveness/baseline``)
+- each later frame updates the pose and the eye aspect ratio (EAR) in O(1);
+  the challenge is checked on every frame and the verdict is returned as
+  soon as it is satisfied, without waiting for the challenge timeout
+
+The blink test is the one ``LivenessDetector.detect_blink`` applies to a
+whole sequence (EAR below ``EAR_THRESHOLD``, then back above 1.3x that
+minimum), evaluated as the frames arrive. EAR needs eyelid contours; the
+detector returns the 5-point kps (one point per eye), so a
+session taken over by a stream is re-drawn from ``STREAM_CHALLENGES`` if it
+was given BLINK. ``update(landmarks, eyes=...)`` computes the blink from
+6-point eye contours when a landmark model supplies them.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.liveness_detector import (
+    HeadPose,
+    LivenessChallenge,
+    LivenessDetector,
+    LivenessResult,
+    LivenessSession,
+)
+from app.utils.metrics import REGISTRY
+
+_frames_total = REGISTRY.counter(
+    "liveness_stream_frames_total",
+    "Frames received on liveness streams, by what happened to them",
+)
+_duration_seconds = REGISTRY.histogram(
+    "liveness_stream_duration_seconds",
+    "Time from stream start to verdict",
+)
+
+# Blink is reported once EAR recovers to this multiple of the closed minimum
+BLINK_RECOVERY_RATIO = 1.3
+# Same minimum as verify_challenge for a blink sequence
+BLINK_MIN_FRAMES = 3
+# Challenges a stream can verify from 5-point kps alone
+STREAM_CHALLENGES = tuple(c for c in LivenessChallenge if c != LivenessChallenge.BLINK)
+
+
+def _pose_dict(pose: Optional[HeadPose]) -> Optional[Dict[str, float]]:
+    if pose is None:
+        return None
+    return {"yaw": pose.yaw, "pitch": pose.pitch, "roll": pose.roll}
+
+
+class LivenessStreamTracker:
+    """
+    Per-connection liveness state.
+
+    Usage:
+        tracker = LivenessStreamTracker(session, frame_stride=2)
+        if tracker.accept_frame():           # for every received frame
+            ...detect landmarks...
+            event = tracker.update(landmarks)  # or tracker.no_face()
+            if tracker.verdict: ...
+    """
+
+    def __init__(self, session: LivenessSession, frame_stride: int = 1) -> None:
+        self.session = session
+        self.frame_stride = max(1, int(frame_stride))
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_without_face = 0
+        self.started = time.perf_counter()
+        self.current_pose: Optional[HeadPose] = None
+        self.verdict: Optional[Dict[str, Any]] = None
+        self._best: Optional[LivenessResult] = None
+        # Running EAR state for the blink challenge
+        self._ear_samples = 0
+        self._ear_closed_min: Optional[float] = None
+        self._ear_max = 0.0
+
+    @property
+    def challenge(self) -> LivenessChallenge:
+        return self.session.challenge
+
+    def remaining(self) -> float:
+        """Seconds left before the challenge times out."""
+        if not self.session.started_at:
+            return 0.0
+        elapsed = (__import__('datetime').datetime.now() - self.session.started_at).total_seconds()
+        return max(0.0, self.session.get_timeout() - elapsed)
+
+    def accept_frame(self, busy: bool = False) -> bool:
+        """Count a received frame; True if it should be analysed."""
+        self.frames_received += 1
+        if self.verdict is not None or busy or (self.frames_received - 1) % self.frame_stride:
+            _frames_total.inc(labels={"outcome": "skipped"})
+            return False
+        return True
+
+    def no_face(self) -> Dict[str, Any]:
+        self.frames_processed += 1
+        self.frames_without_face += 1
+        _frames_total.inc(labels={"outcome": "no_face"})
+        return self._event("progress", face=False)
+
+    def update(self, landmarks: List, eyes: Optional[List[List]] = None) -> Dict[str, Any]:
+        """
+        Feed one analysed frame's 5-point landmarks; returns the event to send.
+
+        ``eyes`` holds the 6-point contour of each eye (needed for BLINK).
+        """
+        self.frames_processed += 1
+        _frames_total.inc(labels={"outcome": "processed"})
+        pose = LivenessDetector.calculate_head_pose(landmarks)
+        self.current_pose = pose
+
+        if self.session.baseline_pose is None:
+            self.session.baseline_pose = pose
+            event = self._event("baseline")
+            event["instruction"] = LivenessDetector.CHALLENGE_INSTRUCTIONS[self.challenge]
+            return event
+
+        if self.challenge == LivenessChallenge.BLINK:
+            result = self._update_blink(eyes)
+        else:
+            result = LivenessDetector.verify_challenge(self.challenge, self.session.baseline_pose, pose)
+
+        if self._best is None or result.confidence >= self._best.confidence:
+            self._best = result
+        if result.passed:
+            return self._finish(result)
+        return self._event("progress", face=True)
+
+    def _update_blink(self, eyes: Optional[List[List]]) -> LivenessResult:
+        if not eyes:
+            return LivenessResult(
+                success=True,
+                challenge=self.challenge.value,
+                passed=False,
+                error_message="Không lấy được đường viền mắt",
+            )
+        ear = sum(LivenessDetector.calculate_eye_aspect_ratio(eye) for eye in eyes) / len(eyes)
+        self._ear_samples += 1
+        self._ear_max = max(self._ear_max, ear)
+        if ear < LivenessDetector.EAR_THRESHOLD:
+            if self._ear_closed_min is None or ear < self._ear_closed_min:
+                self._ear_closed_min = ear
+            return LivenessResult(success=True, challenge=self.challenge.value, passed=False)
+
+        closed = self._ear_closed_min
+        passed = (
+            closed is not None
+            and self._ear_samples >= BLINK_MIN_FRAMES
+            and ear > closed * BLINK_RECOVERY_RATIO
+        )
+        confidence = min(1.0, (self._ear_max - closed) / 0.5) if passed else 0.0
+        return LivenessResult(
+            success=True,
+            challenge=self.challenge.value,
+            passed=passed,
+            confidence=round(confidence, 2),
+            error_message=None if passed else "Không phát hiện nháy mắt",
+        )
+
+    def timed_out(self) -> Dict[str, Any]:
+        """Verdict once the challenge time is up (or the client ended the stream)."""
+        if self._best is not None:
+            result = self._best
+        else:
+            result = LivenessResult(
+                success=self.session.baseline_pose is not None,
+                challenge=self.challenge.value,
+                passed=False,
+            )
+        if self.session.baseline_pose is None:
+            message = "Không phát hiện khuôn mặt"
+        else:
+            message = result.error_message or "Hết thời gian thực hiện thử thách"
+        return self._finish(
+            LivenessResult(
+                success=result.success,
+                challenge=result.challenge,
+                passed=False,
+                confidence=result.confidence,
+                error_message=message,
+            )
+        )
+
+    def _finish(self, result: LivenessResult) -> Dict[str, Any]:
+        self.session.completed_at = __import__('datetime').datetime.now()
+        elapsed = time.perf_counter() - self.started
+        _duration_seconds.observe(elapsed, {"passed": str(result.passed).lower()})
+        self.verdict = {
+            "type": "verdict",
+            "success": result.success,
+            "passed": result.passed,
+            "challenge": self.challenge.value,
+            "confidence": result.confidence,
+            "expected_pose": _pose_dict(self.session.baseline_pose),
+            "actual_pose": _pose_dict(self.current_pose),
+            "error_message": result.error_message,
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+        return self.verdict
+
+    def _event(self, event_type: str, face: bool = True) -> Dict[str, Any]:
+        return {
+            "type": event_type,
+            "face": face,
+            "pose": _pose_dict(self.current_pose) if face else None,
+            "baseline_pose": _pose_dict(self.session.baseline_pose),
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "remaining_ms": round(self.remaining() * 1000),
+        }
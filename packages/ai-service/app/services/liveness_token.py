@@ -0,0 +1,162 @@
+"""
+Stateless liveness challenge tokens.
+
+With ``LIVENESS_SESSION_MODE=token`` no session is stored on the server:
+``create_liveness_session`` returns an HMAC-SHA256 signed token that carries
+the session itself (challenge, challenge timeout, start time and, after the
+baseline call, the baseline pose). Baseline and verify requests send the
+token back and any worker can validate it with the shared
+``LIVENESS_TOKEN_SECRET`` and no lookup.
+
+Token format: ``base64url(json payload) + "." + base64url(hmac)``.
+
+Every token has a random nonce and is single-use: the nonce is recorded in
+a rotating Bloom filter once the step it authorises succeeds (a failed
+attempt, e.g. no face in the frame, may be retried with the same token),
+and a token whose nonce was already seen is rejected as a replay. The filter
+remembers nonces for at least the token lifetime. It lives in process
+memory, so it stops replays on the worker that used the token; a replay
+routed to another worker is still bounded by the token expiry and the
+challenge timeout.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from typing import Any, Dict, Tuple
+
+from app.services.liveness_detector import LivenessSession
+from app.utils.bloom_filter import RotatingBloomFilter
+from app.utils.config import (
+    LIVENESS_REPLAY_FILTER_CAPACITY,
+    LIVENESS_SESSION_TTL,
+    LIVENESS_TOKEN_SECRET,
+)
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_rejected_total = REGISTRY.counter(
+    "liveness_token_rejected_total",
+    "Liveness tokens rejected (bad signature, expired, replayed)",
+)
+
+
+class InvalidLivenessToken(Exception):
+    """Token cannot be used; ``error_code`` matches the session error codes."""
+
+    def __init__(self, error_code: str, reason: str) -> None:
+        super().__init__(reason)
+        self.error_code = error_code
+        self.reason = reason
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class LivenessTokenSigner:
+    """
+    Issues and validates signed liveness tokens.
+
+    Usage:
+        signer = LivenessTokenSigner(secret=b"...", ttl_seconds=30)
+        token = signer.issue(session_id, session)
+        session, nonce = signer.load(token, session_id)
+        ...
+        signer.mark_used(nonce)   # when the step succeeded
+    """
+
+    def __init__(
+        self,
+        secret: bytes,
+        ttl_seconds: float,
+        replay_capacity: int = 100_000,
+    ) -> None:
+        if not secret:
+            raise ValueError("Liveness token secret must not be empty")
+        self._secret = secret
+        self.ttl_seconds = float(ttl_seconds)
+        self._seen = RotatingBloomFilter(replay_capacity, rotate_seconds=self.ttl_seconds)
+
+    def _sign(self, body: bytes) -> bytes:
+        return hmac.new(self._secret, body, hashlib.sha256).digest()
+
+    def issue(self, session_id: str, session: LivenessSession) -> str:
+        """Token for the session's current state (a fresh nonce every time)."""
+        now = time.time()
+        payload = {
+            "sid": session_id,
+            "nonce": secrets.token_urlsafe(12),
+            "exp": round(now + self.ttl_seconds, 3),
+            "timeout": session.get_timeout(),
+            "session": session.to_dict(),
+        }
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return f"{body}.{_b64encode(self._sign(body.encode('ascii')))}"
+
+    def _reject(self, error_code: str, reason: str) -> InvalidLivenessToken:
+        _rejected_total.inc(labels={"reason": reason})
+        return InvalidLivenessToken(error_code, reason)
+
+    def decode(self, token: str, session_id: str) -> Dict[str, Any]:
+        """Verified payload of ``token`` (no replay check)."""
+        try:
+            body, signature = token.split(".", 1)
+            expected = self._sign(body.encode("ascii"))
+            if not hmac.compare_digest(_b64decode(signature), expected):
+                raise self._reject("INVALID_SESSION", "bad_signature")
+            payload = json.loads(_b64decode(body))
+            if not isinstance(payload, dict):
+                raise ValueError("payload is not an object")
+        except InvalidLivenessToken:
+            raise
+        except (ValueError, UnicodeError, binascii.Error):
+            raise self._reject("INVALID_SESSION", "malformed")
+        if payload.get("sid") != session_id:
+            raise self._reject("INVALID_SESSION", "session_mismatch")
+        if time.time() >= payload.get("exp", 0):
+            raise self._reject("SESSION_EXPIRED", "expired")
+        return payload
+
+    def load(self, token: str, session_id: str) -> Tuple[LivenessSession, str]:
+        """Validate an unused token; returns its session and nonce."""
+        payload = self.decode(token, session_id)
+        if payload["nonce"] in self._seen:
+            raise self._reject("INVALID_SESSION", "replayed")
+        return LivenessSession.from_dict(payload["session"]), payload["nonce"]
+
+    def mark_used(self, nonce: str) -> None:
+        """Record a token as used; raises if a concurrent request used it first."""
+        if self._seen.check_and_add(nonce):
+            raise self._reject("INVALID_SESSION", "replayed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "replay_filter": self._seen.get_stats(),
+            "rejected": {
+                reason: int(_rejected_total.value({"reason": reason}))
+                for reason in ("bad_signature", "malformed", "session_mismatch", "expired", "replayed")
+            },
+        }
+
+
+def create_token_signer() -> LivenessTokenSigner:
+    """Signer from LIVENESS_TOKEN_SECRET (a per-process random key when unset)."""
+    secret = LIVENESS_TOKEN_SECRET.encode("utf-8")
+    if not secret:
+        logger.warning(
+            "LIVENESS_TOKEN_SECRET not set; using a random per-process key, so liveness "
+            "tokens are only accepted by the worker that issued them"
+        )
+        secret = secrets.token_bytes(32)
+    return LivenessTokenSigner(secret, LIVENESS_SESSION_TTL, replay_capacity=LIVENESS_REPLAY_FILTER_CAPACITY)
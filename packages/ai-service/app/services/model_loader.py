@@ -1,5 +1,7 @@
 """Model loader for InsightFace models"""
 import os
+import threading
+import time
 from app.utils.config import MODEL_NAME, LOG_LEVEL, MODEL_ROOT
 import logging
 
@@ -12,10 +14,17 @@ os.environ.setdefault("INSIGHTFACE_HOME", MODEL_ROOT)
 insightface = None
 
 class ModelLoader:
-    """Singleton class to load and manage InsightFace models"""
+    """Singleton class to load and manage InsightFace models
+    
+    One FaceAnalysis (detection + recognition) is built per process. Flows
+    that need no embedding call its detection model directly
+    (``FaceDetector.detect_single_face(with_embedding=False)``) instead of
+    loading a second detection-only copy of the same network.
+    """
     
     _instance = None
     _app = None
+    _app_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -25,23 +34,26 @@ class ModelLoader:
     def load_model(self):
         """Load InsightFace model (will download if not exists)"""
         global insightface
-        if self._app is None:
-            try:
-                logger.info(f"Loading InsightFace model: {MODEL_NAME}")
-
-                # Import insightface only when needed
-                if insightface is None:
-                    import insightface
-
-                self._app = insightface.app.FaceAnalysis(
-                    name=MODEL_NAME,
-                    providers=['CPUExecutionProvider']
-                )
-                self._app.prepare(ctx_id=0, det_size=(320, 320))
-                logger.info("Model loaded successfully")
-            except Exception as e:
-                logger.error(f"Error loading model: {str(e)}")
-                raise
+        with self._app_lock:
+            if self._app is None:
+                try:
+                    logger.info(f"Loading InsightFace model: {MODEL_NAME}")
+                    started = time.perf_counter()
+
+                    # Import insightface only when needed
+                    if insightface is None:
+                        import insightface
+
+                    app = insightface.app.FaceAnalysis(
+                        name=MODEL_NAME,
+                        providers=['CPUExecutionProvider']
+                    )
+                    app.prepare(ctx_id=0, det_size=(320, 320))
+                    ModelLoader._app = app
+                    logger.info(f"Model loaded successfully in {(time.perf_counter() - started) * 1000:.0f} ms")
+                except Exception as e:
+                    logger.error(f"Error loading model: {str(e)}")
+                    raise
         return self._app
     
     def get_model(self):
@@ -49,25 +61,3 @@ class ModelLoader:
         if self._app is None:
             return self.load_model()
         return self._app
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
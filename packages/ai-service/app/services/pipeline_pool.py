@@ -0,0 +1,307 @@
+"""
+Process-pool execution of the face pipeline.
+
+The numpy parts of detection, anti-spoofing and texture analysis hold the
+GIL, so a thread pool inside one process stops scaling after a couple of
+cores. In ``FACE_PIPELINE_MODE=process`` each worker process loads its own
+models once (at start-up) and runs detection + anti-spoofing for one frame
+per task.
+
+Decoded frames are not pickled: the parent copies the BGR array into a
+reusable ``multiprocessing.shared_memory`` slot and sends only its name,
+shape and dtype. The worker maps the slot, analyses the frame in place and
+returns plain result dicts.
+
+A worker that dies (OOM kill, native crash) breaks a ProcessPoolExecutor
+for good; the pool then builds a new executor, starts its workers and
+retries the failed task once, so one crash costs at most the requests in
+flight at that moment. When a reduced-scale decode keeps the upload's
+JPEG bytes for the small-face re-decode, they go into the same slot, right
+after the frame.
+"""
+import inspect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# One slot fits a 1280 x 1280 BGR frame (the decode_image limit)
+DEFAULT_SLOT_BYTES = 1280 * 1280 * 3
+
+_tasks_total = REGISTRY.counter(
+    "face_pipeline_process_tasks_total",
+    "Frames analysed by the process pool",
+)
+_restarts_total = REGISTRY.counter(
+    "face_pipeline_process_restarts_total",
+    "Process pools rebuilt after a worker died",
+)
+_task_seconds = REGISTRY.histogram(
+    "face_pipeline_process_task_seconds",
+    "Round trip of one process-pool task (hand-off + worker time)",
+)
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """Picklable reference to a frame stored in a shared memory slot."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+    source_size: int = 0    # encoded upload bytes stored after the frame
+
+
+class _FrameSlots:
+    """Free list of shared memory segments, reused across requests."""
+
+    def __init__(self, slot_bytes: int, max_idle: int) -> None:
+        self.slot_bytes = slot_bytes
+        self.max_idle = max_idle
+        self._idle: List[SharedMemory] = []
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def put(self, image: np.ndarray, source: Optional[bytes] = None) -> Tuple[SharedMemory, SharedFrame]:
+        image = np.ascontiguousarray(image)
+        source = source or b""
+        needed = image.nbytes + len(source)
+        shm = None
+        with self._lock:
+            for i, candidate in enumerate(self._idle):
+                if candidate.size >= needed:
+                    shm = self._idle.pop(i)
+                    break
+        if shm is None:
+            shm = SharedMemory(create=True, size=max(self.slot_bytes, needed))
+            with self._lock:
+                self.created += 1
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+        shm.buf[image.nbytes:needed] = source
+        return shm, SharedFrame(shm.name, tuple(image.shape), image.dtype.str, len(source))
+
+    def release(self, shm: SharedMemory) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(shm)
+                return
+        _destroy(shm)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for shm in idle:
+            _destroy(shm)
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+
+def _destroy(shm: SharedMemory) -> None:
+    try:
+        shm.close()
+        shm.unlink()
+    except (BufferError, FileNotFoundError) as e:  # pragma: no cover - defensive
+        logger.warning("Could not release shared frame %s: %s", shm.name, e)
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+_service = None
+_SUPPORTS_TRACK = "track" in inspect.signature(SharedMemory.__init__).parameters
+
+
+def _attach(name: str) -> SharedMemory:
+    """Map a parent-owned segment without registering it with the resource tracker."""
+    if _SUPPORTS_TRACK:
+        return SharedMemory(name=name, track=False)
+    # Python < 3.13 registers every attach; the tracker would then unlink the
+    # parent's segment (and warn) when this worker exits
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _init_worker(preload: bool) -> None:
+    """Process initializer: load the face pipeline models once per worker."""
+    global _service
+    if preload:
+        from app.services.face_service import FaceService
+
+        _service = FaceService(use_pipeline_pool=False)
+        _service.load_models()
+        logger.info("Face pipeline worker ready")
+
+
+def _call_with_frame(fn: Callable[..., Any], frame: SharedFrame, args: tuple) -> Any:
+    """Run ``fn(image, *args)`` on the shared frame (in the worker), plus ``source=`` if stored."""
+    shm = _attach(frame.name)
+    error = None
+    try:
+        image = np.ndarray(frame.shape, dtype=np.dtype(frame.dtype), buffer=shm.buf)
+        kwargs = {}
+        if frame.source_size:
+            # Copied out: a view would pin the mapping past the task
+            kwargs['source'] = bytes(shm.buf[image.nbytes:image.nbytes + frame.source_size])
+        try:
+            result = fn(image, *args, **kwargs)
+        except Exception as e:
+            # Re-raised after the mapping is closed; the live traceback would
+            # otherwise keep a view of the shared buffer alive
+            error = RuntimeError(f"{type(e).__name__}: {e}")
+            result = None
+        del image
+    finally:
+        try:
+            shm.close()
+        except BufferError:  # pragma: no cover - a result still references the frame
+            logger.warning("Shared frame %s still referenced after task", frame.name)
+    if error is not None:
+        raise error
+    return result
+
+
+def analyze_frame(
+    image: np.ndarray,
+    meta: Dict[str, Any],
+    spoof_method: Optional[str],
+    source: Optional[bytes] = None
+) -> tuple:
+    """Worker task: detection (+ embedding) and optional anti-spoofing of one frame."""
+    from app.utils.image_utils import DecodedImage
+
+    decoded = DecodedImage(
+        meta['validation'], image,
+        dct_scale=meta['dct_scale'], max_size=meta['max_size'], source=source
+    )
+    return _service.analyze_decoded(decoded, spoof_method=spoof_method)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ----------------------------------------------------------------------
+# Parent side
+# ----------------------------------------------------------------------
+class FacePipelinePool:
+    """
+    Pool of face pipeline worker processes.
+
+    Usage:
+        pool = FacePipelinePool(workers=8)
+        detection_result, spoof_result = pool.analyze(decoded, spoof_method="hybrid")
+        pool.shutdown()
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        start_method: str = "spawn",
+        preload: bool = True,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.start_method = start_method
+        self.preload = preload
+        self._slots = _FrameSlots(slot_bytes, max_idle=2 * self.workers)
+        self._executor = self._new_executor()
+        self._in_flight = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        logger.info("Face pipeline process pool: %d workers (%s)", self.workers, start_method)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self.preload,),
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace a broken executor (once, however many callers saw it break) and start its workers."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self.restarts += 1
+        _restarts_total.inc()
+        logger.error("Face pipeline worker died; process pool rebuilt (restart %d)", self.restarts)
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.warm_up()
+
+    def run(self, fn: Callable[..., Any], image: np.ndarray, *args: Any, source: Optional[bytes] = None) -> Any:
+        """
+        Run module-level ``fn(image, *args)`` in a worker, handing ``image`` over shared memory
+
+        ``source`` (encoded bytes) travels in the same slot and reaches ``fn``
+        as its ``source`` keyword argument.
+        """
+        shm, frame = self._slots.put(image, source)
+        started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            for attempt in range(2):
+                executor = self._executor
+                try:
+                    return executor.submit(_call_with_frame, fn, frame, args).result()
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    if attempt:
+                        raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            _task_seconds.observe(time.perf_counter() - started)
+            _tasks_total.inc()
+            self._slots.release(shm)
+
+    def analyze(self, decoded, spoof_method: Optional[str] = None) -> tuple:
+        """
+        (detection_result, spoof_result) for a DecodedImage, computed in a worker.
+
+        spoof_result is None when spoof_method is None or no usable face crop exists.
+        """
+        meta = {
+            'validation': decoded.validation,
+            'dct_scale': decoded.dct_scale,
+            'max_size': decoded.max_size,
+        }
+        return self.run(analyze_frame, decoded.image, meta, spoof_method, source=decoded.source)
+
+    def warm_up(self) -> List[int]:
+        """Start every worker (and load its models); returns the worker pids."""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'mode': 'process',
+            'workers': self.workers,
+            'start_method': self.start_method,
+            'in_flight': self._in_flight,
+            'restarts': self.restarts,
+            'shared_slots': {'created': self._slots.created, 'idle': self._slots.idle},
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._slots.close()
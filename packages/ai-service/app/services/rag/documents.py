@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from app.utils.config import CHATBOT_MAX_CONVERSATIONS, CHATBOT_MAX_MESSAGES
+from app.utils.stage_timer import stage
 
 logger = logging.getLogger(__name__)
 
@@ -276,9 +277,10 @@ class DocumentManager:
                 kwargs: Dict[str, Any] = {"k": k}
                 if use_pre_filter:
                     kwargs["pre_filter"] = pre_filter
-                return await self.vector_store.asimilarity_search_with_score(
-                    query=query, **kwargs,
-                )
+                with stage("vector_search"):
+                    return await self.vector_store.asimilarity_search_with_score(
+                        query=query, **kwargs,
+                    )
 
             try:
                 docs = await _vector_search(use_pre_filter=True, k=limit * 2)
@@ -14,6 +14,7 @@ import os
 import re
 import logging
 import sys
+import time
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta, timezone
 import uuid
@@ -88,6 +89,7 @@ from app.services.rag.conversations import ConversationManager
 from app.services.rag.documents import DocumentManager
 from app.services.rag.cache import get_rag_cache, RAGCache
 from app.services.usage_tracker import invoke_llm_with_usage
+from app.utils.stage_timer import operation_scope, record_stage, stage
 
 logger = logging.getLogger(__name__)
 
@@ -528,49 +530,50 @@ TRẢ LỜI:"""
         # Lazy initialize
         self._ensure_initialized()
 
-        try:
-            # Load or create conversation
-            conversation = await self._conversation_manager.load_or_create(
-                conversation_id, user_id, department_id, role
-            )
+        with operation_scope("rag_chat"):
+            try:
+                # Load or create conversation
+                conversation = await self._conversation_manager.load_or_create(
+                    conversation_id, user_id, department_id, role
+                )
 
-            # Build conversation history BEFORE adding current message
-            # so the history contains only prior exchanges
-            conversation_history = self._format_conversation_history(
-                conversation.get("messages", [])
-            )
+                # Build conversation history BEFORE adding current message
+                # so the history contains only prior exchanges
+                conversation_history = self._format_conversation_history(
+                    conversation.get("messages", [])
+                )
 
-            # Add user message to conversation
-            self._conversation_manager.add_message(conversation, "user", message)
+                # Add user message to conversation
+                self._conversation_manager.add_message(conversation, "user", message)
 
-            # Detect intent and route to appropriate handler
-            response_text, sources = await self._route_query(
-                message, role, user_id, department_id,
-                conversation_history=conversation_history,
-                company_id=company_id,
-            )
+                # Detect intent and route to appropriate handler
+                response_text, sources = await self._route_query(
+                    message, role, user_id, department_id,
+                    conversation_history=conversation_history,
+                    company_id=company_id,
+                )
 
-            # Add assistant response to conversation
-            self._conversation_manager.add_message(
-                conversation, "assistant", response_text, sources
-            )
+                # Add assistant response to conversation
+                self._conversation_manager.add_message(
+                    conversation, "assistant", response_text, sources
+                )
 
-            # Enforce message limits
-            self._conversation_manager.enforce_limits(conversation)
+                # Enforce message limits
+                self._conversation_manager.enforce_limits(conversation)
 
-            # Save conversation
-            await self._conversation_manager.save(conversation)
+                # Save conversation
+                await self._conversation_manager.save(conversation)
 
-            return {
-                "conversation_id": conversation["conversation_id"],
-                "message": response_text,
-                "timestamp": datetime.now(timezone.utc),
-                "sources": sources or []
-            }
+                return {
+                    "conversation_id": conversation["conversation_id"],
+                    "message": response_text,
+                    "timestamp": datetime.now(timezone.utc),
+                    "sources": sources or []
+                }
 
-        except Exception as e:
-            logger.error(f"Error processing message: {str(e)}")
-            raise
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}")
+                raise
     
     def _should_use_vector_search(
         self,
@@ -943,41 +946,44 @@ TRẢ LỜI:"""
         # Rewrite follow-up questions (with anaphora/pronouns) into standalone
         # form using conversation_history, so downstream intent detection and
         # vector search see a self-contained query.
-        message = await self._rewrite_query_with_context(
-            message, conversation_history, company_id=company_id, user_id=user_id
-        )
+        with stage("rewrite"):
+            message = await self._rewrite_query_with_context(
+                message, conversation_history, company_id=company_id, user_id=user_id
+            )
 
-        # Check cache for intent first
-        cached_intent = self._cache.get_intent(message)
-        if cached_intent:
-            intent_type, details = cached_intent
-            logger.debug(f"Intent cache HIT: {intent_type}")
-        else:
-            # Detect intent and cache it
-            intent_type, details = IntentDetector.detect_intent(message)
+        with stage("intent"):
+            # Check cache for intent first
+            cached_intent = self._cache.get_intent(message)
+            if cached_intent:
+                intent_type, details = cached_intent
+                logger.debug(f"Intent cache HIT: {intent_type}")
+            else:
+                # Detect intent and cache it
+                intent_type, details = IntentDetector.detect_intent(message)
             
-            # If regex couldn't determine intent, try LLM-based classification
-            if intent_type == 'dynamic':
-                logger.info(f"Regex intent returned 'dynamic', trying LLM fallback for: '{message}'")
-                try:
-                    llm_intent, llm_details = await IntentDetector.detect_intent_with_llm(
-                        message, company_id=company_id, user_id=user_id
-                    )
-                    if llm_intent != 'general':  # LLM found a specific intent
-                        intent_type = llm_intent
-                        details = llm_details
-                        logger.info(f"LLM fallback classified as: '{intent_type}'")
-                except Exception as e:
-                    logger.warning(f"LLM intent fallback failed: {str(e)}")
+                # If regex couldn't determine intent, try LLM-based classification
+                if intent_type == 'dynamic':
+                    logger.info(f"Regex intent returned 'dynamic', trying LLM fallback for: '{message}'")
+                    try:
+                        llm_intent, llm_details = await IntentDetector.detect_intent_with_llm(
+                            message, company_id=company_id, user_id=user_id
+                        )
+                        if llm_intent != 'general':  # LLM found a specific intent
+                            intent_type = llm_intent
+                            details = llm_details
+                            logger.info(f"LLM fallback classified as: '{intent_type}'")
+                    except Exception as e:
+                        logger.warning(f"LLM intent fallback failed: {str(e)}")
             
-            self._cache.set_intent(message, intent_type, details)
-            logger.debug(f"Intent detected: {intent_type}")
+                self._cache.set_intent(message, intent_type, details)
+                logger.debug(f"Intent detected: {intent_type}")
         
         # Check if hybrid approach should be used
         use_hybrid = self._should_use_hybrid(intent_type, message)
         use_vector_search = self._should_use_vector_search(intent_type, message) or use_hybrid
 
         # Route based on intent and retrieval strategy
+        handler_started = time.perf_counter()
         if use_hybrid:
             # Hybrid approach: combine vector search and DB query
             response_text, sources = await self._handle_hybrid_query(
@@ -1096,6 +1102,7 @@ TRẢ LỜI:"""
         if response_text is None:
             response_text = "Xin lỗi, tôi gặp lỗi khi xử lý yêu cầu của bạn. Vui lòng thử lại sau."
             logger.warning(f"response_text is None for intent_type: {intent_type}, message: {message}")
+        record_stage("handler", time.perf_counter() - handler_started)
         
         return response_text, sources
     
@@ -6,6 +6,7 @@ from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.utils.config import MAIN_MONGODB_URI, calc_cost_usd, AI_USD_TO_VND
+from app.utils.stage_timer import stage
 
 logger = logging.getLogger(__name__)
 
@@ -103,7 +104,8 @@ async def invoke_llm_with_usage(
     conversation_id: Optional[str] = None,
 ):
     """Invoke LLM, record token usage, return the response."""
-    response = await llm.ainvoke(prompt)
+    with stage("llm"):
+        response = await llm.ainvoke(prompt)
     prompt_tokens, completion_tokens, estimated = extract_token_usage(response)
     model = getattr(llm, "model", "gemini-2.5-flash") or "gemini-2.5-flash"
     await record_usage(
@@ -0,0 +1,104 @@
+"""
+Compact probabilistic set for "have we seen this id recently?" checks.
+
+``RotatingBloomFilter`` keeps two Bloom filter generations. Keys are added
+to the current one; lookups check both. Every ``rotate_seconds`` the older
+generation is dropped, so a key is remembered for at least
+``rotate_seconds`` and at most twice that, in constant memory.
+
+False positives (an unseen key reported as seen) happen at roughly
+``error_rate`` once a generation holds ``capacity`` keys; false negatives
+never happen within the retention window.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Tuple
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over str keys (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4) -> None:
+        capacity = max(1, int(capacity))
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, bits)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Tuple[int, ...]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return tuple((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+
+class RotatingBloomFilter:
+    """
+    Two-generation Bloom filter with time-based rotation.
+
+    Usage:
+        seen = RotatingBloomFilter(capacity=100_000, rotate_seconds=60)
+        if seen.check_and_add(nonce):
+            reject_replay()
+    """
+
+    def __init__(self, capacity: int, rotate_seconds: float, error_rate: float = 1e-4) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_seconds = float(rotate_seconds)
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _maybe_rotate(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._rotated_at
+        if elapsed < self.rotate_seconds:
+            return
+        if elapsed >= 2 * self.rotate_seconds:
+            # Idle for two periods: everything held is past retention
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+        else:
+            self._previous = self._current
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._rotated_at = now
+
+    def check_and_add(self, key: str) -> bool:
+        """Record ``key``; True if it was (probably) already recorded."""
+        with self._lock:
+            self._maybe_rotate()
+            seen = key in self._current or key in self._previous
+            if not seen:
+                self._current.add(key)
+            return seen
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._maybe_rotate()
+            return key in self._current or key in self._previous
+
+    def get_stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "rotate_seconds": self.rotate_seconds,
+            "current_keys": self._current.count,
+            "previous_keys": self._previous.count,
+            "size_bytes": self._current.size_bytes + self._previous.size_bytes,
+        }
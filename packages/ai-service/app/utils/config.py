@@ -18,11 +18,21 @@ MODEL_NAME = os.getenv("MODEL_NAME", "buffalo_sc")
 MODEL_PATH = os.getenv("MODEL_PATH", str(MODELS_DIR / MODEL_NAME))
 DETECTION_THRESHOLD = float(os.getenv("DETECTION_THRESHOLD", "0.5"))
 VERIFICATION_THRESHOLD = float(os.getenv("VERIFICATION_THRESHOLD", "0.6"))
+# Run each network once on a synthetic frame at startup, before /ready reports ready
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
 
 # Server config
 PORT = int(os.getenv("PORT", "8001"))
 HOST = os.getenv("HOST", "0.0.0.0")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# run.py: more than 1 starts the pre-fork launcher (models loaded once, workers forked)
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+# Seconds after forking until the master logs per-worker memory (0 = only on SIGUSR1)
+PREFORK_MEMORY_REPORT_S = float(os.getenv("PREFORK_MEMORY_REPORT_S", "120"))
+# Require X-API-Key on the Prometheus /metrics endpoint
+METRICS_REQUIRE_API_KEY = os.getenv("METRICS_REQUIRE_API_KEY", "false").lower() == "true"
+# Add a Server-Timing header (per-stage durations of the request) to every response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
 
 # RAG Configuration
 # CRITICAL: Use os.environ.get() to get plain strings, NOT SecretStr
@@ -42,6 +52,9 @@ GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "")
 VECTOR_SEARCH_INDEX_NAME = os.getenv("VECTOR_SEARCH_INDEX_NAME", "vector_index")
 RAG_COLLECTION_NAME = os.getenv("RAG_COLLECTION_NAME", "rag_documents")
 CONVERSATIONS_COLLECTION_NAME = os.getenv("CONVERSATIONS_COLLECTION_NAME", "rag_conversations")
+# Import the RAG stack (langchain, ~2 s) in the background after startup instead of
+# on the first chat request; app.main itself never imports it
+RAG_WARMUP_ON_STARTUP = os.getenv("RAG_WARMUP_ON_STARTUP", "true").lower() == "true"
 
 # Chatbot Configuration
 CHATBOT_MAX_CONVERSATIONS = int(os.getenv("CHATBOT_MAX_CONVERSATIONS", "50"))
@@ -76,11 +89,95 @@ ANTI_SPOOFING_MODEL_PATH = os.getenv(
     "ANTI_SPOOFING_MODEL_PATH", 
     str(MODELS_DIR / "anti_spoofing.pth")
 )
+# Inference backend for MiniFASNetV2: 'torch' (.pth checkpoint) or 'onnx' (onnxruntime, no torch import)
+ANTI_SPOOFING_BACKEND = os.getenv("ANTI_SPOOFING_BACKEND", "torch").lower()
+# Defaults to the checkpoint path with an .onnx suffix when empty
+ANTI_SPOOFING_ONNX_PATH = os.getenv("ANTI_SPOOFING_ONNX_PATH", "")
+# Use the static int8 variant (<name>.int8.onnx) written by the export script
+ANTI_SPOOFING_ONNX_QUANTIZED = os.getenv("ANTI_SPOOFING_ONNX_QUANTIZED", "false").lower() == "true"
+# Queue-backed batching of concurrent SFAS forwards (one torch call per batch)
+ANTI_SPOOFING_BATCHING_ENABLED = os.getenv("ANTI_SPOOFING_BATCHING_ENABLED", "false").lower() == "true"
+ANTI_SPOOFING_BATCH_MAX_SIZE = int(os.getenv("ANTI_SPOOFING_BATCH_MAX_SIZE", "16"))
+ANTI_SPOOFING_BATCH_WINDOW_MS = float(os.getenv("ANTI_SPOOFING_BATCH_WINDOW_MS", "5"))  # milliseconds
+# Hybrid method: stage order of the fail-closed cascade (cheap texture first)
+ANTI_SPOOFING_CASCADE_ORDER = os.getenv("ANTI_SPOOFING_CASCADE_ORDER", "texture,sfas")
+# Skip the remaining stages once one rejects (the verdict is the same either way)
+ANTI_SPOOFING_CASCADE_EARLY_EXIT = os.getenv("ANTI_SPOOFING_CASCADE_EARLY_EXIT", "true").lower() == "true"
+# Texture check: resize faces to this square (px) before LBP/FFT; 0 keeps the
+# crop's own resolution. Only set it with thresholds re-tuned at that size.
+TEXTURE_CANONICAL_SIZE = int(os.getenv("TEXTURE_CANONICAL_SIZE", "0") or 0) or None
+
+# Upload decoding: decode JPEGs at 1/2, 1/4 or 1/8 scale (libjpeg DCT scaling)
+# when the full resolution would be thrown away by the resize anyway
+IMAGE_REDUCED_DECODE = os.getenv("IMAGE_REDUCED_DECODE", "true").lower() == "true"
+# Smallest long side the reduced decode may produce (pipeline works at <= 1280 px)
+IMAGE_DECODE_TARGET_SIZE = int(os.getenv("IMAGE_DECODE_TARGET_SIZE", "1280"))
+# Faces smaller than this (px, decoded image) are re-decoded at full resolution for anti-spoofing
+ANTI_SPOOFING_MIN_FACE_PX = int(os.getenv("ANTI_SPOOFING_MIN_FACE_PX", "80"))
+
+# Inference micro-batching (coalesces concurrent detector/recognizer calls)
+FACE_BATCHING_ENABLED = os.getenv("FACE_BATCHING_ENABLED", "false").lower() == "true"
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "8"))
+FACE_BATCH_WINDOW_MS = float(os.getenv("FACE_BATCH_WINDOW_MS", "10"))  # milliseconds
+
+# Face pipeline execution: 'thread' (in-process pool) or 'process' (worker
+# processes, each with its own models; frames handed off via shared memory)
+FACE_PIPELINE_MODE = os.getenv("FACE_PIPELINE_MODE", "thread").lower()
+FACE_PIPELINE_WORKERS = int(os.getenv("FACE_PIPELINE_WORKERS", str(os.cpu_count() or 1)))
+FACE_PIPELINE_START_METHOD = os.getenv("FACE_PIPELINE_START_METHOD", "spawn")  # 'spawn' or 'forkserver'
+
+# Admission control for blocking inference called from request handlers
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "4"))
+# Requests allowed to wait for a worker; beyond this they get 503 + Retry-After
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "32"))
+# Queued requests not started within this time are dropped with 503 (0 = no limit)
+INFERENCE_QUEUE_TIMEOUT_MS = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_MS", "10000"))
+# Threads kept free for check-in (verify/identify/liveness) calls only
+INFERENCE_RESERVED_WORKERS = int(os.getenv("INFERENCE_RESERVED_WORKERS", "1"))
+# Queue places only check-in calls may take; registration + diagnostics share the rest
+INFERENCE_CRITICAL_RESERVE = int(os.getenv("INFERENCE_CRITICAL_RESERVE", "8"))
+# Registration/diagnostic calls queued longer than this are served next (0 = strict priority)
+INFERENCE_STARVATION_MS = float(os.getenv("INFERENCE_STARVATION_MS", "3000"))
+# Default time budget per endpoint in ms (0 = none); X-Request-Timeout-Ms overrides it.
+# Work still queued or between pipeline stages past its deadline is dropped (504)
+INFERENCE_DEADLINES_MS = os.getenv(
+    "INFERENCE_DEADLINES_MS",
+    "verify=5000,identify=5000,liveness=5000,anti_spoofing=10000,register=0",
+)
+
+# Server-side embedding gallery (register/verify by user_id, /identify, /gallery).
+# It lives in process memory: with WEB_WORKERS > 1 every worker would hold its
+# own copy and a PUT/DELETE would reach only one of them, so the pre-fork
+# launcher refuses to start unless this is false.
+FACE_GALLERY_ENABLED = os.getenv("FACE_GALLERY_ENABLED", "true").lower() == "true"
+
+# 1:N identification (kiosk check-in) over the embedding gallery
+FACE_IDENTIFY_TOP_K = int(os.getenv("FACE_IDENTIFY_TOP_K", "5"))
+# Companies with at least this many embeddings are searched with an IVF-PQ index
+FACE_IDENTIFY_ANN_MIN_SIZE = int(os.getenv("FACE_IDENTIFY_ANN_MIN_SIZE", "20000"))
+FACE_IDENTIFY_NPROBE = int(os.getenv("FACE_IDENTIFY_NPROBE", "16"))
+# Rebuild the index once users changed since it was built exceed this share of it...
+FACE_IDENTIFY_ANN_REBUILD_FRACTION = float(os.getenv("FACE_IDENTIFY_ANN_REBUILD_FRACTION", "0.05"))
+# ...and at most this often (seconds); changed users are scored exactly meanwhile
+FACE_IDENTIFY_ANN_REBUILD_INTERVAL_S = float(os.getenv("FACE_IDENTIFY_ANN_REBUILD_INTERVAL_S", "300"))
 
 # Session Management Configuration
 SESSION_STORAGE_TYPE = os.getenv("SESSION_STORAGE_TYPE", "memory")  # 'memory' or 'redis'
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", "60"))  # seconds
+# Liveness sessions are dropped this long after creation (challenges last 4-7 s)
+LIVENESS_SESSION_TTL = float(os.getenv("LIVENESS_SESSION_TTL", "30"))  # seconds
+# 'store' (sessions in SESSION_STORAGE_TYPE) or 'token' (stateless HMAC-signed session tokens)
+LIVENESS_SESSION_MODE = os.getenv("LIVENESS_SESSION_MODE", "store").lower()
+# Shared by every worker/replica in token mode
+LIVENESS_TOKEN_SECRET = os.getenv("LIVENESS_TOKEN_SECRET", "")
+# Used-token nonces remembered per worker (two Bloom generations, ~2.4 bytes per nonce each)
+LIVENESS_REPLAY_FILTER_CAPACITY = int(os.getenv("LIVENESS_REPLAY_FILTER_CAPACITY", "100000"))
+# WebSocket liveness stream: analyse every Nth received frame (never more than one at a time)
+LIVENESS_STREAM_FRAME_STRIDE = int(os.getenv("LIVENESS_STREAM_FRAME_STRIDE", "2"))
+# Stream frames are decoded to at most this long side (px) and rejected above this size (KB)
+LIVENESS_STREAM_MAX_SIDE = int(os.getenv("LIVENESS_STREAM_MAX_SIDE", "480"))
+LIVENESS_STREAM_MAX_FRAME_KB = int(os.getenv("LIVENESS_STREAM_MAX_FRAME_KB", "256"))
 
 # RAG Performance Configuration
 RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true"
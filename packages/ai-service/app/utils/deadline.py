@@ -0,0 +1,97 @@
+"""
+Per-request deadlines for blocking inference.
+
+The backend gives up on a call after a few seconds; work that finishes after
+that point is wasted. A handler sets the request's deadline (from the
+``X-Request-Timeout-Ms`` header or the endpoint default) in a context
+variable; the inference executor copies the context into its worker thread,
+so the face pipeline can call ``check_deadline(stage)`` before each
+expensive stage and stop once nobody is waiting for the answer.
+
+Deadlines are absolute ``time.monotonic()`` values.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from app.utils.metrics import REGISTRY
+
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+# Stages reported by the deadline metric (the first stage that was not run)
+STAGE_QUEUE = "queue"
+STAGE_DETECTION = "detection"
+STAGE_ANTI_SPOOFING = "anti_spoofing"
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar("inference_deadline", default=None)
+
+_dropped_total = REGISTRY.counter(
+    "inference_deadline_dropped_total",
+    "Inference calls abandoned past their deadline, by the first stage skipped",
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call reaches ``stage`` after its deadline has passed."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+
+def parse_deadlines(value: str) -> Dict[str, float]:
+    """Parse per-endpoint defaults, e.g. "verify=5000,register=0" (ms; 0 = none) into seconds."""
+    deadlines: Dict[str, float] = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        endpoint, sep, ms = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid deadline entry '{item.strip()}'. Expected endpoint=milliseconds")
+        ms_value = float(ms)
+        if ms_value > 0:
+            deadlines[endpoint.strip().lower()] = ms_value / 1000.0
+    return deadlines
+
+
+def current_deadline() -> Optional[float]:
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (None when there is none)."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def check_deadline(stage: str) -> None:
+    """Raise DeadlineExceeded (and count the skipped stage) if the deadline has passed."""
+    if expired(_current_deadline.get()):
+        raise dropped(stage)
+
+
+def dropped(stage: str) -> DeadlineExceeded:
+    _dropped_total.inc(labels={"stage": stage})
+    return DeadlineExceeded(stage)
+
+
+def dropped_count(stage: str) -> int:
+    return int(_dropped_total.value({"stage": stage}))
+
+
+@contextmanager
+def deadline_scope(timeout_s: Optional[float]) -> Iterator[Optional[float]]:
+    """Set the deadline ``timeout_s`` from now for the enclosed code (None = no deadline)."""
+    deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,106 @@
+"""
+Wire formats for face embeddings exchanged with the backend.
+
+- ``json``: list of float lists (legacy, default)
+- ``f32``:  base64 of little-endian float32, embeddings concatenated
+- ``f16``:  base64 of little-endian float16 (half the size of f32;
+            ~1e-3 relative error, far below the verification margin)
+
+Binary payloads may also arrive as a raw ``application/octet-stream``
+multipart part, in which case no base64 step is needed. Decoding uses
+``np.frombuffer`` directly on the received bytes. numpy is imported on
+first use so the routers can read the format constants at import time
+without it.
+"""
+import base64
+import binascii
+import json
+from typing import TYPE_CHECKING, Any, Iterable, List, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EMBEDDING_DIM = 512
+
+FORMAT_JSON = "json"
+FORMAT_F32 = "f32"
+FORMAT_F16 = "f16"
+EMBEDDING_FORMATS = (FORMAT_JSON, FORMAT_F32, FORMAT_F16)
+
+_DTYPES = {
+    FORMAT_F32: "<f4",
+    FORMAT_F16: "<f2",
+}
+
+
+def normalize_format(fmt: str) -> str:
+    """Validate and canonicalise an ``embedding_format`` value (case-insensitive)."""
+    value = (fmt or FORMAT_JSON).strip().lower()
+    if value not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unsupported embedding_format '{fmt}'. Must be one of: {list(EMBEDDING_FORMATS)}")
+    return value
+
+
+def encode_embedding(embedding: Any, fmt: str) -> Union[List[float], str]:
+    """Encode one embedding: a float list for ``json``, a base64 string otherwise."""
+    fmt = normalize_format(fmt)
+    if fmt == FORMAT_JSON:
+        return embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+    import numpy as np
+
+    array = np.asarray(embedding).astype(_DTYPES[fmt], copy=False)
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+
+def encode_embeddings(embeddings: Iterable[Any], fmt: str) -> Union[List[List[float]], str]:
+    """Encode several embeddings; binary formats are concatenated into one payload."""
+    fmt = normalize_format(fmt)
+    if fmt == FORMAT_JSON:
+        return [encode_embedding(e, fmt) for e in embeddings]
+    import numpy as np
+
+    matrix = np.asarray(list(embeddings)).astype(_DTYPES[fmt], copy=False)
+    return base64.b64encode(matrix.tobytes()).decode("ascii")
+
+
+def decode_binary(data: Union[bytes, bytearray, memoryview], fmt: str, dim: int = EMBEDDING_DIM) -> "np.ndarray":
+    """
+    View raw little-endian bytes as an N x dim matrix.
+
+    ``f32`` is returned as a read-only view of ``data`` (no copy); ``f16`` is
+    widened to float32.
+    """
+    fmt = normalize_format(fmt)
+    if fmt == FORMAT_JSON:
+        raise ValueError("decode_binary expects a binary embedding_format (f32 or f16)")
+    import numpy as np
+
+    dtype = np.dtype(_DTYPES[fmt])
+    row_bytes = dtype.itemsize * dim
+    if len(data) == 0 or len(data) % row_bytes != 0:
+        raise ValueError(
+            f"Embedding payload of {len(data)} bytes is not a whole number of {dim}-d {fmt} vectors"
+        )
+    matrix = np.frombuffer(data, dtype=dtype).reshape(-1, dim)
+    if dtype != np.float32:
+        matrix = matrix.astype(np.float32)
+    return matrix
+
+
+def decode_base64(payload: str, fmt: str, dim: int = EMBEDDING_DIM) -> "np.ndarray":
+    """Decode a base64 ``f32``/``f16`` payload into an N x dim float32 matrix."""
+    try:
+        raw = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 embedding payload: {e}")
+    return decode_binary(raw, fmt, dim)
+
+
+def decode_json(payload: str) -> List[List[float]]:
+    """Parse the legacy JSON payload: a list of embeddings or {"reference_embeddings": [...]}."""
+    data = json.loads(payload)
+    if isinstance(data, dict):
+        return data.get("reference_embeddings", [])
+    if isinstance(data, list):
+        return data
+    return []
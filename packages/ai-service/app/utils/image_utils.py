@@ -2,14 +2,170 @@
 import cv2
 import numpy as np
 from PIL import Image
+from dataclasses import dataclass
+from typing import Optional, Tuple
 import io
 import logging
+from app.utils.config import IMAGE_REDUCED_DECODE, IMAGE_DECODE_TARGET_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Decode straight to 3-channel BGR. EXIF orientation is ignored, matching the
+# previous PIL-based decoding (clients send upright frames).
+_IMDECODE_FLAGS = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+
+# libjpeg can decode at 1/2, 1/4 or 1/8 scale directly from the DCT
+# coefficients, skipping most of the IDCT and colour conversion work.
+_REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+def jpeg_scale_factor(width: int, height: int, target_size: int) -> int:
+    """Largest DCT scale (1, 2, 4, 8) that keeps the long side >= target_size."""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side // factor >= target_size:
+            return factor
+    return 1
+
+
+@dataclass
+class DecodedImage:
+    """An upload decoded once: header validation result plus the BGR pixels"""
+    validation: dict
+    image: Optional[np.ndarray] = None  # BGR, already limited to max_size
+    dct_scale: int = 1                  # 2/4/8 when decoded at reduced JPEG scale
+    max_size: int = 1280
+    source: Optional[bytes] = None      # kept only for a reduced decode (re-decode fallback)
+
+    @property
+    def valid(self) -> bool:
+        return self.validation.get('valid', False)
+
+    @property
+    def error(self) -> Optional[str]:
+        return self.validation.get('error')
+
+    @property
+    def error_code(self) -> str:
+        return self.validation.get('error_code', 'POOR_IMAGE_QUALITY')
+
+    @property
+    def details(self) -> dict:
+        return self.validation.get('details', {})
+
+    def region_for_face(
+        self,
+        bbox: Tuple[int, int, int, int],
+        min_face_px: int,
+        context: float = 1.0
+    ) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        """
+        Image and bbox to use for pixel-level analysis of a detected face
+        
+        When the image was decoded at reduced JPEG scale and the face is
+        smaller than min_face_px, the upload is decoded again at its native
+        resolution (not capped at max_size, which would give back the same
+        pixels) and only the face region is kept: the bbox expanded by
+        ``context`` around its centre (2.7 for the SFAS crop), clamped to the
+        image. Returns that region and the face bbox inside it. Otherwise
+        the shared array and the bbox are returned unchanged.
+        """
+        x1, y1, x2, y2 = bbox
+        if self.dct_scale == 1 or self.source is None or min(x2 - x1, y2 - y1) >= min_face_px:
+            return self.image, bbox
+        
+        full = cv2.imdecode(np.frombuffer(self.source, dtype=np.uint8), _IMDECODE_FLAGS)
+        if full is None:
+            return self.image, bbox
+        sx = full.shape[1] / self.image.shape[1]
+        sy = full.shape[0] / self.image.shape[0]
+        if sx <= 1.0:
+            return self.image, bbox
+        logger.debug(f"Face {x2 - x1}x{y2 - y1}px below {min_face_px}px; re-decoded at {sx:.1f}x")
+        
+        h, w = full.shape[:2]
+        fx1, fy1, fx2, fy2 = x1 * sx, y1 * sy, x2 * sx, y2 * sy
+        half_w = (fx2 - fx1) * max(context, 1.0) / 2
+        half_h = (fy2 - fy1) * max(context, 1.0) / 2
+        cx, cy = (fx1 + fx2) / 2, (fy1 + fy2) / 2
+        rx1, ry1 = max(0, int(cx - half_w)), max(0, int(cy - half_h))
+        rx2, ry2 = min(w, int(np.ceil(cx + half_w))), min(h, int(np.ceil(cy + half_h)))
+        # Copy so the full-resolution frame is freed with this call
+        region = full[ry1:ry2, rx1:rx2].copy()
+        return region, (
+            max(0, int(fx1) - rx1), max(0, int(fy1) - ry1),
+            min(rx2 - rx1, int(fx2) - rx1), min(ry2 - ry1, int(fy2) - ry1)
+        )
+
+
 class ImageUtils:
     """Utility functions for image processing"""
     
+    @staticmethod
+    def decode_image(
+        image_bytes: bytes,
+        max_size: int = 1280,
+        reduced: Optional[bool] = None,
+        target_size: Optional[int] = None,
+        **limits
+    ) -> DecodedImage:
+        """
+        Validate and decode an upload in a single pass
+        
+        Header-only checks (file size, format, dimensions) run first, so bad
+        uploads are rejected before any pixel decoding. The pixels are then
+        decoded once, straight to BGR, and resized to max_size. The returned
+        array is meant to be shared by detection, anti-spoofing and texture
+        analysis.
+        
+        Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale when the long side
+        stays >= target_size (IMAGE_DECODE_TARGET_SIZE), since those pixels
+        would be discarded by the resize anyway.
+        
+        Args:
+            image_bytes: Image file bytes
+            max_size: Maximum width or height of the decoded image
+            reduced: Allow reduced-scale JPEG decoding (default IMAGE_REDUCED_DECODE)
+            target_size: Smallest long side a reduced decode may produce
+            **limits: Overrides for validate_image limits (max_size_mb, min_width, ...)
+            
+        Returns:
+            DecodedImage: .valid/.error/.error_code/.details like validate_image, plus .image
+        """
+        validation = ImageUtils.validate_image(image_bytes, **limits)
+        if not validation['valid']:
+            return DecodedImage(validation)
+        
+        details = validation['details']
+        factor = 1
+        if (IMAGE_REDUCED_DECODE if reduced is None else reduced) and details.get('format') == 'JPEG':
+            factor = jpeg_scale_factor(
+                details['width'], details['height'],
+                target_size or min(IMAGE_DECODE_TARGET_SIZE, max_size)
+            )
+        flags = (_REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION) if factor > 1 else _IMDECODE_FLAGS
+        
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flags)
+        if image is None:
+            return DecodedImage({
+                'valid': False,
+                'error': 'Invalid image file: pixel data could not be decoded',
+                'error_code': 'POOR_IMAGE_QUALITY',
+                'details': validation.get('details', {})
+            })
+        
+        return DecodedImage(
+            validation,
+            ImageUtils.resize_image(image, max_size),
+            dct_scale=factor,
+            max_size=max_size,
+            source=image_bytes if factor > 1 else None
+        )
+    
     @staticmethod
     def bytes_to_numpy(image_bytes: bytes) -> np.ndarray:
         """
@@ -22,20 +178,10 @@ class ImageUtils:
             np.ndarray: Image array (BGR format)
         """
         try:
-            # Read bytes as image
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert PIL to numpy array (RGB)
-            rgb_array = np.array(image)
-            
-            # Convert RGB to BGR (OpenCV format)
-            if len(rgb_array.shape) == 3:
-                bgr_array = cv2.cvtColor(rgb_array, cv2.COLOR_RGB2BGR)
-            else:
-                # Grayscale image
-                bgr_array = cv2.cvtColor(rgb_array, cv2.COLOR_GRAY2BGR)
-            
-            return bgr_array
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), _IMDECODE_FLAGS)
+            if image is None:
+                raise ValueError("Image data could not be decoded")
+            return image
         except Exception as e:
             logger.error(f"Error converting bytes to numpy: {str(e)}")
             raise
@@ -112,6 +258,10 @@ class ImageUtils:
         """
         Validate image file with comprehensive quality checks
         
+        Only the image header is parsed (format and dimensions); pixel data is
+        not decoded here. Truncated or corrupt pixel data is reported by
+        decode_image.
+        
         Args:
             image_bytes: Image file bytes
             max_size_mb: Maximum file size in MB
@@ -155,11 +305,7 @@ class ImageUtils:
                     }
                 }
             
-            # Try to open image
-            image = Image.open(io.BytesIO(image_bytes))
-            image.verify()
-            
-            # Reopen image after verify (verify() closes the file)
+            # Parse the header only (PIL opens lazily; no pixel decode)
             image = Image.open(io.BytesIO(image_bytes))
             
             # Check format
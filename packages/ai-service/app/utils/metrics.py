@@ -0,0 +1,273 @@
+"""In-process metrics (counters, gauges, histograms) for the AI service.
+
+Kept dependency-free on purpose: every primitive is a few floats behind a
+lock, so recording on the hot inference path costs well under a microsecond.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Default buckets (seconds) — tuned for inference stages that range from
+# sub-millisecond numpy work up to multi-second cold model runs.
+DEFAULT_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Monotonically increasing counter, optionally split by labels."""
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(k): v for k, v in self._values.items()}
+
+
+class Gauge:
+    """Point-in-time value. Can be set directly or backed by a callback."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        callback: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self._callback = callback
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, labels: Optional[Dict[str, str]] = None) -> None:
+        self.inc(-amount, labels)
+
+    def set_callback(self, callback: Optional[Callable[[], float]]) -> None:
+        self._callback = callback
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        if self._callback is not None and not labels:
+            try:
+                return float(self._callback())
+            except Exception:
+                return 0.0
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        if self._callback is not None:
+            return {"": self.value()}
+        with self._lock:
+            return {_format_labels(k): v for k, v in self._values.items()}
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative semantics."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[idx] += 1
+            series.total += value
+            series.count += 1
+
+    def series(self) -> List[Tuple[LabelKey, List[int], float, int]]:
+        """Return (labels, cumulative bucket counts, sum, count) per label set."""
+        with self._lock:
+            out = []
+            for key, s in self._series.items():
+                cumulative, running = [], 0
+                for c in s.counts:
+                    running += c
+                    cumulative.append(running)
+                out.append((key, cumulative, s.total, s.count))
+            return out
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        for key, cumulative, total, count in self.series():
+            result[_format_labels(key)] = {
+                "count": count,
+                "sum": round(total, 6),
+                "mean": round(total / count, 6) if count else 0.0,
+                "p50": _estimate_quantile(self.buckets, cumulative, 0.50),
+                "p95": _estimate_quantile(self.buckets, cumulative, 0.95),
+                "p99": _estimate_quantile(self.buckets, cumulative, 0.99),
+            }
+        return result
+
+
+def _format_labels(key: LabelKey) -> str:
+    return ",".join(f"{k}={v}" for k, v in key)
+
+
+def _estimate_quantile(buckets: Sequence[float], cumulative: List[int], q: float) -> float:
+    """Upper-bound quantile estimate from cumulative bucket counts."""
+    total = cumulative[-1] if cumulative else 0
+    if total == 0:
+        return 0.0
+    rank = q * total
+    for bound, running in zip(buckets, cumulative):
+        if running >= rank:
+            return bound
+    return float("inf")
+
+
+class MetricsRegistry:
+    """Name-indexed collection of metrics. get-or-create semantics."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise TypeError(f"Metric {name!r} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(
+        self,
+        name: str,
+        description: str = "",
+        callback: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, description)
+        if callback is not None:
+            gauge.set_callback(callback)
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets)
+
+    def metrics(self) -> List[object]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self) -> Dict[str, object]:
+        """JSON-friendly view of every registered metric."""
+        return {m.name: m.snapshot() for m in self.metrics()}
+
+
+def _escape(value: str, quote: bool = False) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _sample(name: str, key: LabelKey, value: float, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    labels = ",".join(f'{k}="{_escape(v, quote=True)}"' for k, v in pairs)
+    return f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_prometheus(registry: "MetricsRegistry") -> str:
+    """Prometheus text exposition format (0.0.4) of every metric in ``registry``."""
+    lines: List[str] = []
+    for metric in sorted(registry.metrics(), key=lambda m: m.name):
+        name = metric.name
+        if isinstance(metric, Histogram):
+            kind = "histogram"
+        elif isinstance(metric, Counter):
+            kind = "counter"
+        else:
+            kind = "gauge"
+        if metric.description:
+            lines.append(f"# HELP {name} {_escape(metric.description)}")
+        lines.append(f"# TYPE {name} {kind}")
+        if isinstance(metric, Histogram):
+            for key, cumulative, total, count in metric.series():
+                bounds = [_format_value(b) for b in metric.buckets] + ["+Inf"]
+                for bound, running in zip(bounds, cumulative):
+                    lines.append(_sample(f"{name}_bucket", key, running, ("le", bound)))
+                lines.append(_sample(f"{name}_sum", key, total))
+                lines.append(_sample(f"{name}_count", key, count))
+        elif isinstance(metric, Gauge) and metric._callback is not None:
+            lines.append(_sample(name, (), metric.value()))
+        else:
+            with metric._lock:
+                values = list(metric._values.items())
+            for key, value in values:
+                lines.append(_sample(name, key, value))
+    return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by all services
+REGISTRY = MetricsRegistry()
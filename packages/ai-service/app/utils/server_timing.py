@@ -0,0 +1,41 @@
+"""
+Server-Timing response header (opt-in, SERVER_TIMING_ENABLED).
+
+Every HTTP request runs inside a ``timing_scope()``; the stages the face
+and RAG services record (decode, detect, anti_spoofing, recognize...; rewrite,
+intent, handler, vector_search, llm) are written to the response as
+
+    Server-Timing: queue;dur=0.4, decode;dur=6.1, detect;dur=41.7, total;dur=63.0
+
+so the web/mobile apps (browser devtools show it per request) and the Node
+backend can see where the time of one request went. Plain ASGI middleware:
+the downstream app runs in the same task, so the ContextVar reaches it.
+"""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.stage_timer import timing_scope
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+class ServerTimingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with timing_scope() as timings:
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append(SERVER_TIMING_HEADER, timings.header(time.perf_counter() - started))
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
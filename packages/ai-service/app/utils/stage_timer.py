@@ -0,0 +1,117 @@
+"""
+Per-stage latency of service operations (verify, register, liveness, RAG chat...).
+
+``operation_scope("verify")`` names the operation running in the current
+context; ``stage("detect")`` blocks inside it are recorded in the
+``operation_stage_seconds{operation, stage}`` histogram, and the whole scope
+in ``operation_seconds{operation}``.
+
+``timing_scope()`` additionally collects the stages of one request (see the
+Server-Timing middleware in app/utils/server_timing.py). A stage repeated
+within the request (one decode per registration image) is summed.
+
+Both live in ContextVars, so stages timed on helper threads started with
+``contextvars.copy_context()`` (the inference executor, verify_face's
+parallel anti-spoofing and recognition) are attributed to the request that
+started them. With neither scope active (warm-up, pipeline worker
+processes) a stage records nothing. A recorded stage costs two
+perf_counter() calls and one histogram observation, a few microseconds, so
+it stays on in production.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.utils.metrics import REGISTRY
+
+_operation_seconds = REGISTRY.histogram(
+    "operation_seconds",
+    "End-to-end time of one service operation",
+)
+_stage_seconds = REGISTRY.histogram(
+    "operation_stage_seconds",
+    "Time spent in one stage of a service operation",
+)
+
+
+class StageTimings:
+    """Stage durations of one request, in the order the stages first ran."""
+
+    def __init__(self) -> None:
+        self._seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+
+    def items(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._seconds.items())
+
+    def header(self, total_s: Optional[float] = None) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.items()]
+        if total_s is not None:
+            entries.append(f"total;dur={total_s * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_operation: ContextVar[Optional[str]] = ContextVar("operation", default=None)
+_timings: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+def current_operation() -> Optional[str]:
+    return _operation.get()
+
+
+def current_timings() -> Optional[StageTimings]:
+    return _timings.get()
+
+
+@contextmanager
+def operation_scope(name: str) -> Iterator[None]:
+    """Attribute the stages below to operation ``name`` (usable as a decorator)."""
+    token = _operation.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+        _operation_seconds.observe(time.perf_counter() - started, {"operation": name})
+
+
+@contextmanager
+def timing_scope() -> Iterator[StageTimings]:
+    """Collect every stage recorded below into a fresh StageTimings."""
+    timings = StageTimings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one stage of the current operation / request; a no-op outside both."""
+    if _operation.get() is None and _timings.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a stage measured by the caller (e.g. executor queue wait)."""
+    operation = _operation.get()
+    if operation is not None:
+        _stage_seconds.observe(seconds, {"operation": operation, "stage": name})
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: one-image-per-call FaceAnalysis.get vs micro-batched inference.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_batching --image face.jpg --calls 400 --concurrency 1 8 32
+
+Needs the InsightFace model pack (MODEL_NAME, default buffalo_sc). Without
+``--image`` a synthetic frame is used, which exercises detection only.
+"""
+import argparse
+import logging
+import sys
+
+from benchmarks.common import load_image, print_table, run_concurrent
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="JPEG/PNG containing one face (default: synthetic frame)")
+    parser.add_argument("--calls", type=int, default=200, help="Total calls per scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[5.0, 10.0, 15.0])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    from app.services.model_loader import ModelLoader
+    from app.services.inference_batcher import FaceAnalysisBatcher
+
+    try:
+        app = ModelLoader().get_model()
+    except Exception as e:
+        print(f"InsightFace model unavailable: {e}", file=sys.stderr)
+        return 1
+
+    image = load_image(args.image)
+    faces = app.get(image)
+    print(f"Image {image.shape[1]}x{image.shape[0]}, faces detected: {len(faces)}")
+
+    rows = []
+    for concurrency in args.concurrency:
+        direct = run_concurrent(lambda _i: app.get(image), args.calls, concurrency)
+        rows.append({"mode": "direct", "window_ms": "-", **direct})
+
+        for window in args.window_ms:
+            batcher = FaceAnalysisBatcher(app, max_batch_size=args.batch_size, max_wait_ms=window)
+            try:
+                batched = run_concurrent(lambda _i: batcher.get(image), args.calls, concurrency)
+                stats = batcher.get_stats()
+            finally:
+                batcher.close()
+            batch_stats = stats.get("batch_size") or {}
+            rows.append({
+                "mode": "batched",
+                "window_ms": window,
+                **batched,
+                "mean_batch": batch_stats.get("mean", 0.0),
+            })
+
+    print_table("FaceAnalysis throughput", rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Upload decode cost: legacy triple decode vs the single-pass DecodedImage stage.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_decode --iterations 50
+    python -m benchmarks.bench_decode --image phone.jpg
+
+The legacy path is the previous ImageUtils flow: PIL verify(), reopen for the
+header checks, a second PIL decode in bytes_to_numpy, RGB->BGR conversion,
+then resize to 1280 px. "reduced" additionally decodes large JPEGs at
+1/2, 1/4 or 1/8 DCT scale (IMAGE_DECODE_TARGET_SIZE); decode_mb is the size
+of the full-decode pixel buffer for each mode. Default inputs are synthetic
+phone-like JPEGs at 1, 2, 3 and 12 MP.
+"""
+import argparse
+import io
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import percentiles, print_table, synthetic_jpeg, time_calls
+
+SIZES = {"1MP": (1152, 864), "2MP": (1632, 1224), "3MP": (2048, 1536), "12MP": (4000, 3000)}
+
+
+def legacy_pipeline(image_bytes: bytes) -> np.ndarray:
+    from app.utils.image_utils import ImageUtils
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image.verify()
+    image = Image.open(io.BytesIO(image_bytes))
+    _ = image.format, image.size
+    rgb = np.array(Image.open(io.BytesIO(image_bytes)))
+    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    return ImageUtils.resize_image(bgr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", nargs="*", help="Real JPEG files to use instead of synthetic ones")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--target-size", type=int, default=None,
+                        help="Smallest long side for the reduced decode (default IMAGE_DECODE_TARGET_SIZE)")
+    args = parser.parse_args()
+
+    from app.utils.config import IMAGE_DECODE_TARGET_SIZE
+    from app.utils.image_utils import ImageUtils, jpeg_scale_factor
+
+    target = args.target_size or IMAGE_DECODE_TARGET_SIZE
+
+    inputs = {}
+    if args.image:
+        for path in args.image:
+            with open(path, "rb") as f:
+                inputs[path] = f.read()
+    else:
+        for label, (w, h) in SIZES.items():
+            inputs[label] = synthetic_jpeg(w, h, quality=90)
+
+    modes = (
+        ("legacy", legacy_pipeline, False),
+        ("decode_once", lambda d: ImageUtils.decode_image(d, reduced=False), False),
+        ("reduced", lambda d: ImageUtils.decode_image(d, reduced=True, target_size=target), True),
+    )
+    rows = []
+    for label, data in inputs.items():
+        width, height = Image.open(io.BytesIO(data)).size
+        for mode, fn, reduced in modes:
+            factor = jpeg_scale_factor(width, height, target) if reduced else 1
+            durations = time_calls(lambda: fn(data), args.iterations)
+            rows.append({
+                "input": label, "kb": len(data) // 1024, "mode": mode, "dct_scale": factor,
+                "decode_mb": round((width // factor) * (height // factor) * 3 / 2 ** 20, 1),
+                **percentiles(durations),
+            })
+
+    print_table("Image decode (per upload)", rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
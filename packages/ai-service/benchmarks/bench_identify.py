@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+1:N identification latency: exact matrix top-k vs IVF-PQ, across gallery sizes.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_identify --sizes 1000 10000 100000 --queries 200
+
+Sizes are gallery rows (embeddings); each synthetic user gets ``--per-user``
+noisy samples of one random 512-d identity, like the 4-photo registration.
+recall@1 is the share of queries where IVF-PQ returns the same best user as
+the exact scan.
+"""
+import argparse
+import logging
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import percentiles, print_table
+
+
+def build_gallery(size: int, per_user: int, dim: int, seed: int):
+    from app.services.embedding_gallery import EmbeddingGallery
+
+    rng = np.random.default_rng(seed)
+    users = max(1, size // per_user)
+    identities = rng.normal(size=(users, dim)).astype(np.float32)
+    # ann_min_size is set out of reach so identify() never schedules a background build
+    gallery = EmbeddingGallery(ann_min_size=1 << 62)
+    for u in range(users):
+        samples = identities[u] + 0.35 * rng.normal(size=(per_user, dim)).astype(np.float32)
+        gallery.upsert("bench", f"user-{u}", samples)
+    return gallery, identities
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    rows = []
+    for size in args.sizes:
+        gallery, identities = build_gallery(size, args.per_user, args.dim, seed=size)
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(identities), size=args.queries)
+        queries = identities[picks] + 0.35 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        shard = gallery._shards["bench"]
+        exact_best, durations = [], []
+        for q in queries:
+            start = time.perf_counter()
+            result = gallery._identify_exact(shard, q, args.top_k)
+            durations.append(time.perf_counter() - start)
+            exact_best.append(result[0]["user_id"])
+        rows.append({"rows": size, "mode": "exact", "nprobe": "-", "build_s": "-",
+                     **percentiles(durations), "recall@1": 1.0})
+
+        start = time.perf_counter()
+        gallery.build_index("bench")
+        build_s = round(time.perf_counter() - start, 2)
+        snapshot = gallery._ann["bench"]
+        for nprobe in args.nprobe:
+            snapshot.index.nprobe = nprobe
+            hits, durations = 0, []
+            for q, expected in zip(queries, exact_best):
+                start = time.perf_counter()
+                result = gallery._identify_ann(snapshot, q, args.top_k)
+                durations.append(time.perf_counter() - start)
+                hits += bool(result) and result[0]["user_id"] == expected
+            rows.append({"rows": size, "mode": "ivfpq", "nprobe": nprobe, "build_s": build_s,
+                         **percentiles(durations), "recall@1": round(hits / len(queries), 3)})
+
+    print_table("1:N identify (per query)", rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
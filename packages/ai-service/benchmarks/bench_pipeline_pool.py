@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Face pipeline scaling: in-process thread pool vs worker processes, 1..N workers.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_pipeline_pool --workers 1 2 4 8 --requests 400
+    python -m benchmarks.bench_pipeline_pool --workload pipeline   # needs the models
+
+Workloads:
+    texture   TextureAnalyzer on four face-sized crops of each frame (pure
+              numpy/OpenCV, no model files needed; GIL-bound like the real
+              numpy stages)
+    pipeline  FaceService.analyze_decoded: detection + embedding + hybrid
+              anti-spoofing, with models loaded once per worker
+
+Modes: "thread" calls the stage from N threads in this process,
+"process-shm" uses FacePipelinePool (frames via shared memory) and
+"process-pickle" submits the same frames pickled, to show the hand-off cost.
+Throughput only scales with real cores; compare runs on the target node size.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.common import print_table, run_concurrent, synthetic_image
+
+_analyzer = None
+
+
+def texture_workload(image: np.ndarray) -> bool:
+    global _analyzer
+    if _analyzer is None:
+        from app.services.texture_analyzer import TextureAnalyzer
+
+        _analyzer = TextureAnalyzer()
+    h, w = image.shape[:2]
+    size = min(h, w) // 3
+    real = True
+    for y, x in ((0, 0), (0, w - size), (h - size, 0), (h - size, w - size)):
+        real &= _analyzer.comprehensive_check(image[y:y + size, x:x + size])['is_real']
+    return real
+
+
+def pipeline_workload(image: np.ndarray) -> bool:
+    from app.services import pipeline_pool
+    from app.utils.image_utils import DecodedImage
+
+    if pipeline_pool._service is None:
+        pipeline_pool._init_worker(preload=True)
+    detection, _ = pipeline_pool._service.analyze_decoded(
+        DecodedImage({'valid': True, 'details': {}}, image), spoof_method="hybrid"
+    )
+    return detection['success']
+
+
+def _pickled(fn, image):
+    return fn(image)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workload", choices=["texture", "pipeline"], default="texture")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--start-method", default="spawn")
+    args = parser.parse_args()
+
+    from app.services.pipeline_pool import FacePipelinePool
+
+    fn = texture_workload if args.workload == "texture" else pipeline_workload
+    frames = [synthetic_image(args.width, args.height, seed=i) for i in range(8)]
+
+    rows = []
+    for workers in args.workers:
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            stats = run_concurrent(
+                lambda i: threads.submit(fn, frames[i % len(frames)]).result(), args.requests, workers
+            )
+        rows.append({"mode": "thread", "workers": workers, **stats})
+
+        pool = FacePipelinePool(workers=workers, start_method=args.start_method, preload=False)
+        try:
+            pool.warm_up()
+            # One untimed pass so every worker has imported and initialised the stage
+            run_concurrent(lambda i: pool.run(fn, frames[i % len(frames)]), workers * 2, workers)
+            stats = run_concurrent(lambda i: pool.run(fn, frames[i % len(frames)]), args.requests, workers)
+            rows.append({"mode": "process-shm", "workers": workers, **stats})
+            stats = run_concurrent(
+                lambda i: pool._executor.submit(_pickled, fn, frames[i % len(frames)]).result(),
+                args.requests, workers,
+            )
+            rows.append({"mode": "process-pickle", "workers": workers, **stats})
+        finally:
+            pool.shutdown()
+
+    print_table(f"Face pipeline scaling ({args.workload}, {os.cpu_count()} CPUs)", rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
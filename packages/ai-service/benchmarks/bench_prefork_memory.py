@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Memory of N pre-forked workers vs N independently started workers.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_prefork_memory --workers 4
+    python -m benchmarks.bench_prefork_memory --workers 4 --workload app   # needs the models
+
+Workloads:
+    synthetic  imports the heavy libraries (numpy, cv2, onnxruntime,
+               insightface, torch), builds MiniFASNetV2 and holds
+               --weights-mb of random "weights" (no model files needed)
+    app        app.prefork.preload() in the master, then
+               FaceService.load_models() in each worker (ONNX sessions
+               after fork), exactly like run.py with WEB_WORKERS > 1
+
+"prefork" loads in one master and forks (gc.freeze before fork);
+"independent" starts each worker as its own interpreter. Compare the PSS
+totals: PSS divides shared pages between the processes mapping them, so it
+adds up to the memory the group really uses. Linux only (/proc smaps_rollup).
+"""
+import argparse
+import gc
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table
+
+_held = []
+
+
+def preload(workload: str, weights_mb: int) -> None:
+    if workload == "app":
+        from app.prefork import preload as app_preload
+
+        app_preload()
+        return
+    import importlib
+
+    import numpy as np
+
+    from app.prefork import PRELOAD_MODULES
+
+    for name in PRELOAD_MODULES + ("torch",):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    from app.models.anti_spoofing_model import MiniFASNetV2
+
+    _held.append(MiniFASNetV2(embedding_size=128, conv6_kernel=(5, 5), drop_p=0.0, num_classes=3, img_channel=3))
+    rng = np.random.default_rng(0)
+    _held.append(rng.random(weights_mb * 1024 * 1024 // 8))
+
+
+def worker_init(workload: str) -> None:
+    if workload == "app":
+        from app.routers import face_router
+
+        face_router.face_service.load_models()
+
+
+def _child(workload: str, weights_mb: int, preloaded: bool) -> None:
+    """Worker body: finish loading, report ready on stdout, wait for SIGTERM."""
+    if not preloaded:
+        preload(workload, weights_mb)
+    worker_init(workload)
+    print("ready", flush=True)
+    signal.sigwait({signal.SIGTERM})
+
+
+def run_prefork(workers: int, workload: str, weights_mb: int):
+    from app.prefork import PreforkMaster, memory_report
+
+    preload(workload, weights_mb)
+    gc.collect()
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+
+    def target(index: int) -> None:
+        os.dup2(write_fd, 1)
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        _child(workload, weights_mb, preloaded=True)
+
+    master = PreforkMaster(workers, target, stop_timeout=10)
+    master.start()
+    with os.fdopen(read_fd) as ready:
+        for _ in range(workers):
+            ready.readline()
+    report = memory_report(os.getpid(), sorted(master.pids))
+    master.stop()
+    os.close(write_fd)
+    return report
+
+
+def run_independent(workers: int, workload: str, weights_mb: int):
+    from app.prefork import memory_report
+
+    cmd = [sys.executable, "-m", "benchmarks.bench_prefork_memory", "--child",
+           "--workload", workload, "--weights-mb", str(weights_mb)]
+    procs = [subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    try:
+        for proc in procs:
+            proc.stdout.readline()
+        report = memory_report(os.getpid(), [proc.pid for proc in procs])
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=30)
+    # This benchmark process is not part of an independent deployment
+    report["processes"] = [row for row in report["processes"] if row["role"] == "worker"]
+    report["total_rss_mb"] = round(sum(row["rss_mb"] for row in report["processes"]), 1)
+    report["total_pss_mb"] = round(sum(row["pss_mb"] for row in report["processes"]), 1)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--workload", choices=["synthetic", "app"], default="synthetic")
+    parser.add_argument("--weights-mb", type=int, default=100)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        _child(args.workload, args.weights_mb, preloaded=False)
+        return 0
+    if not os.path.exists(f"/proc/{os.getpid()}/smaps_rollup"):
+        print("Needs Linux /proc/<pid>/smaps_rollup", file=sys.stderr)
+        return 1
+
+    # Independent first: the pre-fork run loads everything into this process
+    started = time.perf_counter()
+    independent = run_independent(args.workers, args.workload, args.weights_mb)
+    independent_s = time.perf_counter() - started
+    started = time.perf_counter()
+    prefork = run_prefork(args.workers, args.workload, args.weights_mb)
+    prefork_s = time.perf_counter() - started
+
+    rows = []
+    for mode, report in (("independent", independent), ("prefork", prefork)):
+        for row in report["processes"]:
+            rows.append({"mode": mode, **row})
+    print_table("Per process", rows)
+    print_table("Totals", [
+        {"mode": "independent", "workers": args.workers, "total_pss_mb": independent["total_pss_mb"],
+         "total_rss_mb": independent["total_rss_mb"], "startup_s": round(independent_s, 1)},
+        {"mode": "prefork", "workers": args.workers, "total_pss_mb": prefork["total_pss_mb"],
+         "total_rss_mb": prefork["total_rss_mb"], "startup_s": round(prefork_s, 1)},
+    ])
+    saved = independent["total_pss_mb"] - prefork["total_pss_mb"]
+    print(f"\nPre-fork saves {saved:.0f} MB PSS ({saved / max(independent['total_pss_mb'], 1e-9):.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
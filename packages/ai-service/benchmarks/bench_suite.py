@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the face pipeline: per-function and end-to-end
+p50/p95/p99, a per-stage breakdown and throughput, with saved baselines.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_suite                          # stub models, synthetic JPEGs
+    python -m benchmarks.bench_suite --save main              # write benchmarks/baselines/main.json
+    python -m benchmarks.bench_suite --compare main --fail-on-regression
+    python -m benchmarks.bench_suite --models real --images a.jpg b.jpg
+
+--models auto (default) uses the real models when the InsightFace weights
+are present at MODEL_PATH, stub models otherwise (benchmarks/stubs.py:
+deterministic results, seeded latency of --detect-ms/--embed-ms/--sfas-ms).
+With stubs, ImageUtils, TextureAnalyzer, FaceRecognizer and FaceService's
+orchestration run for real, so the numbers track changes to everything but
+the networks themselves.
+
+Synthetic frames look like a print attack to the texture heuristics, which
+would end every verify at the first cascade stage. Stub runs therefore use
+the cascade without early exit so every stage is measured; the "outcome"
+column shows what the call returned.
+
+--compare flags a case whose p50/p95 grew, or whose throughput dropped, by
+more than --tolerance against the baseline. Baselines are only comparable
+on the same machine, model mode and stub latencies (all stored in "meta").
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.common import ROOT, percentiles, print_table, run_concurrent, synthetic_jpeg, time_calls
+from benchmarks.stubs import (
+    DEFAULT_DETECT_MS,
+    DEFAULT_EMBED_MS,
+    DEFAULT_SFAS_MS,
+    StubAntiSpoofing,
+    StubFaceDetector,
+    StubLatency,
+)
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+FRAME_SIZE = (1280, 960)
+REGISTER_IMAGES = 4
+REFERENCE_COUNT = 5
+
+# Metric -> True when higher is worse
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "throughput_per_s": False}
+
+
+def build_service(models: str, args: argparse.Namespace):
+    """FaceService (in-process pipeline) with real or stub models; returns (service, mode)."""
+    from app.services.anti_spoofing_cascade import AntiSpoofingCascade
+    from app.services.face_service import FaceService
+    from app.utils.config import MODEL_PATH
+
+    if models == "auto":
+        models = "real" if os.path.exists(MODEL_PATH) else "stub"
+
+    service = FaceService(use_pipeline_pool=False)
+    if models == "real":
+        if not service.load_models():
+            raise RuntimeError(f"Real models unavailable: {service.models_error}")
+        return service, "real"
+
+    latency = StubLatency(mode=args.stub_mode, jitter=args.jitter, seed=args.seed)
+    service.detector = StubFaceDetector(args.detect_ms, args.embed_ms, latency=latency)
+    service.anti_spoofing = StubAntiSpoofing(args.sfas_ms, latency=latency)
+    service.anti_spoofing_cascade = AntiSpoofingCascade(
+        order=service.anti_spoofing_cascade.order, early_exit=False
+    )
+    service.models_ready = True
+    return service, "stub"
+
+
+def load_payloads(paths: Optional[List[str]], count: int) -> List[bytes]:
+    """JPEG bytes from --images (cycled to ``count``), or synthetic camera frames."""
+    if not paths:
+        return [synthetic_jpeg(*FRAME_SIZE, seed=i) for i in range(count)]
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    return [payloads[i % len(payloads)] for i in range(count)]
+
+
+def _outcome(result: Dict[str, Any]) -> str:
+    if result.get("error_code"):
+        return result["error_code"]
+    if "match" in result:
+        return "match" if result["match"] else "no_match"
+    if "is_real" in result:
+        return "real" if result["is_real"] else "spoof"
+    return "ok" if result.get("success") else "failed"
+
+
+def _case(name: str, samples: List[float], **extra: Any) -> Dict[str, Any]:
+    stats = percentiles(samples)
+    ops = round(1000.0 / stats["mean_ms"], 1) if stats["mean_ms"] else 0.0
+    return {"case": name, **stats, "ops_per_s": ops, **extra}
+
+
+def _timed_with_stages(fn, iterations: int, warmup: int = 3):
+    """Like time_calls, but also collects each call's stages; returns (samples, stages, last result)."""
+    from app.utils.stage_timer import timing_scope
+
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    result: Any = None
+    for _ in range(iterations):
+        with timing_scope() as timings:
+            started = time.perf_counter()
+            result = fn()
+            samples.append(time.perf_counter() - started)
+        for name, seconds in timings.items():
+            stages.setdefault(name, []).append(seconds)
+    return samples, stages, result
+
+
+def run_suite(
+    service,
+    payloads: List[bytes],
+    iterations: int,
+    concurrency: List[int],
+    requests: int,
+) -> Dict[str, Any]:
+    """Run every case; returns {"functions", "end_to_end", "stages", "throughput"}."""
+    from app.services.texture_analyzer import TextureAnalyzer
+    from app.utils.image_utils import ImageUtils
+
+    image_utils = ImageUtils()
+    decoded = image_utils.decode_image(payloads[0])
+    if not decoded.validation["valid"]:
+        raise ValueError(f"Benchmark image rejected: {decoded.validation['error']}")
+    image = decoded.image
+
+    detection = service.detector.detect_single_face(image)
+    if not detection["success"]:
+        raise ValueError(f"No single face in the benchmark image: {detection.get('error_message')}")
+    face = detection["face"]
+    x1, y1, x2, y2 = (int(round(v)) for v in face["bbox"])
+    crop = image[max(0, y1):y2, max(0, x1):x2]
+    candidate = np.asarray(face["embedding"], dtype=np.float32)
+
+    # The candidate's own embedding plus noisy copies, like a 4-5 photo registration
+    rng = np.random.default_rng(0)
+    references = [candidate.tolist()] + [
+        (candidate + 0.05 * rng.normal(size=candidate.shape)).tolist() for _ in range(REFERENCE_COUNT - 1)
+    ]
+    texture = service.texture_analyzer or TextureAnalyzer()
+
+    functions = [
+        _case("decode_image", time_calls(lambda: image_utils.decode_image(payloads[0]), iterations)),
+        _case("detect_single_face", time_calls(lambda: service.detector.detect_single_face(image), iterations)),
+        _case("texture_check", time_calls(lambda: texture.comprehensive_check(crop), iterations)),
+        _case("verify_against_multiple", time_calls(
+            lambda: service.recognizer.verify_against_multiple(candidate, references), iterations
+        )),
+    ]
+    if service.anti_spoofing is not None:
+        functions.append(_case("sfas_predict", time_calls(
+            lambda: service.anti_spoofing.predict(image, bbox=face["bbox"]), iterations
+        )))
+
+    flows = {
+        "verify_face": lambda: service.verify_face(payloads[0], reference_embeddings=references),
+        "register_faces": lambda: service.register_faces(payloads[:REGISTER_IMAGES], require_liveness=False),
+        "check_anti_spoofing_only": lambda: service.check_anti_spoofing_only(payloads[0]),
+    }
+    end_to_end, stages = [], {}
+    for name, fn in flows.items():
+        samples, stage_samples, result = _timed_with_stages(fn, iterations)
+        end_to_end.append(_case(name, samples, outcome=_outcome(result)))
+        stages[name] = {stage: percentiles(values) for stage, values in stage_samples.items()}
+
+    throughput = []
+    for workers in concurrency:
+        stats = run_concurrent(
+            lambda i: service.verify_face(payloads[i % len(payloads)], reference_embeddings=references),
+            total_calls=requests,
+            concurrency=workers,
+        )
+        throughput.append({"case": f"verify_face@{workers}", **stats})
+
+    return {"functions": functions, "end_to_end": end_to_end, "stages": stages, "throughput": throughput}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``current`` against ``baseline`` beyond ``tolerance``."""
+    def by_case(results):
+        return {
+            row["case"]: row
+            for section in ("functions", "end_to_end", "throughput")
+            for row in results.get(section, [])
+        }
+
+    previous = by_case(baseline)
+    regressions = []
+    for case, row in by_case(current).items():
+        before = previous.get(case)
+        if before is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = before.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(f"{case} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=("auto", "stub", "real"), default="auto")
+    parser.add_argument("--images", nargs="+", default=None, help="Face photos (JPEG/PNG); synthetic frames otherwise")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=64, help="verify_face calls per concurrency level")
+    parser.add_argument("--stub-mode", choices=("sleep", "spin"), default="sleep",
+                        help="sleep releases the GIL like onnxruntime/torch; spin burns CPU")
+    parser.add_argument("--detect-ms", type=float, default=DEFAULT_DETECT_MS)
+    parser.add_argument("--embed-ms", type=float, default=DEFAULT_EMBED_MS)
+    parser.add_argument("--sfas-ms", type=float, default=DEFAULT_SFAS_MS)
+    parser.add_argument("--jitter", type=float, default=0.15, help="Log-normal sigma of stub latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME", help="Write results to benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative change (0.15 = 15%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when --compare finds regressions")
+    args = parser.parse_args()
+
+    service, mode = build_service(args.models, args)
+    if mode == "real" and not args.images:
+        print("note: synthetic frames contain no face; pass --images for real-model runs")
+    payloads = load_payloads(args.images, max(REGISTER_IMAGES, 8))
+    results = run_suite(service, payloads, args.iterations, args.concurrency, args.requests)
+
+    print_table(f"Per function ({mode} models)", results["functions"])
+    print_table(f"End to end ({mode} models)", results["end_to_end"])
+    for name, stages in results["stages"].items():
+        print_table(f"{name} stages", [{"stage": stage, **stats} for stage, stats in stages.items()])
+    print_table("verify_face throughput", results["throughput"])
+
+    results["meta"] = {
+        "models": mode,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv_threads": cv2.getNumThreads(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "fail_on_regression")},
+    }
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {path}")
+
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("models") != mode:
+            print(f"warning: baseline was recorded with {baseline.get('meta', {}).get('models')} models")
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n== Compared with {args.compare} (tolerance {args.tolerance:.0%}) ==")
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if not regressions:
+            print("no regressions")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
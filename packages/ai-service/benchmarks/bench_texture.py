@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+TextureAnalyzer cost per face: previous implementation vs the current one
+(both at the crop's own resolution) and the opt-in canonical-size mode,
+across face crop sizes.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.bench_texture --iterations 300
+    python -m benchmarks.bench_texture --max-p50-ms 1.0   # exit 1 if slower
+
+The legacy path is the previous implementation: np.roll LBP on a float32
+copy and a complex fft2 with freshly built masks, both at the crop's own
+resolution. The current row runs at native resolution too, so its cost
+still grows with the face size. The canonical row (--canonical-size, the
+TEXTURE_CANONICAL_SIZE setting) resizes every face first; only that mode
+has a constant cost, so --max-p50-ms (the sub-millisecond budget) applies
+to the canonical row alone and fails the run if its p50 exceeds the budget
+for any size.
+"""
+import argparse
+import sys
+
+import cv2
+import numpy as np
+
+from benchmarks.common import percentiles, print_table, synthetic_image, time_calls
+
+FACE_SIZES = (112, 256, 480)
+
+
+def legacy_check(face: np.ndarray) -> dict:
+    gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+
+    g = gray.astype(np.float32)
+    lbp = np.zeros(g.shape, dtype=np.uint8)
+    for k, (dy, dx) in enumerate(((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))):
+        shifted = np.roll(np.roll(g, dy, axis=0), dx, axis=1)
+        lbp |= (shifted >= g).astype(np.uint8) << k
+    hist, _ = np.histogram(lbp.ravel(), bins=256, range=(0, 256), density=True)
+
+    magnitude = np.abs(np.fft.fftshift(np.fft.fft2(g)))
+    h, w = magnitude.shape
+    ch, cw = h // 2, w // 2
+    y, x = np.ogrid[:h, :w]
+    mask = (x - cw) ** 2 + (y - ch) ** 2 <= (min(h, w) // 8) ** 2
+    ratio = magnitude[~mask].sum() / magnitude.sum()
+    region = magnitude[ch - ch // 2:ch + ch // 2, cw - cw // 2:cw + cw // 2].astype(np.float32)
+    local_max = cv2.dilate(region, np.ones((5, 5)))
+    peaks = int(((region == local_max) & (region > region.mean() * 3)).sum())
+    return {"entropy": float(-(hist[hist > 0] * np.log2(hist[hist > 0])).sum()), "ratio": ratio, "peaks": peaks}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(FACE_SIZES), help="Face crop sizes (px)")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--canonical-size", type=int, default=128, help="Size for the canonical row (px)")
+    parser.add_argument("--max-p50-ms", type=float, default=None,
+                        help="Fail (exit 1) if the canonical row's p50 exceeds this for any size")
+    args = parser.parse_args()
+
+    from app.services.texture_analyzer import TextureAnalyzer
+
+    analyzer = TextureAnalyzer()
+    canonical = TextureAnalyzer(canonical_size=args.canonical_size)
+    canonical_mode = f"canonical{args.canonical_size}"
+    rows, over_budget = [], []
+    for size in args.sizes:
+        face = synthetic_image(size, int(size * 1.2), seed=size)
+        modes = (
+            ("legacy", legacy_check),
+            ("current", analyzer.comprehensive_check),
+            (canonical_mode, canonical.comprehensive_check),
+        )
+        for mode, fn in modes:
+            stats = percentiles(time_calls(lambda: fn(face), args.iterations))
+            rows.append({"face_px": f"{size}x{int(size * 1.2)}", "mode": mode, **stats})
+            if mode == canonical_mode and args.max_p50_ms is not None and stats["p50_ms"] > args.max_p50_ms:
+                over_budget.append((size, stats["p50_ms"]))
+
+    print_table("Texture analysis (per face)", rows)
+    if over_budget:
+        for size, p50 in over_budget:
+            print(f"FAIL: {size}px face {canonical_mode} p50 {p50} ms > budget {args.max_p50_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
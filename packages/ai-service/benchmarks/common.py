@@ -0,0 +1,115 @@
+"""Shared helpers for benchmark scripts: timing, percentiles and synthetic inputs"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Allow `python benchmarks/bench_x.py` as well as `python -m benchmarks.bench_x`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    arr = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def time_calls(fn: Callable[[], object], iterations: int, warmup: int = 3) -> List[float]:
+    """Run ``fn`` sequentially and return per-call durations (seconds)."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def run_concurrent(
+    fn: Callable[[int], object],
+    total_calls: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """
+    Fire ``total_calls`` calls of ``fn(i)`` from ``concurrency`` threads.
+
+    Returns throughput (calls/s) plus latency percentiles.
+    """
+    latencies: List[float] = []
+
+    def _one(i: int) -> None:
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_one, range(total_calls)))
+    wall = time.perf_counter() - wall_start
+
+    result = {"calls": total_calls, "concurrency": concurrency,
+              "wall_s": round(wall, 3), "throughput_per_s": round(total_calls / wall, 2)}
+    result.update(percentiles(latencies))
+    return result
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Deterministic BGR test frame with smooth gradients plus sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin(xx / 97.0),
+        127 + 100 * np.cos(yy / 71.0),
+        127 + 100 * np.sin((xx + yy) / 131.0),
+    ], axis=-1)
+    noise = rng.normal(0, 12, size=base.shape)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def synthetic_jpeg(width: int, height: int, seed: int = 0, quality: int = 90) -> bytes:
+    """Encode ``synthetic_image`` as JPEG bytes (phone-camera-like payload)."""
+    import cv2
+
+    ok, buf = cv2.imencode(".jpg", synthetic_image(width, height, seed),
+                           [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buf.tobytes()
+
+
+def load_image(path: Optional[str], width: int = 1280, height: int = 960) -> np.ndarray:
+    """Load a BGR image from disk, or fall back to a synthetic frame."""
+    if path:
+        import cv2
+
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileNotFoundError(f"Cannot read image: {path}")
+        return image
+    return synthetic_image(width, height)
+
+
+def print_table(title: str, rows: List[Dict[str, object]]) -> None:
+    """Minimal fixed-width table printer (no extra dependencies)."""
+    print(f"\n== {title} ==")
+    if not rows:
+        print("(no results)")
+        return
+    headers = list(rows[0].keys())
+    widths = {h: max(len(str(h)), *(len(str(r.get(h, ""))) for r in rows)) for h in headers}
+    print("  ".join(str(h).ljust(widths[h]) for h in headers))
+    for r in rows:
+        print("  ".join(str(r.get(h, "")).ljust(widths[h]) for h in headers))
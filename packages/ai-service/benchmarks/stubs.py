@@ -0,0 +1,121 @@
+"""
+Deterministic stand-ins for the downloaded models, for benchmarks on a box
+without weights.
+
+The stubs return the same result for the same frame (the embedding is seeded
+from the pixels, the box is a fixed share of the frame) and spend a
+configurable, seeded latency so FaceService's orchestration, ImageUtils,
+TextureAnalyzer and FaceRecognizer are measured around realistic model time.
+
+``mode="sleep"`` releases the GIL while "running", like onnxruntime and
+torch do during inference; ``mode="spin"`` burns CPU instead, to model a
+saturated core.
+"""
+import random
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+# Rough CPU latencies of the real models (buffalo_sc at det_size 320, MiniFASNetV2 80x80)
+DEFAULT_DETECT_MS = 18.0
+DEFAULT_EMBED_MS = 12.0
+DEFAULT_SFAS_MS = 8.0
+
+
+class StubLatency:
+    """Seeded log-normal latency around ``ms``; ``jitter`` is the log-space sigma."""
+
+    def __init__(self, mode: str = "sleep", jitter: float = 0.15, seed: int = 0) -> None:
+        if mode not in ("sleep", "spin"):
+            raise ValueError(f"Unknown stub latency mode {mode!r} (sleep or spin)")
+        self.mode = mode
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def spend(self, ms: float) -> None:
+        if ms <= 0:
+            return
+        with self._lock:
+            factor = self._rng.lognormvariate(0.0, self.jitter) if self.jitter > 0 else 1.0
+        seconds = ms * factor / 1000.0
+        if self.mode == "sleep":
+            time.sleep(seconds)
+            return
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+
+def _frame_seed(image: np.ndarray) -> int:
+    # A coarse grid of pixels identifies the frame; full hashing would dominate small stubs
+    return zlib.crc32(np.ascontiguousarray(image[::16, ::16]).tobytes())
+
+
+class StubFaceDetector:
+    """Drop-in for FaceDetector: one face per frame, deterministic embedding."""
+
+    def __init__(
+        self,
+        detect_ms: float = DEFAULT_DETECT_MS,
+        embed_ms: float = DEFAULT_EMBED_MS,
+        latency: Optional[StubLatency] = None,
+    ) -> None:
+        self.detect_ms = detect_ms
+        self.embed_ms = embed_ms
+        self.latency = latency or StubLatency()
+        self.app = self   # FaceDetector API: "model loaded"
+
+    def embedding_for(self, image: np.ndarray) -> np.ndarray:
+        vector = np.random.default_rng(_frame_seed(image)).normal(size=EMBEDDING_DIM).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def detect_single_face(self, image: np.ndarray, with_embedding: bool = True) -> Dict[str, Any]:
+        self.latency.spend(self.detect_ms + (self.embed_ms if with_embedding else 0.0))
+        h, w = image.shape[:2]
+        side = min(h, w) * 0.45
+        x1, y1 = (w - side) / 2, (h - side) / 2
+        x2, y2 = x1 + side, y1 + side
+        kps = [
+            [x1 + 0.3 * side, y1 + 0.4 * side], [x1 + 0.7 * side, y1 + 0.4 * side],
+            [x1 + 0.5 * side, y1 + 0.6 * side],
+            [x1 + 0.35 * side, y1 + 0.8 * side], [x1 + 0.65 * side, y1 + 0.8 * side],
+        ]
+        return {
+            "success": True,
+            "face": {
+                "embedding": self.embedding_for(image).tolist() if with_embedding else None,
+                "bbox": [x1, y1, x2, y2],
+                "score": 0.98,
+                "confidence": 0.98,
+                "kps": kps,
+            },
+        }
+
+    def get_batching_stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+
+class StubAntiSpoofing:
+    """Drop-in for AntiSpoofingDetector: always "real" with a fixed score."""
+
+    def __init__(self, sfas_ms: float = DEFAULT_SFAS_MS, latency: Optional[StubLatency] = None) -> None:
+        self.sfas_ms = sfas_ms
+        self.latency = latency or StubLatency()
+
+    def predict(self, image: np.ndarray, bbox=None) -> Dict[str, Any]:
+        self.latency.spend(self.sfas_ms)
+        return {
+            "is_real": True,
+            "confidence": 0.97,
+            "real_prob": 0.97,
+            "fake_prob": 0.03,
+            "score": 0.94,
+            "attack_type": "none",
+            "method": "stub",
+        }
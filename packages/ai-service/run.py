@@ -1,25 +1,35 @@
 #!/usr/bin/env python3
 """
 Entry point to run Face Recognition API server
+
+WEB_WORKERS > 1 starts the pre-fork launcher (app/prefork.py): the app and
+the torch weights are loaded once and shared copy-on-write by the workers.
+
+Limitation: the embedding gallery (register/verify by user_id, /identify,
+/gallery) is kept in each process's memory and is not shared between
+workers, so the launcher refuses to start with WEB_WORKERS > 1 unless
+FACE_GALLERY_ENABLED=false. Scale the gallery with one worker per
+container instead. Liveness sessions must be shared as well:
+SESSION_STORAGE_TYPE=redis, or LIVENESS_SESSION_MODE=token with a
+LIVENESS_TOKEN_SECRET.
 """
 import uvicorn
 import os
-from app.utils.config import HOST, PORT, LOG_LEVEL
+from app.utils.config import HOST, PORT, LOG_LEVEL, WEB_WORKERS, PREFORK_MEMORY_REPORT_S
 
 if __name__ == "__main__":
     # Enable reload only in development mode
     reload_enabled = os.getenv("DEV_MODE", "false").lower() == "true"
 
-    uvicorn.run(
-        "app.main:app",
-        host=HOST,
-        port=PORT,
-        reload=reload_enabled,
-        log_level=LOG_LEVEL.lower()
-    )
-
-
-
-
-
-
+    if WEB_WORKERS > 1 and not reload_enabled:
+        from app import prefork
+
+        prefork.run(WEB_WORKERS, HOST, PORT, LOG_LEVEL, report_after=PREFORK_MEMORY_REPORT_S)
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=HOST,
+            port=PORT,
+            reload=reload_enabled,
+            log_level=LOG_LEVEL.lower()
+        )
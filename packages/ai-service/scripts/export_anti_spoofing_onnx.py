@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Export the MiniFASNetV2 anti-spoofing checkpoint to ONNX (+ optional int8 variant)
+
+Usage (from packages/ai-service):
+    python scripts/export_anti_spoofing_onnx.py
+    python scripts/export_anti_spoofing_onnx.py --quantize --calibration-dir data/checkin_photos
+
+--quantize requires --calibration-dir: a directory of real check-in photos
+(one face each). Faces are located with the detector and cropped exactly as
+at inference; every 5th photo is held out of calibration and used for the
+torch vs ONNX parity check (or pass --parity-dir).
+
+Then run the service with ANTI_SPOOFING_BACKEND=onnx
+(and ANTI_SPOOFING_ONNX_QUANTIZED=true for the int8 model).
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.models.anti_spoofing_model import export_onnx, quantize_onnx
+from app.services.anti_spoofing_detector import AntiSpoofingDetector, quantized_onnx_path
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = os.environ.get(
+    "ANTI_SPOOFING_MODEL_PATH",
+    str(Path(ROOT) / "models" / "2.7_80x80_MiniFASNetV2.pth"),
+)
+
+
+# Every HOLDOUT_EVERY-th photo is kept out of calibration for the parity check
+HOLDOUT_EVERY = 5
+
+
+def random_items(samples: int = 16) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+    """Noise frames with a fixed bbox (numeric fp32 parity only, no faces needed)."""
+    rng = np.random.default_rng(0)
+    return [(rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8), (100, 60, 200, 180))
+            for _ in range(samples)]
+
+
+def load_face_items(directory: str, limit: int = 250) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+    """(image, face bbox) for photos in ``directory`` with exactly one detected face."""
+    import cv2
+
+    from app.models.face_detector import FaceDetector
+
+    detector = FaceDetector()
+    items = []
+    for path in sorted(Path(directory).iterdir())[:limit]:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        result = detector.detect_single_face(image, with_embedding=False)
+        if not result.get("success"):
+            logger.warning(f"Skipping {path.name}: {result.get('error_code')}")
+            continue
+        x1, y1, x2, y2 = (int(v) for v in result["face"]["bbox"])
+        items.append((image, (x1, y1, x2, y2)))
+    if not items:
+        raise SystemExit(f"No photos with a single detectable face in {directory}")
+    logger.info(f"Loaded {len(items)} face photos from {directory}")
+    return items
+
+
+def check_parity(checkpoint: str, onnx_path: str, quantized: bool, items) -> float:
+    """Max absolute difference in real-class probability between torch and ONNX."""
+    reference = AntiSpoofingDetector(model_path=checkpoint, backend="torch", device="cpu")
+    candidate = AntiSpoofingDetector(model_path=checkpoint, backend="onnx",
+                                     onnx_path=onnx_path, quantized=quantized)
+    ref = reference._backend.infer(reference._preprocess_batch([reference._scaled_crop(i, b) for i, b in items]))
+    out = candidate._backend.infer(candidate._preprocess_batch([candidate._scaled_crop(i, b) for i, b in items]))
+    return float(np.abs(ref - out).max())
+
+
+def calibration_batch(checkpoint: str, items) -> np.ndarray:
+    """Face crops (2.7x context, as at inference) preprocessed into an N x 3 x 80 x 80 array."""
+    detector = AntiSpoofingDetector(model_path=checkpoint, backend="torch", device="cpu")
+    return detector._preprocess_batch([detector._scaled_crop(image, bbox) for image, bbox in items])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Path to the .pth checkpoint")
+    parser.add_argument("--output", help="Output .onnx path (default: checkpoint path with .onnx suffix)")
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--quantize", action="store_true",
+                        help="Also write a static int8 <name>.int8.onnx (requires --calibration-dir)")
+    parser.add_argument("--calibration-dir", help="Directory of real face photos used to calibrate int8 ranges")
+    parser.add_argument("--parity-dir",
+                        help="Face photos for the parity check (default: held-out photos of --calibration-dir)")
+    parser.add_argument("--skip-parity", action="store_true", help="Skip the torch vs onnx output comparison")
+    args = parser.parse_args()
+    if args.quantize and not args.calibration_dir:
+        parser.error("--quantize requires --calibration-dir (real face photos)")
+
+    faces = load_face_items(args.calibration_dir) if args.calibration_dir else []
+    if args.parity_dir:
+        calibration, parity = faces, load_face_items(args.parity_dir)
+    else:
+        calibration = [item for i, item in enumerate(faces) if i % HOLDOUT_EVERY]
+        parity = [item for i, item in enumerate(faces) if not i % HOLDOUT_EVERY]
+
+    onnx_path = args.output or str(Path(args.checkpoint).with_suffix(".onnx"))
+
+    logger.info(f"Exporting {args.checkpoint} -> {onnx_path}")
+    export_onnx(args.checkpoint, onnx_path, opset=args.opset)
+
+    if args.quantize:
+        int8_path = quantized_onnx_path(onnx_path)
+        logger.info(f"Quantizing (static int8, QDQ) -> {int8_path}")
+        quantize_onnx(onnx_path, int8_path, calibration_data=calibration_batch(args.checkpoint, calibration))
+
+    if not args.skip_parity:
+        if not parity:
+            logger.warning("No face photos given: fp32 parity runs on noise frames")
+        fp32_items = parity or random_items()
+        logger.info(f"fp32 max |Δprob| vs torch: {check_parity(args.checkpoint, onnx_path, False, fp32_items):.6f}")
+        if args.quantize:
+            logger.info(f"int8 max |Δprob| vs torch on {len(parity)} face crops: "
+                        f"{check_parity(args.checkpoint, onnx_path, True, parity):.6f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
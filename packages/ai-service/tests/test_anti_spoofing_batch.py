@@ -0,0 +1,53 @@
+"""
+AntiSpoofingDetector.predict_batch — kết quả từng ảnh phải giống hệt predict() đơn lẻ.
+Dùng checkpoint MiniFASNetV2 khởi tạo ngẫu nhiên (không cần file .pth thật).
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+torch = pytest.importorskip("torch")
+
+
+@pytest.fixture(scope="module")
+def detector(tmp_path_factory):
+    from app.models.anti_spoofing_model import MiniFASNetV2
+    from app.services.anti_spoofing_detector import AntiSpoofingDetector
+
+    torch.manual_seed(0)
+    model = MiniFASNetV2(embedding_size=128, conv6_kernel=(5, 5), drop_p=0.0, num_classes=3)
+    checkpoint = tmp_path_factory.mktemp("sfas") / "2.7_80x80_MiniFASNetV2.pth"
+    torch.save(model.state_dict(), checkpoint)
+    return AntiSpoofingDetector(model_path=str(checkpoint), device="cpu")
+
+
+def _frames(n):
+    rng = np.random.default_rng(42)
+    return [rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def test_batch_results_match_single_predictions(detector):
+    frames = _frames(5)
+    bboxes = [(100, 60, 180, 160), (20, 20, 90, 110), None, (150, 90, 260, 220), (0, 0, 319, 239)]
+    items = list(zip(frames, bboxes))
+
+    batched = detector.predict_batch(items)
+    single = [detector.predict(image, bbox=bbox) for image, bbox in items]
+
+    assert batched == single
+
+
+def test_bad_item_does_not_fail_the_batch(detector):
+    frames = _frames(2)
+    items = [(frames[0], (100, 60, 180, 160)), (np.zeros((0, 0, 3), np.uint8), None), (frames[1], None)]
+
+    results = detector.predict_batch(items)
+
+    assert results[1]["error_code"] == "INVALID_IMAGE"
+    assert "error" not in results[0] and "error" not in results[2]
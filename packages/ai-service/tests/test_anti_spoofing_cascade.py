@@ -0,0 +1,102 @@
+"""
+Anti-spoofing cascade tests — hybrid fail-closed với early exit.
+Các stage là hàm giả, không cần model SFAS hay ảnh thật.
+"""
+import itertools
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.anti_spoofing_cascade import AntiSpoofingCascade, parse_order
+
+
+def _stage(is_real, confidence, attack_type, calls, name):
+    def run():
+        calls.append(name)
+        return {'is_real': is_real, 'confidence': confidence, 'attack_type': attack_type}
+    return run
+
+
+@pytest.mark.parametrize("order", [["texture", "sfas"], ["sfas", "texture"]])
+@pytest.mark.parametrize("texture_real,sfas_real", list(itertools.product([True, False], repeat=2)))
+def test_verdict_matches_sequential_hybrid(order, texture_real, sfas_real):
+    """Kết quả is_real giống hệt logic fail-closed cũ với mọi thứ tự"""
+    calls = []
+    cascade = AntiSpoofingCascade(order=order)
+    result = cascade.run({
+        'texture': _stage(texture_real, 0.8, 'print', calls, 'texture'),
+        'sfas': _stage(sfas_real, 0.9, 'replay', calls, 'sfas'),
+    })
+
+    # Fail-closed như logic cũ: real chỉ khi cả hai stage đều real
+    assert result['is_real'] is (texture_real and sfas_real)
+    assert result['method'] == 'SFAS+Texture'
+
+    first_real = texture_real if order[0] == 'texture' else sfas_real
+    assert calls == (order if first_real else order[:1])
+
+
+def test_texture_reject_skips_sfas():
+    """Texture đánh giá fake → không chạy SFAS, ghi nhận stage bị bỏ qua"""
+    calls = []
+    cascade = AntiSpoofingCascade(order=["texture", "sfas"])
+    before = cascade.get_stats()['stages']['sfas']['skipped']
+
+    result = cascade.run({
+        'texture': _stage(False, 0.7, 'screen', calls, 'texture'),
+        'sfas': _stage(True, 0.99, 'none', calls, 'sfas'),
+    })
+
+    assert calls == ['texture']
+    assert result['is_real'] is False
+    assert result['attack_type'] == 'screen'
+    assert result['decided_by'] == 'texture'
+    assert result['skipped_stages'] == ['sfas']
+    assert result['sfas'] is None
+    assert cascade.get_stats()['stages']['sfas']['skipped'] == before + 1
+
+
+def test_both_real_keeps_combined_format():
+    """Cả hai real → confidence = min, attack_type = none như trước"""
+    cascade = AntiSpoofingCascade()
+    result = cascade.run({
+        'texture': _stage(True, 0.8, 'none', [], 'texture'),
+        'sfas': _stage(True, 0.95, 'none', [], 'sfas'),
+    })
+    assert result['is_real'] is True
+    assert result['confidence'] == 0.8
+    assert result['attack_type'] == 'none'
+
+
+def test_early_exit_disabled_runs_every_stage():
+    """Tắt early exit → chạy đủ stage, SFAS quyết định attack_type"""
+    calls = []
+    cascade = AntiSpoofingCascade(order=["texture", "sfas"], early_exit=False)
+    result = cascade.run({
+        'texture': _stage(False, 0.7, 'screen', calls, 'texture'),
+        'sfas': _stage(False, 0.9, 'print', calls, 'sfas'),
+    })
+    assert calls == ['texture', 'sfas']
+    assert result['attack_type'] == 'print'
+    assert result['confidence'] == 0.7
+
+
+def test_single_available_stage_returned_unchanged():
+    """Chỉ có texture (SFAS không tải được) → trả nguyên kết quả texture"""
+    texture = {'is_real': False, 'confidence': 0.6, 'method': 'Texture'}
+    result = AntiSpoofingCascade().run({'texture': lambda: texture})
+    assert result is texture
+
+    assert AntiSpoofingCascade().run({})['error'] == 'No anti-spoofing method available'
+
+
+def test_parse_order():
+    assert parse_order("sfas, texture") == ["sfas", "texture"]
+    assert parse_order("sfas") == ["sfas", "texture"]
+    with pytest.raises(ValueError):
+        parse_order("texture,cnn")
@@ -0,0 +1,97 @@
+"""
+Backend ONNX Runtime cho AntiSpoofingDetector — xác suất phải khớp với backend torch,
+và khi chạy backend onnx thì không được import torch.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    from app.models.anti_spoofing_model import MiniFASNetV2, export_onnx, quantize_onnx
+    from app.services.anti_spoofing_detector import AntiSpoofingDetector, quantized_onnx_path
+
+    torch.manual_seed(0)
+    model = MiniFASNetV2(embedding_size=128, conv6_kernel=(5, 5), drop_p=0.0, num_classes=3)
+    workdir = tmp_path_factory.mktemp("sfas_onnx")
+    checkpoint = workdir / "2.7_80x80_MiniFASNetV2.pth"
+    torch.save(model.state_dict(), checkpoint)
+    onnx_path = str(workdir / "2.7_80x80_MiniFASNetV2.onnx")
+    export_onnx(str(checkpoint), onnx_path)
+    # Calibrated on frames held out from the ones the tests predict on (other seed)
+    reference = AntiSpoofingDetector(model_path=str(checkpoint), backend="torch", device="cpu")
+    calibration = reference._preprocess_batch([reference._scaled_crop(i, b) for i, b in _items(16, seed=11)])
+    quantize_onnx(onnx_path, quantized_onnx_path(onnx_path), calibration_data=calibration)
+    return str(checkpoint), onnx_path
+
+
+def test_quantize_requires_calibration_data(exported, tmp_path):
+    from app.models.anti_spoofing_model import quantize_onnx
+
+    _, onnx_path = exported
+    with pytest.raises(ValueError):
+        quantize_onnx(onnx_path, str(tmp_path / "x.int8.onnx"), calibration_data=None)
+
+
+def _items(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return [(rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8), (100, 60, 200, 180))
+            for _ in range(n)]
+
+
+def test_onnx_matches_torch(exported):
+    from app.services.anti_spoofing_detector import AntiSpoofingDetector
+
+    checkpoint, onnx_path = exported
+    ref = AntiSpoofingDetector(model_path=checkpoint, backend="torch", device="cpu")
+    onnx = AntiSpoofingDetector(model_path=checkpoint, backend="onnx", onnx_path=onnx_path)
+    assert onnx.get_model_info()["backend"] == "onnx"
+
+    items = _items(6)
+    for a, b in zip(ref.predict_batch(items), onnx.predict_batch(items)):
+        assert a["is_real"] == b["is_real"]
+        # results are rounded to 4 decimals
+        np.testing.assert_allclose(a["raw_probs"], b["raw_probs"], atol=2e-4)
+
+
+def test_int8_model_close_to_torch(exported):
+    from app.services.anti_spoofing_detector import AntiSpoofingDetector
+
+    checkpoint, onnx_path = exported
+    ref = AntiSpoofingDetector(model_path=checkpoint, backend="torch", device="cpu")
+    int8 = AntiSpoofingDetector(model_path=checkpoint, backend="onnx", onnx_path=onnx_path, quantized=True)
+    assert int8.get_model_info()["quantized"] is True
+
+    items = _items(6)
+    for a, b in zip(ref.predict_batch(items), int8.predict_batch(items)):
+        assert abs(a["real_prob"] - b["real_prob"]) < 0.02
+
+
+def test_onnx_backend_does_not_import_torch(exported):
+    _, onnx_path = exported
+    script = textwrap.dedent(f"""
+        import sys
+        import numpy as np
+        sys.path.insert(0, {ROOT!r})
+        from app.services.anti_spoofing_detector import AntiSpoofingDetector
+        detector = AntiSpoofingDetector(backend="onnx", onnx_path={onnx_path!r})
+        detector.predict(np.zeros((240, 320, 3), dtype=np.uint8), (100, 60, 200, 180))
+        assert "torch" not in sys.modules, "torch was imported"
+    """)
+    env = dict(os.environ, ANTI_SPOOFING_BACKEND="onnx")
+    proc = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,59 @@
+"""
+Benchmark suite tests — chạy được offline với stub model (không cần weights),
+kết quả tất định và so sánh baseline phát hiện regression.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.bench_suite import build_service, compare, load_payloads, run_suite
+from benchmarks.common import synthetic_image
+from benchmarks.stubs import StubFaceDetector
+
+
+def _stub_args():
+    return argparse.Namespace(stub_mode="sleep", detect_ms=0.0, embed_ms=0.0, sfas_ms=0.0, jitter=0.0, seed=0)
+
+
+def test_suite_runs_offline_with_stub_models():
+    """Mọi case đều có p50/p95/p99, verify_face đo đủ các bước kể cả recognize"""
+    service, mode = build_service("stub", _stub_args())
+    assert mode == "stub"
+
+    results = run_suite(service, load_payloads(None, 4), iterations=2, concurrency=[2], requests=4)
+
+    cases = {row["case"] for section in ("functions", "end_to_end", "throughput") for row in results[section]}
+    assert {"decode_image", "texture_check", "verify_face", "register_faces", "verify_face@2"} <= cases
+    for row in results["end_to_end"]:
+        assert {"p50_ms", "p95_ms", "p99_ms", "ops_per_s"} <= set(row)
+    assert {"decode", "detect", "anti_spoofing", "recognize"} <= set(results["stages"]["verify_face"])
+
+
+def test_stub_detector_is_deterministic():
+    """Cùng một frame cho cùng embedding, frame khác cho embedding khác"""
+    detector = StubFaceDetector(detect_ms=0, embed_ms=0)
+    a, b = synthetic_image(320, 240, seed=1), synthetic_image(320, 240, seed=2)
+    first = detector.detect_single_face(a)["face"]["embedding"]
+    assert detector.detect_single_face(a.copy())["face"]["embedding"] == first
+    assert detector.detect_single_face(b)["face"]["embedding"] != first
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    """p50/p95 tăng hoặc throughput giảm quá tolerance thì bị báo"""
+    baseline = {
+        "end_to_end": [{"case": "verify_face", "p50_ms": 50.0, "p95_ms": 60.0}],
+        "throughput": [{"case": "verify_face@4", "throughput_per_s": 50.0}],
+    }
+    current = {
+        "end_to_end": [{"case": "verify_face", "p50_ms": 54.0, "p95_ms": 80.0}],
+        "throughput": [{"case": "verify_face@4", "throughput_per_s": 30.0}],
+    }
+    regressions = compare(current, baseline, tolerance=0.15)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("verify_face p95_ms")
+    assert regressions[1].startswith("verify_face@4 throughput_per_s")
+    assert compare(baseline, baseline, tolerance=0.15) == []
@@ -0,0 +1,130 @@
+"""
+Deadline tests — bỏ công việc đã quá hạn (client đã bỏ cuộc) trong hàng đợi
+và giữa các bước của pipeline.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.anti_spoofing_cascade import AntiSpoofingCascade
+from app.services.inference_executor import InferenceExecutor
+from app.utils.deadline import (
+    STAGE_QUEUE,
+    DeadlineExceeded,
+    check_deadline,
+    deadline_scope,
+    dropped_count,
+    parse_deadlines,
+)
+
+
+def test_parse_deadlines():
+    """Cấu hình mặc định theo endpoint: ms → giây, 0 = không giới hạn"""
+    assert parse_deadlines("verify=5000, register=0,anti_spoofing=250") == {
+        "verify": 5.0,
+        "anti_spoofing": 0.25,
+    }
+    with pytest.raises(ValueError):
+        parse_deadlines("verify")
+
+
+async def test_queued_call_past_deadline_is_dropped_unstarted():
+    """Request hết hạn khi còn trong hàng đợi: trả lỗi đúng hạn và không bao giờ chạy"""
+    release = threading.Event()
+    calls = []
+    executor = InferenceExecutor(workers=1, max_queue=4)
+    blocker = asyncio.create_task(executor.run(release.wait, 5))
+    await asyncio.sleep(0.02)
+    before = dropped_count(STAGE_QUEUE)
+
+    started = time.perf_counter()
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded) as exc:
+            await executor.run(calls.append, "late")
+    assert exc.value.stage == STAGE_QUEUE
+    assert time.perf_counter() - started < 0.5
+
+    release.set()
+    await blocker
+    assert await executor.run(lambda: "ok") == "ok"
+    assert calls == []
+    assert dropped_count(STAGE_QUEUE) == before + 1
+    assert executor.get_stats()["queue_depth"] == 0
+    executor.shutdown()
+
+
+async def test_running_call_stops_at_next_stage():
+    """Deadline được truyền vào worker thread: bước sau không chạy khi đã quá hạn"""
+    stages = []
+
+    def pipeline():
+        stages.append("detection")
+        time.sleep(0.1)
+        check_deadline("anti_spoofing")
+        stages.append("anti_spoofing")
+
+    executor = InferenceExecutor(workers=1, max_queue=0)
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(pipeline)
+    await asyncio.sleep(0.15)
+    assert stages == ["detection"]
+    executor.shutdown()
+
+
+def test_cascade_skips_later_stage_past_deadline():
+    """Cascade không chạy SFAS nếu đã quá hạn sau bước texture"""
+    ran = []
+
+    def texture():
+        ran.append("texture")
+        time.sleep(0.02)
+        return {'is_real': True, 'confidence': 0.9}
+
+    cascade = AntiSpoofingCascade(order=["texture", "sfas"])
+    with deadline_scope(0.01):
+        with pytest.raises(DeadlineExceeded) as exc:
+            cascade.run({"texture": texture, "sfas": lambda: ran.append("sfas")})
+    assert exc.value.stage == "sfas"
+    assert ran == ["texture"]
+
+
+def test_endpoint_deadline_header():
+    """Router: header sai → 400; quá hạn → 504"""
+    from unittest.mock import MagicMock, patch
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("API_KEY", "test-api-key-secret")
+    with patch("app.routers.face_router.FaceService", return_value=MagicMock()):
+        from app.main import app
+        from app.routers import face_router
+
+    client = TestClient(app)
+    files = [("image", ("a.jpg", b"\xff\xd8" + b"0" * 2048, "image/jpeg"))]
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+
+    with patch.object(face_router, "face_service", MagicMock()):
+        res = client.post(
+            "/api/face/anti-spoofing/check", files=files,
+            headers={**headers, "X-Request-Timeout-Ms": "soon"},
+        )
+    assert res.status_code == 400
+
+    async def expired(*args, **kwargs):
+        raise DeadlineExceeded(STAGE_QUEUE)
+
+    with patch.object(face_router.inference_executor, "run", expired), \
+            patch.object(face_router, "face_service", MagicMock()):
+        res = client.post(
+            "/api/face/anti-spoofing/check", files=files,
+            headers={**headers, "X-Request-Timeout-Ms": "100"},
+        )
+    assert res.status_code == 504
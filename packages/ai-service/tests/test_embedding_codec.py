@@ -0,0 +1,58 @@
+"""
+Định dạng nhị phân cho embedding (base64 float32/float16, octet-stream) — giải mã
+bằng np.frombuffer, định dạng JSON cũ vẫn hoạt động.
+"""
+import base64
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.utils import embedding_codec
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(4, 512)).astype(np.float32)
+
+
+def test_f32_round_trip_is_exact_and_zero_copy(embeddings):
+    payload = embedding_codec.encode_embeddings(embeddings, "f32")
+    assert len(base64.b64decode(payload)) == 4 * 512 * 4
+
+    decoded = embedding_codec.decode_base64(payload, "F32")
+    np.testing.assert_array_equal(decoded, embeddings)
+
+    raw = embeddings.astype("<f4").tobytes()
+    view = embedding_codec.decode_binary(raw, "f32")
+    assert not view.flags.owndata  # a view over the received bytes
+    np.testing.assert_array_equal(view, embeddings)
+
+
+def test_f16_round_trip_is_close(embeddings):
+    single = embedding_codec.encode_embedding(embeddings[0], "f16")
+    decoded = embedding_codec.decode_base64(single, "f16")
+    assert decoded.shape == (1, 512) and decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded[0], embeddings[0], rtol=1e-3, atol=1e-3)
+
+
+def test_rejects_bad_payloads(embeddings):
+    with pytest.raises(ValueError):
+        embedding_codec.decode_binary(embeddings.tobytes()[:-4], "f32")
+    with pytest.raises(ValueError):
+        embedding_codec.decode_base64("not base64!", "f32")
+    with pytest.raises(ValueError):
+        embedding_codec.normalize_format("f64")
+
+
+def test_json_path_unchanged(embeddings):
+    encoded = embedding_codec.encode_embeddings(embeddings, "json")
+    assert isinstance(encoded[0], list)
+    assert embedding_codec.decode_json(json.dumps(encoded)) == encoded
+    assert embedding_codec.decode_json(json.dumps({"reference_embeddings": encoded})) == encoded
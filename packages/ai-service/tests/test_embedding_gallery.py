@@ -0,0 +1,70 @@
+"""
+EmbeddingGallery — lưu embedding đã chuẩn hoá theo (company_id, user_id),
+verify theo user_id phải cho cùng kết quả với reference_embeddings_json.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.models.face_recognizer import FaceRecognizer
+from app.services.embedding_gallery import EmbeddingGallery
+
+
+def _embeddings(n, seed, dim=512):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_upsert_stores_unit_rows():
+    gallery = EmbeddingGallery()
+    raw = _embeddings(4, 0)
+    assert gallery.upsert("c1", "u1", raw.tolist()) == 4
+
+    rows = gallery.get("c1", "u1")
+    assert rows.shape == (4, 512) and rows.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(rows, axis=1), 1.0, atol=1e-5)
+    assert gallery.get("c1", "missing") is None
+    assert gallery.get("c2", "u1") is None
+
+
+def test_replace_and_delete_keep_other_users_intact():
+    gallery = EmbeddingGallery()
+    users = {f"u{i}": _embeddings(4, i) for i in range(5)}
+    for user_id, emb in users.items():
+        gallery.upsert("c1", user_id, emb)
+
+    users["u1"] = _embeddings(3, 100)
+    gallery.upsert("c1", "u1", users["u1"])
+    assert gallery.delete("c1", "u0")
+    assert not gallery.delete("c1", "u0")
+
+    for user_id in ("u1", "u2", "u3", "u4"):
+        expected = users[user_id] / np.linalg.norm(users[user_id], axis=1, keepdims=True)
+        np.testing.assert_allclose(gallery.get("c1", user_id), expected, atol=1e-6)
+    stats = gallery.get_stats()
+    assert stats["users"] == 4 and stats["embeddings"] == 15
+
+
+def test_rejects_dimension_mismatch():
+    gallery = EmbeddingGallery()
+    gallery.upsert("c1", "u1", _embeddings(2, 0))
+    with pytest.raises(ValueError):
+        gallery.upsert("c1", "u2", _embeddings(2, 1, dim=128))
+
+
+def test_gallery_verify_matches_json_path():
+    gallery = EmbeddingGallery()
+    recognizer = FaceRecognizer()
+    refs = _embeddings(4, 7)
+    gallery.upsert("c1", "u1", refs)
+    candidate = refs[0] + 0.1 * _embeddings(1, 8)[0]
+
+    expected = recognizer.verify_against_multiple(candidate, list(refs))
+    actual = recognizer.verify_against_normalized(candidate, gallery.get("c1", "u1"))
+    assert actual["match"] == expected["match"]
+    assert actual["similarity"] == pytest.approx(expected["similarity"], abs=1e-5)
@@ -59,7 +59,10 @@ def client(mock_face_service):
     """TestClient with mocked face service."""
     from fastapi.testclient import TestClient
     from app.main import app
-    return TestClient(app)
+    from app.routers import face_router
+    # Endpoints never build the service themselves (startup does), so install it
+    with patch.object(face_router, "face_service", mock_face_service):
+        yield TestClient(app)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
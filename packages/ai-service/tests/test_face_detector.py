@@ -0,0 +1,97 @@
+"""
+FaceDetector tests — bước không cần embedding chỉ chạy model detection của app đã tải.
+Model InsightFace được thay bằng app giả để không cần file model.
+"""
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.models.face_detector import FaceDetector
+
+
+def _face():
+    return SimpleNamespace(
+        bbox=np.array([10.0, 20.0, 110.0, 140.0]),
+        det_score=0.98,
+        kps=np.zeros((5, 2)),
+        normed_embedding=np.ones(512, dtype=np.float32) / np.sqrt(512),
+    )
+
+
+def _detector(app):
+    loader = MagicMock()
+    loader.get_model.return_value = app
+    with patch("app.models.face_detector.ModelLoader", return_value=loader), \
+            patch("app.models.face_detector.FACE_BATCHING_ENABLED", False):
+        detector = FaceDetector()
+    return detector
+
+
+def _full_app():
+    app = MagicMock()
+    app.get.return_value = [_face()]
+    kps = np.arange(10, dtype=np.float32).reshape(1, 5, 2)
+    app.det_model.detect.return_value = (np.array([[10.0, 20.0, 110.0, 140.0, 0.98]]), kps)
+    return app
+
+
+def test_detection_only_uses_the_loaded_det_model():
+    """with_embedding=False → chỉ gọi det_model của app đã tải, không có embedding"""
+    app = _full_app()
+    detector = _detector(app)
+    image = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    result = detector.detect_single_face(image, with_embedding=False)
+
+    assert result["success"] is True
+    assert result["face"]["embedding"] is None
+    assert result["face"]["bbox"] == [10.0, 20.0, 110.0, 140.0]
+    assert result["face"]["score"] == 0.98
+    assert result["face"]["kps"] == np.arange(10).reshape(5, 2).tolist()
+    app.det_model.detect.assert_called_once()
+    app.get.assert_not_called()
+
+
+def test_detection_only_reports_multiple_faces():
+    """Nhiều mặt từ det_model vẫn trả MULTIPLE_FACES"""
+    app = _full_app()
+    app.det_model.detect.return_value = (
+        np.array([[0, 0, 50, 50, 0.9], [60, 60, 120, 120, 0.8]]), np.zeros((2, 5, 2))
+    )
+    result = _detector(app).detect_single_face(np.zeros((200, 200, 3), dtype=np.uint8), with_embedding=False)
+
+    assert result["error_code"] == "MULTIPLE_FACES"
+    assert result["detected_faces_count"] == 2
+
+
+def test_default_still_returns_embedding():
+    """Mặc định vẫn dùng app đầy đủ và trả embedding"""
+    app = _full_app()
+    detector = _detector(app)
+
+    result = detector.detect_single_face(np.zeros((200, 200, 3), dtype=np.uint8))
+
+    assert result["success"] is True
+    assert len(result["face"]["embedding"]) == 512
+    app.get.assert_called_once()
+    app.det_model.detect.assert_not_called()
+
+
+def test_falls_back_to_full_app_without_det_model():
+    """App không có det_model → dùng app.get như cũ"""
+    app = MagicMock(spec=["get"])
+    app.get.return_value = [_face()]
+    detector = _detector(app)
+
+    result = detector.detect_single_face(np.zeros((50, 50, 3), dtype=np.uint8), with_embedding=False)
+
+    assert result["success"] is True
+    assert result["face"]["embedding"] is None
+    app.get.assert_called_once()
@@ -0,0 +1,100 @@
+"""
+FaceRecognizer — bản vector hoá (dot theo lô + np.partition) phải cho điểm giống
+hệt từng bit vòng lặp cũ (trung bình top-2), và verify_many cũng vậy với từng cặp.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.models.face_recognizer import FaceRecognizer
+
+
+def _reference_loop(candidate, references):
+    """The original per-reference implementation, kept here as the oracle."""
+    cand = np.asarray(candidate, dtype=np.float32)
+    cand = cand / np.linalg.norm(cand)
+    sims = []
+    for ref in references:
+        ref = np.asarray(ref, dtype=np.float32)
+        norm = np.linalg.norm(ref)
+        if norm == 0:
+            continue
+        sims.append(float(np.dot(cand, ref / norm)))
+    sims.sort(reverse=True)
+    return float(np.mean(sims[:min(2, len(sims))]))
+
+
+@pytest.fixture
+def recognizer():
+    return FaceRecognizer()
+
+
+def test_scores_match_original_loop(recognizer):
+    rng = np.random.default_rng(0)
+    for k in (1, 2, 3, 4, 7):
+        for _ in range(50):
+            refs = [rng.normal(size=512).astype(np.float32) for _ in range(k)]
+            candidate = refs[0] + rng.normal(scale=0.8, size=512)
+            result = recognizer.verify_against_multiple(candidate, refs, custom_threshold=0.5)
+            expected = _reference_loop(candidate, refs)
+            assert result["similarity"] == expected
+            assert result["match"] == (expected >= 0.5)
+
+
+def test_zero_norm_references_are_skipped(recognizer):
+    rng = np.random.default_rng(1)
+    refs = [np.zeros(512, dtype=np.float32), rng.normal(size=512), rng.normal(size=512)]
+    candidate = rng.normal(size=512)
+    result = recognizer.verify_against_multiple(candidate, refs)
+    assert result["similarity"] == _reference_loop(candidate, refs)
+
+    error = recognizer.verify_against_multiple(candidate, [np.zeros(512)])
+    assert error["error_code"] == "AI_SERVICE_ERROR" and error["match"] is False
+
+
+def test_verify_many_shared_references(recognizer):
+    rng = np.random.default_rng(2)
+    identity = rng.normal(size=512)
+    refs = (identity + 0.3 * rng.normal(size=(4, 512))).astype(np.float32)
+    candidates = rng.normal(size=(6, 512)).astype(np.float32)
+    candidates[0] = identity
+    batch = recognizer.verify_many(candidates, refs)
+    assert len(batch) == 6
+    for cand, result in zip(candidates, batch):
+        single = recognizer.verify_against_multiple(cand, list(refs))
+        assert result["similarity"] == _reference_loop(cand, refs) == single["similarity"]
+        assert result["match"] == single["match"]
+    assert batch[0]["match"]
+
+
+def test_verify_many_per_candidate_references(recognizer):
+    rng = np.random.default_rng(3)
+    groups = [rng.normal(size=(k, 512)).astype(np.float32) for k in (4, 1, 3, 2)]
+    candidates = np.stack([g[0] + 0.2 * rng.normal(size=512) for g in groups]).astype(np.float32)
+    candidates[3] = 0.0
+
+    batch = recognizer.verify_many(candidates, groups, per_candidate=True)
+    for i in range(3):
+        assert batch[i]["similarity"] == _reference_loop(candidates[i], groups[i])
+    assert batch[3]["error_code"] == "AI_SERVICE_ERROR"
+
+
+def test_verify_many_one_result_per_candidate_on_errors(recognizer):
+    """Bộ tham chiếu đầu rỗng không đổi sang chế độ dùng chung; lỗi vẫn trả đủ N kết quả"""
+    rng = np.random.default_rng(4)
+    identity = rng.normal(size=512)
+    groups = [np.empty((0, 512), np.float32), (identity + 0.2 * rng.normal(size=(2, 512))).astype(np.float32)]
+    candidates = np.stack([rng.normal(size=512), identity]).astype(np.float32)
+
+    batch = recognizer.verify_many(candidates, groups, per_candidate=True)
+    assert batch[0]["error_code"] == "AI_SERVICE_ERROR"
+    assert batch[1]["match"] is True
+
+    mismatched = recognizer.verify_many(candidates, groups[:1], per_candidate=True)
+    assert len(mismatched) == 2 and all(r["error_code"] == "AI_SERVICE_ERROR" for r in mismatched)
@@ -0,0 +1,119 @@
+"""
+Nhận diện 1:N trên gallery — quét chính xác (argpartition) và chỉ mục IVF-PQ
+phải trả về cùng người dùng tốt nhất.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.ann_index import IVFPQIndex
+from app.services.embedding_gallery import EmbeddingGallery
+
+DIM = 128
+
+
+@pytest.fixture(scope="module")
+def enrolled():
+    rng = np.random.default_rng(3)
+    identities = rng.normal(size=(500, DIM)).astype(np.float32)
+    gallery = EmbeddingGallery(ann_min_size=1 << 62)
+    for u, identity in enumerate(identities):
+        gallery.upsert("c1", f"user-{u}", identity + 0.3 * rng.normal(size=(4, DIM)))
+    return gallery, identities
+
+
+def _probe(identities, u, seed):
+    rng = np.random.default_rng(seed)
+    return identities[u] + 0.3 * rng.normal(size=DIM)
+
+
+def test_exact_identify_finds_enrolled_user(enrolled):
+    gallery, identities = enrolled
+    for u in (0, 123, 499):
+        candidates = gallery.identify("c1", _probe(identities, u, u), top_k=3)
+        assert len(candidates) == 3
+        assert candidates[0]["user_id"] == f"user-{u}"
+        sims = [c["similarity"] for c in candidates]
+        assert sims == sorted(sims, reverse=True)
+    assert gallery.identify("unknown", identities[0]) == []
+
+
+def test_ivfpq_identify_matches_exact(enrolled):
+    gallery, identities = enrolled
+    exact = [gallery.identify("c1", _probe(identities, u, 1000 + u), top_k=1)[0] for u in range(0, 500, 25)]
+
+    assert gallery.build_index("c1")
+    assert gallery.get_stats()["per_company"]["c1"]["ann_index"]
+    approx = [gallery.identify("c1", _probe(identities, u, 1000 + u), top_k=1)[0] for u in range(0, 500, 25)]
+
+    assert [c["user_id"] for c in approx] == [c["user_id"] for c in exact]
+    for a, e in zip(approx, exact):
+        assert a["similarity"] == pytest.approx(e["similarity"], abs=1e-5)
+
+
+def test_index_stays_in_use_after_upsert_and_delete(enrolled):
+    """Đăng ký/xoá sau khi dựng index: index vẫn dùng, người thay đổi được tính chính xác từ dữ liệu mới"""
+    gallery, identities = enrolled
+    gallery.build_index("c1")
+    rng = np.random.default_rng(9)
+    newcomer = rng.normal(size=DIM).astype(np.float32)
+    moved = rng.normal(size=DIM).astype(np.float32)
+    gallery.upsert("c1", "newcomer", newcomer[np.newaxis, :])
+    gallery.upsert("c1", "user-7", moved + 0.3 * rng.normal(size=(4, DIM)))
+    gallery.delete("c1", "user-8")
+    try:
+        stats = gallery.get_stats()["per_company"]["c1"]
+        assert stats["ann_index"] and stats["ann_pending_changes"] == 3
+        assert gallery.identify("c1", newcomer, top_k=1)[0]["user_id"] == "newcomer"
+        assert gallery.identify("c1", moved, top_k=1)[0]["user_id"] == "user-7"
+        assert "user-7" not in [c["user_id"] for c in gallery.identify("c1", _probe(identities, 7, 1), top_k=3)]
+        assert "user-8" not in [c["user_id"] for c in gallery.identify("c1", _probe(identities, 8, 1), top_k=3)]
+    finally:
+        gallery.delete("c1", "newcomer")
+        gallery.upsert("c1", "user-7", identities[7] + 0.3 * rng.normal(size=(4, DIM)))
+        gallery.upsert("c1", "user-8", identities[8] + 0.3 * rng.normal(size=(4, DIM)))
+
+
+def test_rebuild_is_rate_limited_and_reuses_quantizers():
+    """Chỉ dựng lại khi thay đổi vượt ngưỡng, cách nhau tối thiểu; lần dựng lại không huấn luyện lại"""
+    rng = np.random.default_rng(4)
+    gallery = EmbeddingGallery(ann_min_size=1 << 62)
+    gallery.rebuild_fraction, gallery.rebuild_interval_s = 0.01, 3600
+    for u in range(300):
+        gallery.upsert("c1", f"user-{u}", rng.normal(size=(2, DIM)))
+    gallery.build_index("c1")
+    first = gallery._ann["c1"].index
+
+    scheduled = []
+    gallery._schedule_build = lambda company_id, min_interval_s=0.0: scheduled.append(min_interval_s)
+    gallery.upsert("c1", "user-0", rng.normal(size=(2, DIM)))
+    gallery.identify("c1", rng.normal(size=DIM))
+    assert scheduled == []    # 1 người / 300 < 1%
+    for u in range(1, 5):
+        gallery.upsert("c1", f"user-{u}", rng.normal(size=(2, DIM)))
+    gallery.identify("c1", rng.normal(size=DIM))
+    assert scheduled == [3600]
+    del gallery._schedule_build
+
+    gallery.build_index("c1")
+    rebuilt = gallery._ann["c1"].index
+    assert rebuilt is not first and rebuilt.codebooks is first.codebooks
+    assert gallery.get_stats()["per_company"]["c1"]["ann_pending_changes"] == 0
+
+
+def test_ivfpq_index_search_returns_exact_scores():
+    rng = np.random.default_rng(5)
+    vectors = rng.normal(size=(3000, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = IVFPQIndex(dim=DIM, m=16, nprobe=8).build(vectors)
+
+    query = vectors[42] + 0.05 * rng.normal(size=DIM).astype(np.float32)
+    scores, ids = index.search(query, k=5)
+    assert ids[0] == 42
+    np.testing.assert_allclose(scores, vectors[ids] @ query, rtol=1e-5)
@@ -0,0 +1,106 @@
+"""
+ImageUtils.decode_image — kiểm tra header trước khi giải mã, giải mã một lần ra BGR.
+"""
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.utils.image_utils import ImageUtils
+
+
+def _encode(array, fmt="PNG"):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def rgb():
+    return np.random.default_rng(0).integers(0, 256, size=(240, 320, 3), dtype=np.uint8)
+
+
+def test_decode_returns_bgr_pixels(rgb):
+    decoded = ImageUtils.decode_image(_encode(rgb))
+    assert decoded.valid
+    assert decoded.details["width"] == 320 and decoded.details["format"] == "PNG"
+    np.testing.assert_array_equal(decoded.image, rgb[:, :, ::-1])
+
+
+def test_decode_handles_alpha_and_grayscale(rgb):
+    rgba = np.dstack([rgb, np.full(rgb.shape[:2], 255, np.uint8)])
+    assert ImageUtils.decode_image(_encode(rgba)).image.shape == (240, 320, 3)
+    assert ImageUtils.decode_image(_encode(rgb[:, :, 0])).image.shape == (240, 320, 3)
+
+
+def test_decode_resizes_to_max_size():
+    big = np.zeros((1500, 2000, 3), dtype=np.uint8)
+    decoded = ImageUtils.decode_image(_encode(big, "JPEG"), max_size=1000, min_size_mb=0)
+    assert decoded.image.shape[:2] == (750, 1000)
+    assert decoded.details["width"] == 2000  # details describe the upload, not the decoded array
+
+
+def test_header_checks_reject_before_decoding(rgb):
+    tiny = ImageUtils.decode_image(_encode(rgb[:50, :50]), min_size_mb=0)
+    assert not tiny.valid and tiny.image is None
+    assert "resolution too low" in tiny.error
+
+
+def test_corrupt_pixel_data_is_reported(rgb):
+    data = bytearray(_encode(rgb))
+    data[100:] = b"\x00" * (len(data) - 100)
+    decoded = ImageUtils.decode_image(bytes(data))
+    assert not decoded.valid
+    assert decoded.error_code == "POOR_IMAGE_QUALITY"
+
+
+def test_jpeg_scale_factor():
+    from app.utils.image_utils import jpeg_scale_factor
+
+    assert jpeg_scale_factor(4000, 3000, 1280) == 2
+    assert jpeg_scale_factor(4000, 3000, 480) == 8
+    assert jpeg_scale_factor(1600, 1200, 1280) == 1
+
+
+def test_reduced_decode_of_large_jpeg():
+    big = np.random.default_rng(1).integers(0, 256, size=(3000, 4000, 3), dtype=np.uint8)
+    data = _encode(big, "JPEG")
+
+    full = ImageUtils.decode_image(data, reduced=False)
+    reduced = ImageUtils.decode_image(data, reduced=True)
+    assert reduced.dct_scale == 2 and full.dct_scale == 1
+    assert reduced.image.shape == full.image.shape == (960, 1280, 3)
+
+
+def test_small_face_is_redecoded_for_anti_spoofing():
+    big = np.random.default_rng(2).integers(0, 256, size=(2400, 3200, 3), dtype=np.uint8)
+    decoded = ImageUtils.decode_image(_encode(big, "JPEG"), reduced=True, target_size=400)
+    assert decoded.dct_scale == 8 and decoded.image.shape == (300, 400, 3)
+
+    image, bbox = decoded.region_for_face((100, 100, 140, 140), min_face_px=80)
+    assert image.shape == (320, 320, 3)
+    assert bbox == (0, 0, 320, 320)
+
+    image, bbox = decoded.region_for_face((100, 100, 200, 200), min_face_px=80)
+    assert image is decoded.image and bbox == (100, 100, 200, 200)
+
+
+def test_small_face_region_has_more_pixels_at_default_target_size():
+    """Cấu hình mặc định (target 1280): vùng mặt giải mã lại phải nhiều pixel hơn, kèm ngữ cảnh 2.7x"""
+    big = np.random.default_rng(3).integers(0, 256, size=(3000, 4000, 3), dtype=np.uint8)
+    decoded = ImageUtils.decode_image(_encode(big, "JPEG"), reduced=True)
+    assert decoded.dct_scale == 2 and decoded.image.shape == (960, 1280, 3)
+
+    face = (600, 400, 660, 460)
+    image, (x1, y1, x2, y2) = decoded.region_for_face(face, min_face_px=80, context=2.7)
+
+    assert (x2 - x1) * (y2 - y1) > 60 * 60 * 9
+    assert image.shape[0] < 3000 and image.shape[1] < 4000
+    assert image.shape[1] >= 2.6 * (x2 - x1)
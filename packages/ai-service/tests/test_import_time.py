@@ -0,0 +1,100 @@
+"""
+Import-time budget — `import app.main` không được kéo theo thư viện nặng
+(OpenCV, numpy, torch, InsightFace, langchain...) và phải nằm trong ngân sách thời gian.
+
+Ngân sách mặc định 1500 ms (trước khi tách lazy import: ~2600 ms), đổi bằng
+IMPORT_TIME_BUDGET_MS khi máy CI chậm hơn.
+"""
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("JWT_SECRET", "test-jwt-secret")
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# Chỉ được import khi subsystem được dùng lần đầu hoặc warm-up
+HEAVY_MODULES = (
+    "numpy", "cv2", "PIL", "torch", "onnxruntime", "insightface",
+    "langchain", "langchain_core", "langchain_google_genai", "langchain_mongodb",
+    "google.generativeai", "pymongo", "motor",
+)
+
+
+@pytest.fixture(scope="module")
+def import_profile():
+    """Chạy `python -X importtime -c "import app.main"` trong process mới"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        cumulative_us[name.strip()] = int(cumulative)
+    return cumulative_us
+
+
+def test_app_main_does_not_import_heavy_modules(import_profile):
+    """/health và / không cần model hay langchain → không import khi khởi động"""
+    assert "app.routers.rag_router" in import_profile   # router RAG vẫn được đăng ký
+    loaded = sorted(
+        name for name in import_profile
+        if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY_MODULES)
+    )
+    assert loaded == []
+
+
+def test_app_main_import_within_budget(import_profile):
+    """Tổng thời gian import app.main nằm trong ngân sách"""
+    total_ms = import_profile["app.main"] / 1000
+    assert total_ms < IMPORT_TIME_BUDGET_MS, (
+        f"import app.main took {total_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)"
+    )
+
+
+def test_rag_dependency_reports_missing_packages_as_503():
+    """Thiếu dependency RAG → 503 ở request đầu tiên thay vì lỗi lúc khởi động"""
+    from app.routers import rag_router
+
+    with patch.object(rag_router, "_rag_service_instance", None), \
+            patch.object(rag_router, "load_rag_module", side_effect=ImportError("No module named 'langchain'")):
+        with pytest.raises(HTTPException) as exc:
+            rag_router.get_rag_service()
+    assert exc.value.status_code == 503
+
+
+def test_endpoints_never_build_face_service_on_event_loop():
+    """Trước khi startup tạo xong FaceService: /health 'starting', endpoint 503, không tạo service"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routers import face_router
+
+    os.environ.setdefault("API_KEY", "test-api-key-secret")
+    lazy = face_router._LazyFaceService()
+    with patch.object(face_router, "face_service", lazy), \
+            patch.object(face_router, "FaceService", side_effect=AssertionError("built on the event loop"), create=True):
+        client = TestClient(app)
+        health = client.get("/api/face/health")
+        res = client.post(
+            "/api/face/verify", headers={"X-API-Key": os.environ["API_KEY"]},
+            files=[("image", ("a.jpg", b"\xff\xd8" + b"0" * 64, "image/jpeg"))],
+        )
+        status = client.get("/api/face/anti-spoofing/status")
+
+    assert health.json()["status"] == "starting"
+    assert status.status_code == 503
+    assert res.status_code == 503 and res.headers["retry-after"]
+    assert not lazy.created
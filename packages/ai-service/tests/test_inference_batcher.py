@@ -0,0 +1,167 @@
+"""
+MicroBatcher tests — gom nhiều request đồng thời thành một batch inference.
+Không cần model: batch function là hàm thuần Python, FaceAnalysis là stub.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.inference_batcher import FaceAnalysisBatcher, MicroBatcher
+
+
+def test_concurrent_calls_are_coalesced_and_results_fan_out():
+    batch_sizes = []
+
+    def double(items):
+        batch_sizes.append(len(items))
+        return [i * 2 for i in items]
+
+    batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50, name="test_coalesce")
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.run, range(8)))
+    finally:
+        batcher.close()
+
+    assert results == [i * 2 for i in range(8)]
+    assert max(batch_sizes) > 1
+    assert sum(batch_sizes) == 8
+
+
+def test_batch_never_exceeds_max_size():
+    batch_sizes = []
+    gate = threading.Event()
+
+    def slow_identity(items):
+        gate.wait(timeout=1)
+        batch_sizes.append(len(items))
+        return list(items)
+
+    batcher = MicroBatcher(slow_identity, max_batch_size=3, max_wait_ms=20, name="test_max")
+    try:
+        futures = [batcher.submit(i) for i in range(10)]
+        gate.set()
+        assert [f.result(timeout=2) for f in futures] == list(range(10))
+    finally:
+        batcher.close()
+
+    assert all(size <= 3 for size in batch_sizes)
+
+
+def test_per_item_exception_only_fails_that_item():
+    def fn(items):
+        return [ValueError("bad item") if i == 1 else i for i in items]
+
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=20, name="test_errors")
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        assert futures[0].result(timeout=2) == 0
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=2)
+        assert futures[2].result(timeout=2) == 2
+    finally:
+        batcher.close()
+
+
+def test_single_caller_waits_at_most_the_window():
+    batcher = MicroBatcher(lambda items: list(items), max_batch_size=8, max_wait_ms=10, name="test_window")
+    try:
+        start = time.perf_counter()
+        assert batcher.run("x", timeout=2) == "x"
+        assert time.perf_counter() - start < 0.5
+        stats = batcher.get_stats()
+        assert stats["batch_size"]["count"] == 1
+    finally:
+        batcher.close()
+
+
+class _StubDetector:
+    """Ảnh tô đều giá trị v → v khuôn mặt; v == 99 → detector lỗi"""
+
+    def detect(self, img, max_num=0, metric="default"):
+        value = int(img[0, 0, 0])
+        if value == 99:
+            raise ValueError("bad frame")
+        from insightface.utils.face_align import arcface_dst
+        bboxes = np.array([[40, 40, 152, 152, 0.9]] * value, dtype=np.float32)
+        kpss = np.stack([arcface_dst + 40] * value) if value else np.zeros((0, 5, 2))
+        return bboxes, kpss
+
+
+class _StubRecognizer:
+    input_size = (112, 112)
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def get_feat(self, crops):
+        self.calls.append(len(crops))
+        if self.fail:
+            raise RuntimeError("recognizer down")
+        # Embedding = giá trị pixel của crop → biết face thuộc ảnh nào
+        return np.array([[float(c[56, 56, 0]), 1.0] for c in crops], dtype=np.float32)
+
+
+class _StubApp:
+    def __init__(self):
+        self.det_model = _StubDetector()
+        self.models = {"detection": self.det_model, "recognition": _StubRecognizer()}
+
+
+def _frame(value):
+    return np.full((200, 200, 3), value, dtype=np.uint8)
+
+
+def test_face_batcher_embeds_all_faces_once_and_fans_out():
+    app = _StubApp()
+    recognizer = app.models["recognition"]
+    batcher = FaceAnalysisBatcher(app, max_batch_size=3, max_wait_ms=200)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(batcher.get, [_frame(2), _frame(0), _frame(3)]))
+    finally:
+        batcher.close()
+
+    # Một lần get_feat cho cả batch (2 + 0 + 3 khuôn mặt)
+    assert recognizer.calls == [5]
+    assert [len(faces) for faces in results] == [2, 0, 3]
+    for value, faces in zip((2, 0, 3), results):
+        for face in faces:
+            assert face.embedding.tolist() == [float(value), 1.0]
+            assert face.det_score == pytest.approx(0.9)
+
+
+def test_face_batcher_errors_stay_with_their_callers():
+    app = _StubApp()
+    recognizer = app.models["recognition"]
+    batcher = FaceAnalysisBatcher(app, max_batch_size=2, max_wait_ms=200)
+    try:
+        # Detector lỗi trên một ảnh → chỉ caller đó nhận lỗi
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            bad = pool.submit(batcher.get, _frame(99))
+            good = pool.submit(batcher.get, _frame(1))
+            with pytest.raises(ValueError):
+                bad.result(timeout=2)
+            assert len(good.result(timeout=2)) == 1
+
+        # Recognizer lỗi → cả batch đó lỗi, batch sau vẫn chạy
+        recognizer.fail = True
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            failed = [pool.submit(batcher.get, _frame(v)) for v in (1, 2)]
+            for future in failed:
+                with pytest.raises(RuntimeError):
+                    future.result(timeout=2)
+        recognizer.fail = False
+        assert batcher.get(_frame(1))[0].embedding.tolist() == [1.0, 1.0]
+    finally:
+        batcher.close()
@@ -0,0 +1,219 @@
+"""
+InferenceExecutor tests — hàng đợi có giới hạn, 503 + Retry-After khi quá tải,
+event loop không bị chặn bởi inference đồng bộ.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.inference_executor import (
+    InferenceExecutor,
+    InferenceOverloaded,
+    PRIORITY_BACKGROUND,
+    PRIORITY_CRITICAL,
+    PRIORITY_STANDARD,
+)
+
+
+async def test_blocking_call_does_not_block_event_loop():
+    """Inference chạy trên thread riêng, event loop vẫn phục vụ request khác"""
+    executor = InferenceExecutor(workers=1, max_queue=0)
+    task = asyncio.create_task(executor.run(time.sleep, 0.3))
+
+    started = time.perf_counter()
+    await asyncio.sleep(0.01)
+    assert time.perf_counter() - started < 0.1
+    await task
+    executor.shutdown()
+
+
+async def test_rejects_when_queue_is_full():
+    """Quá workers + max_queue → InferenceOverloaded ngay, có retry_after"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=1, max_queue=1)
+    running = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    assert executor.queue_depth == 1
+    with pytest.raises(InferenceOverloaded) as exc:
+        await executor.run(lambda: "never")
+    assert exc.value.reason == "queue_full"
+    assert exc.value.retry_after >= 1
+
+    release.set()
+    await asyncio.gather(*running)
+    # Hàng đợi trống lại → nhận request mới
+    assert await executor.run(lambda: "ok") == "ok"
+    assert executor.get_stats()["queue_depth"] == 0
+    executor.shutdown()
+
+
+async def test_cancelled_call_frees_its_queue_slot():
+    """Request bị huỷ khi đang xếp hàng rời hàng đợi ngay, không chiếm chỗ của request mới"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=1, max_queue=1)
+    blocker = asyncio.create_task(executor.run(release.wait, 5))
+    await asyncio.sleep(0.02)
+    queued = asyncio.create_task(executor.run(lambda: "never"))
+    await asyncio.sleep(0.02)
+    assert executor.queue_depth == 1
+
+    queued.cancel()
+    await asyncio.sleep(0)
+    assert executor.queue_depth == 0
+    assert executor.get_stats()["queued"][PRIORITY_STANDARD] == 0
+    follow_up = asyncio.create_task(executor.run(lambda: "ok"))
+    await asyncio.sleep(0.02)
+
+    release.set()
+    await blocker
+    assert await follow_up == "ok"
+    assert executor.queue_depth == 0
+    executor.shutdown()
+
+
+async def test_queued_call_past_max_wait_is_dropped():
+    """Request chờ quá max_wait_s không được chạy nữa"""
+    executor = InferenceExecutor(workers=1, max_queue=4, max_wait_s=0.05)
+    calls = []
+    first = asyncio.create_task(executor.run(time.sleep, 0.2))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(InferenceOverloaded) as exc:
+        await executor.run(calls.append, "late")
+    assert exc.value.reason == "queue_timeout"
+    assert calls == []
+    await first
+    executor.shutdown()
+
+
+async def test_critical_calls_run_before_queued_bulk_work():
+    """Verify (critical) được chạy trước register/diagnostic đã xếp hàng từ trước"""
+    release = threading.Event()
+    order = []
+    executor = InferenceExecutor(workers=1, max_queue=8)
+    blocker = asyncio.create_task(executor.run(release.wait, 5, priority=PRIORITY_STANDARD))
+    await asyncio.sleep(0.02)
+
+    queued = [
+        asyncio.create_task(executor.run(order.append, "register", priority=PRIORITY_STANDARD)),
+        asyncio.create_task(executor.run(order.append, "diagnostic", priority=PRIORITY_BACKGROUND)),
+        asyncio.create_task(executor.run(order.append, "verify", priority=PRIORITY_CRITICAL)),
+    ]
+    await asyncio.sleep(0.02)
+    release.set()
+    await asyncio.gather(blocker, *queued)
+
+    assert order == ["verify", "register", "diagnostic"]
+    executor.shutdown()
+
+
+async def test_reserved_worker_stays_free_for_critical_calls():
+    """Bulk registration không chiếm hết thread: verify chạy ngay trên thread dự trữ"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=2, max_queue=8, reserved_workers=1)
+    bulk = [asyncio.create_task(executor.run(release.wait, 5, priority=PRIORITY_STANDARD)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    assert executor.get_stats()["running"] == 1
+
+    started = time.perf_counter()
+    assert await executor.run(lambda: "verified", priority=PRIORITY_CRITICAL) == "verified"
+    assert time.perf_counter() - started < 0.5
+
+    release.set()
+    await asyncio.gather(*bulk)
+    executor.shutdown()
+
+
+async def test_starvation_guard_serves_long_waiting_bulk_call():
+    """Register chờ quá starvation_s được phục vụ trước dù vẫn còn verify xếp hàng"""
+    release = threading.Event()
+    order = []
+    executor = InferenceExecutor(workers=1, max_queue=8, starvation_s=0.05)
+    blocker = asyncio.create_task(executor.run(release.wait, 5, priority=PRIORITY_CRITICAL))
+    await asyncio.sleep(0.02)
+
+    register = asyncio.create_task(executor.run(order.append, "register", priority=PRIORITY_STANDARD))
+    await asyncio.sleep(0.1)
+    verify = asyncio.create_task(executor.run(order.append, "verify", priority=PRIORITY_CRITICAL))
+    await asyncio.sleep(0.02)
+    release.set()
+    await asyncio.gather(blocker, register, verify)
+
+    assert order == ["register", "verify"]
+    assert executor.get_stats()["starvation_promotions"][PRIORITY_STANDARD] >= 1
+    executor.shutdown()
+
+
+async def test_bulk_work_is_rejected_before_critical_queue_fills():
+    """Mỗi lớp không critical chỉ dùng tối đa nửa hàng đợi; verify vẫn được nhận"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=1, max_queue=4)
+    tasks = [asyncio.create_task(executor.run(release.wait, 5, priority=PRIORITY_STANDARD)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(InferenceOverloaded):
+        await executor.run(lambda: None, priority=PRIORITY_STANDARD)
+    tasks.append(asyncio.create_task(executor.run(lambda: "ok", priority=PRIORITY_CRITICAL)))
+    await asyncio.sleep(0.02)
+    assert executor.get_stats()["queued"][PRIORITY_CRITICAL] == 1
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+    assert results[-1] == "ok"
+    executor.shutdown()
+
+
+async def test_bulk_flood_of_both_classes_leaves_room_for_check_ins():
+    """Register + background tràn ngập (cấu hình mặc định) → verify vẫn được nhận và chạy"""
+    release = threading.Event()
+    executor = InferenceExecutor(workers=4, max_queue=32, reserved_workers=1, critical_reserve=8)
+    bulk = [
+        asyncio.create_task(executor.run(release.wait, 5, priority=priority))
+        for priority in (PRIORITY_STANDARD, PRIORITY_BACKGROUND) for _ in range(40)
+    ]
+    await asyncio.sleep(0.05)
+    stats = executor.get_stats()
+    assert stats["queued"][PRIORITY_STANDARD] + stats["queued"][PRIORITY_BACKGROUND] <= 32 - 8
+
+    # Every non-reserved thread is busy with bulk work; the reserved one serves check-ins
+    verifies = [asyncio.create_task(executor.run(lambda: "ok", priority=PRIORITY_CRITICAL)) for _ in range(8)]
+    assert await asyncio.gather(*verifies) == ["ok"] * 8
+
+    release.set()
+    results = await asyncio.gather(*bulk, return_exceptions=True)
+    assert any(isinstance(r, InferenceOverloaded) for r in results)
+    executor.shutdown()
+
+
+def test_endpoint_returns_503_with_retry_after():
+    """Router: executor quá tải → 503 kèm header Retry-After"""
+    from unittest.mock import MagicMock, patch
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("API_KEY", "test-api-key-secret")
+    with patch("app.routers.face_router.FaceService", return_value=MagicMock()):
+        from app.main import app
+        from app.routers import face_router
+
+    async def overloaded(*args, **kwargs):
+        raise InferenceOverloaded("queue_full", 7)
+
+    with patch.object(face_router.inference_executor, "run", overloaded), \
+            patch.object(face_router, "face_service", MagicMock()):
+        res = TestClient(app).post(
+            "/api/face/anti-spoofing/check",
+            headers={"X-API-Key": os.environ["API_KEY"]},
+            files=[("image", ("a.jpg", b"\xff\xd8" + b"0" * 2048, "image/jpeg"))],
+        )
+
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "7"
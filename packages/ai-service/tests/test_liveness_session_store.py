@@ -0,0 +1,211 @@
+"""
+LivenessSessionStore tests — TTL theo heap + sweeper cho bộ nhớ trong tiến trình,
+và backend Redis (chạy với fake client cục bộ) để nhiều worker dùng chung session.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.liveness_detector import HeadPose, LivenessSession
+from app.services.liveness_session_store import (
+    MemorySessionStore,
+    RedisSessionStore,
+    create_session_store,
+)
+
+
+class FakePipeline:
+    """Queues calls and runs them back to back on execute(), like MULTI/EXEC."""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        return lambda *args, **kwargs: self._calls.append((method, args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self._calls]
+
+
+class FakeRedis:
+    """Subset of redis.Redis used by RedisSessionStore (values as bytes, TTL in ms)."""
+
+    def __init__(self):
+        self._data = {}
+        self._zsets = {}
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def set(self, key, value, px=None, xx=False, keepttl=False):
+        entry = self._live(key)
+        if xx and entry is None:
+            return None
+        expires_at = time.monotonic() + px / 1000.0 if px else None
+        if keepttl and entry is not None:
+            expires_at = entry[1]
+        self._data[key] = (value.encode("utf-8"), expires_at)
+        return True
+
+    def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    def delete(self, key):
+        return 1 if self._data.pop(key, None) is not None else 0
+
+    def zadd(self, key, mapping):
+        self._zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zrem(self, key, member):
+        return 1 if self._zsets.get(key, {}).pop(member, None) is not None else 0
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self._zsets.get(key, {})
+        stale = [m for m, score in zset.items() if score <= float(high)]
+        for member in stale:
+            del zset[member]
+        return len(stale)
+
+    def zcard(self, key):
+        return len(self._zsets.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def _session():
+    session = LivenessSession()
+    session.start_challenge()
+    return session
+
+
+def test_memory_store_expires_sessions_in_ttl_order():
+    """Session hết TTL bị xoá khi sweep, session còn hạn vẫn giữ nguyên"""
+    store = MemorySessionStore(ttl_seconds=0.05)
+    store.create("old", _session())
+    time.sleep(0.03)
+    store.create("new", _session())
+    time.sleep(0.03)
+
+    assert store.sweep() == 1
+    assert store.get("old") is None
+    assert store.get("new") is not None
+    time.sleep(0.03)
+    assert store.get("new") is None
+    assert len(store) == 0
+
+
+def test_memory_store_save_does_not_extend_or_resurrect():
+    """save() không gia hạn TTL và không tạo lại session đã xoá"""
+    store = MemorySessionStore(ttl_seconds=0.05)
+    session = _session()
+    store.create("a", session)
+    time.sleep(0.03)
+    store.save("a", session)
+    time.sleep(0.03)
+    assert store.get("a") is None
+
+    store.save("gone", _session())
+    assert store.get("gone") is None
+
+
+def test_memory_store_background_sweeper():
+    """Sweeper nền dọn session bị bỏ dở mà không cần request nào"""
+    store = MemorySessionStore(ttl_seconds=0.01, sweep_interval=0.02)
+    for i in range(20):
+        store.create(f"s{i}", _session())
+    deadline = time.monotonic() + 2
+    while len(store) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    store.close()
+    assert len(store) == 0
+
+
+def test_redis_store_shares_sessions_between_workers():
+    """Hai worker (hai store) cùng một Redis: baseline lưu ở worker này, đọc ở worker kia"""
+    client = FakeRedis()
+    worker_a = RedisSessionStore(client, ttl_seconds=5)
+    worker_b = RedisSessionStore(client, ttl_seconds=5)
+
+    session = _session()
+    worker_a.create("abc", session)
+    session.baseline_pose = HeadPose(yaw=12.5, pitch=-3.0, roll=1.0)
+    worker_a.save("abc", session)
+
+    restored = worker_b.get("abc")
+    assert restored.challenge == session.challenge
+    assert restored.challenge_data == session.challenge_data
+    assert restored.baseline_pose == session.baseline_pose
+    assert restored.started_at == session.started_at
+    assert len(worker_b) == 1
+
+    worker_b.delete("abc")
+    assert worker_a.get("abc") is None
+    worker_a.save("abc", session)
+    assert worker_a.get("abc") is None
+
+
+def test_redis_store_uses_native_ttl():
+    """Redis tự hết hạn key; save() giữ nguyên TTL ban đầu"""
+    store = RedisSessionStore(FakeRedis(), ttl_seconds=0.05)
+    session = _session()
+    store.create("t", session)
+    time.sleep(0.03)
+    store.save("t", session)
+    time.sleep(0.03)
+    assert store.get("t") is None
+    # the key expired on its own; sweep only drops its index entry
+    assert store.sweep() == 1
+    assert len(store) == 0
+
+
+def test_redis_store_counts_without_scanning():
+    """Số session lấy từ sorted set (ZCARD), không SCAN keyspace; delete/pop cập nhật ngay"""
+    client = FakeRedis()
+    client.scan_iter = None  # a SCAN would fail here
+    store = RedisSessionStore(client, ttl_seconds=5)
+    for i in range(3):
+        store.create(f"s{i}", _session())
+    assert len(store) == 3
+    store.delete("s0")
+    store.pop("s1")
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_pop_consumes_a_session_exactly_once(backend):
+    """Hai worker cùng pop một session: chỉ một bên nhận được, bên kia None"""
+    if backend == "redis":
+        client = FakeRedis()
+        worker_a, worker_b = RedisSessionStore(client, 5), RedisSessionStore(client, 5)
+    else:
+        worker_a = worker_b = MemorySessionStore(ttl_seconds=5)
+    session = _session()
+    worker_a.create("once", session)
+
+    first, second = worker_a.pop("once"), worker_b.pop("once")
+    assert first is not None and first.challenge == session.challenge
+    assert second is None
+    assert worker_b.get("once") is None
+
+
+def test_factory_falls_back_to_memory_without_redis_package(monkeypatch):
+    """SESSION_STORAGE_TYPE=redis nhưng thiếu thư viện redis → dùng bộ nhớ"""
+    monkeypatch.setitem(sys.modules, "redis", None)
+    store = create_session_store("redis", "redis://localhost:6379", ttl_seconds=30)
+    assert isinstance(store, MemorySessionStore)
+    assert create_session_store("memory", "", ttl_seconds=30).backend == "memory"
@@ -0,0 +1,171 @@
+"""
+Liveness stream tests — xác thực liveness qua một kết nối WebSocket,
+theo dõi pose/EAR từng frame và trả kết quả ngay khi đạt thử thách.
+"""
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.liveness_detector import LivenessChallenge, LivenessDetector, LivenessSession
+from app.services.liveness_session_store import MemorySessionStore
+from app.services.liveness_stream import LivenessStreamTracker
+from app.utils.image_utils import ImageUtils
+from benchmarks.common import synthetic_jpeg
+
+# Mũi ở giữa hai mắt (yaw 90°) và lệch sang phải (yaw ~63°)
+FACING = [[40.0, 50.0], [60.0, 50.0], [50.0, 70.0], [42.0, 85.0], [58.0, 85.0]]
+TURNED_LEFT = [[40.0, 50.0], [60.0, 50.0], [60.0, 70.0], [42.0, 85.0], [58.0, 85.0]]
+
+
+def _session(challenge):
+    session = LivenessSession()
+    session.start_challenge()
+    session.challenge = challenge
+    session.challenge_data["type"] = challenge.value
+    return session
+
+
+def test_pose_challenge_verdict_as_soon_as_satisfied():
+    """Frame đầu là baseline; kết quả trả về ngay frame đạt yêu cầu, không chờ hết giờ"""
+    tracker = LivenessStreamTracker(_session(LivenessChallenge.TURN_LEFT))
+
+    assert tracker.accept_frame()
+    assert tracker.update(FACING)["type"] == "baseline"
+    assert tracker.update(FACING)["type"] == "progress"
+    verdict = tracker.update(TURNED_LEFT)
+
+    assert verdict["type"] == "verdict" and verdict["passed"] is True
+    assert verdict["frames_processed"] == 3
+    assert tracker.verdict is verdict
+    # Sau khi có kết quả, frame mới bị bỏ qua
+    assert not tracker.accept_frame()
+
+
+def test_frame_stride_and_busy_frames_are_skipped():
+    """Chỉ phân tích mỗi frame thứ N, và không phân tích khi còn frame đang xử lý"""
+    tracker = LivenessStreamTracker(_session(LivenessChallenge.TURN_LEFT), frame_stride=3)
+    accepted = [tracker.accept_frame() for _ in range(7)]
+    assert accepted == [True, False, False, True, False, False, True]
+    assert not tracker.accept_frame(busy=True)
+
+
+def _eye(cx, openness):
+    # 6 điểm viền mắt: góc, 2 mí trên, góc, 2 mí dưới; EAR = openness / 10
+    return [[cx - 5, 50], [cx - 2, 50 - openness / 2], [cx + 2, 50 - openness / 2],
+            [cx + 5, 50], [cx + 2, 50 + openness / 2], [cx - 2, 50 + openness / 2]]
+
+
+def test_blink_detected_incrementally():
+    """EAR từ viền mắt giảm dưới ngưỡng rồi hồi lại → nháy mắt, tính dần theo từng frame"""
+    tracker = LivenessStreamTracker(_session(LivenessChallenge.BLINK))
+
+    tracker.update(FACING)   # baseline
+    events = [
+        tracker.update(FACING, eyes=[_eye(40, openness), _eye(60, openness)])
+        for openness in (3.1, 3.0, 1.2, 2.9)
+    ]
+
+    assert [e["type"] for e in events] == ["progress", "progress", "progress", "verdict"]
+    assert events[-1]["passed"] is True and events[-1]["confidence"] > 0
+
+
+def test_stream_never_runs_blink_on_5_point_kps():
+    """kps 5 điểm không có mí mắt: session BLINK được đổi thử thách khi stream nhận"""
+    from app.services.face_service import FaceService
+    from app.services.liveness_stream import STREAM_CHALLENGES
+
+    service = FaceService.__new__(FaceService)
+    service.liveness_sessions = MemorySessionStore(ttl_seconds=30)
+    service.liveness_tokens = None
+    service.liveness_sessions.create("s1", _session(LivenessChallenge.BLINK))
+
+    tracker, error = service.open_liveness_stream("s1")
+
+    assert error is None
+    assert tracker.challenge in STREAM_CHALLENGES
+    assert tracker.session.challenge_data["type"] == tracker.challenge.value
+    # Không có viền mắt thì không bao giờ đạt BLINK
+    blink = LivenessStreamTracker(_session(LivenessChallenge.BLINK))
+    blink.update(FACING)
+    assert all(blink.update(FACING)["type"] == "progress" for _ in range(5))
+
+
+def test_timeout_verdict_without_face():
+    tracker = LivenessStreamTracker(_session(LivenessChallenge.TURN_RIGHT))
+    tracker.accept_frame()
+    tracker.no_face()
+    verdict = tracker.timed_out()
+    assert verdict["passed"] is False
+    assert verdict["error_message"] == "Không phát hiện khuôn mặt"
+
+
+@pytest.fixture
+def stream_client():
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("API_KEY", "test-api-key-secret")
+    with patch("app.routers.face_router.FaceService", return_value=MagicMock()):
+        from app.main import app
+        from app.routers import face_router
+    from app.services.face_service import FaceService
+
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.image_utils = ImageUtils()
+    service.liveness_sessions = MemorySessionStore(ttl_seconds=30)
+    service.liveness_tokens = None
+    service.detector = MagicMock()
+    service.models_ready = True
+    with patch.object(face_router, "face_service", service), \
+            patch("app.services.face_service.LIVENESS_STREAM_FRAME_STRIDE", 1):
+        yield TestClient(app), service
+
+
+def test_websocket_stream_end_to_end(stream_client):
+    """Một kết nối: ready → baseline → progress → verdict; session bị thu hồi khỏi store"""
+    client, service = stream_client
+    service.liveness_sessions.create("s1", _session(LivenessChallenge.TURN_LEFT))
+    service.detector.detect_single_face.side_effect = [
+        {'success': True, 'face': {'kps': FACING}},
+        {'success': False, 'error_code': 'NO_FACE_DETECTED', 'error_message': 'no face'},
+        {'success': True, 'face': {'kps': TURNED_LEFT}},
+    ]
+    frame = synthetic_jpeg(320, 240)
+
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    with client.websocket_connect("/api/face/liveness/stream/s1", headers=headers) as ws:
+        ready = ws.receive_json()
+        assert ready["type"] == "ready" and ready["challenge"]["type"] == "turn_left"
+        assert service.liveness_sessions.get("s1") is None
+
+        ws.send_bytes(frame)
+        assert ws.receive_json()["type"] == "baseline"
+        ws.send_bytes(frame)
+        progress = ws.receive_json()
+        assert progress["face"] is False and progress["error_code"] == "NO_FACE_DETECTED"
+        ws.send_bytes(frame)
+        verdict = ws.receive_json()
+
+    assert verdict["type"] == "verdict" and verdict["passed"] is True
+    assert verdict["frames_received"] == 3
+
+
+def test_websocket_rejects_bad_key_and_unknown_session(stream_client):
+    """API key chỉ nhận qua header hoặc message auth đầu tiên, không qua URL"""
+    client, _ = stream_client
+    key = os.environ["API_KEY"]
+    with client.websocket_connect(f"/api/face/liveness/stream/s1?api_key={key}") as ws:
+        ws.send_bytes(b"frame")
+        assert ws.receive_json()["error_code"] == "UNAUTHORIZED"
+    with client.websocket_connect("/api/face/liveness/stream/s1") as ws:
+        ws.send_json({"type": "auth", "api_key": "wrong"})
+        assert ws.receive_json()["error_code"] == "UNAUTHORIZED"
+    with client.websocket_connect("/api/face/liveness/stream/missing") as ws:
+        ws.send_json({"type": "auth", "api_key": key})
+        assert ws.receive_json()["error_code"] == "INVALID_SESSION"
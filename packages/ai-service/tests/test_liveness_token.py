@@ -0,0 +1,110 @@
+"""
+Liveness token tests — token ký HMAC thay cho session phía server,
+chống replay bằng Bloom filter xoay vòng.
+"""
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.liveness_detector import HeadPose, LivenessSession
+from app.services.liveness_session_store import MemorySessionStore
+from app.services.liveness_token import InvalidLivenessToken, LivenessTokenSigner
+from app.utils.bloom_filter import RotatingBloomFilter
+from app.utils.image_utils import ImageUtils
+from benchmarks.common import synthetic_jpeg
+
+SECRET = b"test-liveness-secret"
+
+
+def _session():
+    session = LivenessSession()
+    session.start_challenge()
+    return session
+
+
+def test_rotating_bloom_filter_remembers_then_forgets(monkeypatch):
+    """Không có false negative trong cửa sổ lưu; quên sau hai chu kỳ xoay"""
+    clock = [1000.0]
+    monkeypatch.setattr("app.utils.bloom_filter.time.monotonic", lambda: clock[0])
+    seen = RotatingBloomFilter(capacity=1000, rotate_seconds=10)
+    keys = [f"nonce-{i}" for i in range(500)]
+    assert not any(seen.check_and_add(k) for k in keys)
+    assert all(k in seen for k in keys)
+    clock[0] += 12
+    assert all(k in seen for k in keys)   # vẫn nằm ở thế hệ trước
+    clock[0] += 10
+    assert not any(k in seen for k in keys)
+
+
+def test_token_round_trip_on_any_worker():
+    """Worker khác (cùng secret) đọc được token, không cần tra cứu"""
+    session = _session()
+    session.baseline_pose = HeadPose(yaw=4.0, pitch=1.5, roll=-2.0)
+    token = LivenessTokenSigner(SECRET, ttl_seconds=30).issue("s1", session)
+
+    restored, nonce = LivenessTokenSigner(SECRET, ttl_seconds=30).load(token, "s1")
+    assert restored.challenge == session.challenge
+    assert restored.baseline_pose == session.baseline_pose
+    assert nonce
+
+
+@pytest.mark.parametrize("mutate, error_code", [
+    (lambda t: t[:-2] + ("AA" if not t.endswith("AA") else "BB"), "INVALID_SESSION"),
+    (lambda t: "not-a-token", "INVALID_SESSION"),
+])
+def test_tampered_token_is_rejected(mutate, error_code):
+    token = LivenessTokenSigner(SECRET, ttl_seconds=30).issue("s1", _session())
+    with pytest.raises(InvalidLivenessToken) as exc:
+        LivenessTokenSigner(SECRET, ttl_seconds=30).load(mutate(token), "s1")
+    assert exc.value.error_code == error_code
+
+
+def test_token_checks_session_secret_and_expiry():
+    signer = LivenessTokenSigner(SECRET, ttl_seconds=0.05)
+    token = signer.issue("s1", _session())
+    with pytest.raises(InvalidLivenessToken):
+        signer.load(token, "other-session")
+    with pytest.raises(InvalidLivenessToken):
+        LivenessTokenSigner(b"another-secret", ttl_seconds=30).load(token, "s1")
+    time.sleep(0.06)
+    with pytest.raises(InvalidLivenessToken) as exc:
+        signer.load(token, "s1")
+    assert exc.value.error_code == "SESSION_EXPIRED"
+
+
+def test_service_flow_in_token_mode_rejects_replay():
+    """create → baseline → verify bằng token; gửi lại token verify bị từ chối"""
+    from app.services.face_service import FaceService
+
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.image_utils = ImageUtils()
+    service.liveness_sessions = MemorySessionStore(ttl_seconds=30)
+    service.liveness_tokens = LivenessTokenSigner(SECRET, ttl_seconds=30)
+    service.detector = MagicMock()
+    landmarks = [[30.0, 40.0], [70.0, 40.0], [50.0, 60.0], [35.0, 80.0], [65.0, 80.0]]
+    service.detector.detect_single_face.return_value = {
+        'success': True, 'face': {'landmark': landmarks, 'bbox': [10, 10, 90, 90]},
+    }
+    image = synthetic_jpeg(320, 240)
+
+    created = service.create_liveness_session("abc")
+    assert created['token'] and len(service.liveness_sessions) == 0
+
+    baseline = service.capture_liveness_baseline("abc", image, created['token'])
+    assert baseline['success'] and baseline['token'] != created['token']
+    # Token của bước tạo session chỉ dùng được một lần
+    assert service.capture_liveness_baseline("abc", image, created['token'])['error_code'] == 'INVALID_SESSION'
+
+    result = service.verify_liveness_response("abc", image, baseline['token'])
+    assert result['success'] is True
+    replay = service.verify_liveness_response("abc", image, baseline['token'])
+    assert replay['error_code'] == 'INVALID_SESSION'
+    assert service.verify_liveness_response("abc", image)['error_code'] == 'INVALID_SESSION'
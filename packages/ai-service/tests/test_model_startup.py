@@ -0,0 +1,121 @@
+"""
+Startup tests — tải model song song, warm-up và endpoint /ready tách khỏi /health.
+"""
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.face_service import FaceService
+
+LOAD_SECONDS = 0.2
+
+
+def _service():
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.detector = MagicMock()
+    service._anti_spoofing_enabled = True
+    service._anti_spoofing_method = "hybrid"
+    service.anti_spoofing = None
+    service.pipeline_pool = None
+    service.models_ready = False
+    service.models_error = None
+    service.startup_timings = {}
+    return service
+
+
+def _slow(result=None):
+    def load(*args, **kwargs):
+        time.sleep(LOAD_SECONDS)
+        return result if result is not None else MagicMock()
+    return load
+
+
+def test_models_load_in_parallel_then_warm_up():
+    """InsightFace và MiniFASNet tải song song; có thời gian từng bước"""
+    service = _service()
+    loader = MagicMock()
+    loader.load_model.side_effect = _slow()
+    service.warm_up = MagicMock()
+
+    started = time.perf_counter()
+    with patch("app.services.face_service.ModelLoader", return_value=loader), \
+            patch("app.services.face_service.AntiSpoofingDetector", side_effect=_slow()):
+        assert service.load_models() is True
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 2.5 * LOAD_SECONDS
+    assert service.models_ready and service.anti_spoofing is not None
+    service.detector.load.assert_called_once()
+    service.warm_up.assert_called_once()
+    assert set(service.startup_timings) == {
+        "insightface", "anti_spoofing", "warm_up", "total",
+    }
+    assert service.startup_timings["insightface"] >= LOAD_SECONDS * 1000 * 0.9
+
+
+def test_warm_up_leaves_cascade_metrics_untouched():
+    """Warm-up gọi thẳng SFAS và texture, không qua cascade nên không ghi stage metrics"""
+    from app.services.anti_spoofing_cascade import AntiSpoofingCascade
+
+    service = _service()
+    service.anti_spoofing = MagicMock()
+    service.texture_analyzer = MagicMock()
+    cascade = AntiSpoofingCascade()
+    before = cascade.get_stats()
+
+    service.warm_up()
+
+    service.anti_spoofing.predict.assert_called_once()
+    service.texture_analyzer.comprehensive_check.assert_called_once()
+    assert cascade.get_stats() == before
+
+
+def test_service_stays_not_ready_when_face_model_fails():
+    """Không tải được InsightFace → models_ready False, lỗi được ghi lại"""
+    service = _service()
+    service.detector.app = None
+    loader = MagicMock()
+    loader.load_model.side_effect = RuntimeError("model file missing")
+    service.warm_up = MagicMock()
+
+    with patch("app.services.face_service.ModelLoader", return_value=loader), \
+            patch("app.services.face_service.AntiSpoofingDetector", return_value=MagicMock()):
+        assert service.load_models() is False
+
+    assert not service.models_ready
+    assert "model file missing" in service.models_error
+    service.warm_up.assert_not_called()
+
+
+def test_ready_endpoint_and_request_gating():
+    """/health luôn 200; /ready và các endpoint inference trả 503 cho đến khi model sẵn sàng"""
+    from fastapi.testclient import TestClient
+
+    os.environ.setdefault("API_KEY", "test-api-key-secret")
+    with patch("app.routers.face_router.FaceService", return_value=MagicMock()):
+        from app.main import app
+        from app.routers import face_router
+
+    service = _service()
+    client = TestClient(app)
+    files = [("image", ("a.jpg", b"\xff\xd8" + b"0" * 2048, "image/jpeg"))]
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+
+    with patch.object(face_router, "face_service", service):
+        assert client.get("/health").status_code == 200
+        res = client.get("/ready")
+        assert res.status_code == 503 and res.json()["status"] == "loading"
+        res = client.post("/api/face/anti-spoofing/check", files=files, headers=headers)
+        assert res.status_code == 503 and "Retry-After" in res.headers
+
+        service.models_ready = True
+        service.startup_timings = {"total": 1234.5}
+        res = client.get("/ready")
+        assert res.status_code == 200
+        assert res.json()["timings_ms"] == {"total": 1234.5}
@@ -0,0 +1,138 @@
+"""
+FacePipelinePool tests — worker process nhận frame qua shared memory.
+Không tải model: worker chạy hàm numpy thuần (preload=False).
+"""
+import os
+import signal
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.pipeline_pool import FacePipelinePool
+from app.utils.image_utils import ImageUtils
+from benchmarks.common import synthetic_jpeg
+
+
+def _frame_summary(image, offset):
+    # Chạy trong worker process
+    return os.getpid(), image.shape, int(image.astype(np.int64).sum()) + offset
+
+
+def _frame_and_source(image, source=None):
+    # Chạy trong worker process
+    return image.shape, int(image.astype(np.int64).sum()), source
+
+
+def _crash(image):
+    # Worker chết giữa chừng (như bị OOM kill)
+    os._exit(1)
+
+
+def _fail(image):
+    raise ValueError("bad frame")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = FacePipelinePool(workers=2, preload=False, slot_bytes=64 * 64 * 3)
+    yield pool
+    pool.shutdown()
+
+
+def test_frame_reaches_worker_intact(pool):
+    """Frame được chuyển sang worker qua shared memory, nội dung giữ nguyên"""
+    image = np.random.default_rng(0).integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+    pid, shape, total = pool.run(_frame_summary, image, 7)
+
+    assert pid != os.getpid()
+    assert shape == image.shape
+    assert total == int(image.astype(np.int64).sum()) + 7
+
+
+def test_slots_are_reused_and_grow_for_large_frames(pool):
+    """Slot shared memory được tái sử dụng; frame lớn hơn slot vẫn chạy"""
+    small = np.ones((32, 32, 3), dtype=np.uint8)
+    for _ in range(5):
+        pool.run(_frame_summary, small, 0)
+    created = pool.get_stats()['shared_slots']['created']
+
+    for _ in range(5):
+        pool.run(_frame_summary, small, 0)
+    assert pool.get_stats()['shared_slots']['created'] == created
+
+    large = np.ones((128, 128, 3), dtype=np.uint8)
+    assert pool.run(_frame_summary, large, 0)[2] == large.size
+
+
+def test_source_bytes_travel_in_the_shared_slot(pool):
+    """JPEG gốc đi cùng slot shared memory (sau frame), không qua pickle"""
+    image = np.random.default_rng(1).integers(0, 256, size=(40, 40, 3), dtype=np.uint8)
+    source = synthetic_jpeg(320, 240)
+    shape, total, received = pool.run(_frame_and_source, image, source=source)
+
+    assert shape == image.shape
+    assert total == int(image.astype(np.int64).sum())
+    assert received == source
+    # Không có source thì hàm worker không nhận tham số source
+    assert pool.run(_frame_and_source, image)[2] is None
+
+
+def test_worker_errors_are_raised_in_parent(pool):
+    with pytest.raises(RuntimeError, match="ValueError: bad frame"):
+        pool.run(_fail, np.zeros((8, 8, 3), dtype=np.uint8))
+    # Pool vẫn dùng được sau lỗi
+    assert pool.run(_frame_summary, np.zeros((8, 8, 3), dtype=np.uint8), 1)[2] == 1
+
+
+def test_pool_recovers_after_a_worker_dies():
+    """Worker bị kill → pool dựng lại executor; request sau (và request đang chạy) vẫn chạy được"""
+    pool = FacePipelinePool(workers=1, preload=False, slot_bytes=64 * 64 * 3)
+    try:
+        image = np.ones((16, 16, 3), dtype=np.uint8)
+        pid = pool.run(_frame_summary, image, 0)[0]
+        os.kill(pid, signal.SIGKILL)
+        # The broken executor is replaced and the task retried on the new one
+        new_pid, _, total = pool.run(_frame_summary, image, 0)
+        assert new_pid != pid and total == image.size
+
+        # A task that kills its worker every time fails alone, after one retry
+        with pytest.raises(BrokenProcessPool):
+            pool.run(_crash, image)
+        assert pool.run(_frame_summary, image, 1)[2] == image.size + 1
+        assert pool.get_stats()["restarts"] >= 2
+    finally:
+        pool.shutdown()
+
+
+def test_verify_face_uses_worker_results_in_process_mode():
+    """Chế độ process: verify_face lấy detection + anti-spoofing từ worker"""
+    from app.services.face_service import FaceService
+
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.image_utils = ImageUtils()
+    service.gallery = MagicMock()
+    service.recognizer = MagicMock()
+    service._anti_spoofing_method = "hybrid"
+    service.detector = MagicMock()
+    service.pipeline_pool = MagicMock()
+    embedding = [1.0] + [0.0] * 511
+    service.pipeline_pool.analyze.return_value = (
+        {'success': True, 'face': {'embedding': embedding, 'bbox': [10, 10, 90, 90],
+                                   'confidence': 0.99, 'score': 0.99, 'kps': []}},
+        {'is_real': False, 'attack_type': 'print', 'confidence': 0.9},
+    )
+
+    result = service.verify_face(synthetic_jpeg(320, 240), reference_embeddings=[embedding])
+
+    assert result['error_code'] == 'SPOOF_DETECTED'
+    service.detector.detect_single_face.assert_not_called()
+    _, kwargs = service.pipeline_pool.analyze.call_args
+    assert kwargs['spoof_method'] == 'hybrid'
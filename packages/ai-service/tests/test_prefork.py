@@ -0,0 +1,110 @@
+"""
+Pre-fork launcher tests — worker dùng chung bộ nhớ đã nạp ở master (copy-on-write),
+master khởi động lại worker bị thoát và dừng tất cả khi tắt.
+"""
+import asyncio
+import gc
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.prefork import PreforkMaster, check_worker_config, memory_report
+from app.services.inference_executor import InferenceExecutor
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists(f"/proc/{os.getpid()}/smaps_rollup"), reason="cần Linux /proc smaps_rollup"
+)
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _sleep_forever(index):
+    signal.pause()
+
+
+def test_workers_share_preloaded_memory():
+    """Mảng 64 MB nạp trước khi fork: worker không giữ bản sao riêng"""
+    weights = np.random.default_rng(0).random(64 * 1024 * 1024 // 8)
+    gc.collect()
+    master = PreforkMaster(2, _sleep_forever, stop_timeout=5)
+    master.start()
+    try:
+        time.sleep(0.2)
+        report = memory_report(os.getpid(), sorted(master.pids))
+        workers = [row for row in report["processes"] if row["role"] == "worker"]
+        assert len(workers) == 2
+        for row in workers:
+            assert row["shared_mb"] >= 60
+            assert row["private_mb"] < 32
+        assert report["total_pss_mb"] < report["total_rss_mb"]
+    finally:
+        master.stop()
+    assert master.pids == {}
+    del weights
+
+
+def test_exited_worker_is_restarted():
+    """Worker thoát → master fork lại worker cùng index"""
+    master = PreforkMaster(1, lambda index: None, stop_timeout=5)
+    master.start()
+    first = next(iter(master.pids))
+    try:
+        assert _wait_until(lambda: bool(master.reap()))
+        assert master.restarts >= 1
+        assert master.pids and first not in master.pids
+    finally:
+        master.stop()
+
+
+def test_executor_threads_start_on_first_call():
+    """Executor tạo lúc import không có thread nào trước khi fork"""
+    executor = InferenceExecutor(workers=2, max_queue=2)
+    assert executor._threads == []
+    assert asyncio.run(executor.run(lambda: "ok")) == "ok"
+    assert len(executor._threads) == 2
+    executor.shutdown()
+
+
+def _worker_config(workers, **overrides):
+    config = dict(gallery_enabled=False, session_mode="token", session_storage="memory", token_secret="s3cret")
+    config.update(overrides)
+    check_worker_config(workers, **config)
+
+
+def test_multi_worker_refuses_in_memory_gallery():
+    """Nhiều worker + gallery trong bộ nhớ → từ chối khởi động; tắt gallery hoặc 1 worker thì chạy"""
+    with pytest.raises(RuntimeError, match="FACE_GALLERY_ENABLED=false"):
+        _worker_config(4, gallery_enabled=True)
+    _worker_config(4)
+    _worker_config(1, gallery_enabled=True)
+
+
+def test_multi_worker_refuses_per_worker_liveness_sessions(monkeypatch):
+    """Session liveness phải dùng chung: store trong bộ nhớ hoặc token không có secret → từ chối"""
+    # Mặc định (store + memory) không chạy được với nhiều worker
+    with pytest.raises(RuntimeError, match="SESSION_STORAGE_TYPE=memory"):
+        _worker_config(4, session_mode="store", session_storage="memory")
+    with pytest.raises(RuntimeError, match="LIVENESS_TOKEN_SECRET"):
+        _worker_config(4, session_mode="token", token_secret="")
+    _worker_config(1, session_mode="store", session_storage="memory")
+
+    monkeypatch.setattr("app.prefork.importlib.util.find_spec", lambda name: object())
+    _worker_config(4, session_mode="store", session_storage="redis")
+    monkeypatch.setattr("app.prefork.importlib.util.find_spec", lambda name: None)
+    with pytest.raises(RuntimeError, match="redis package is not installed"):
+        _worker_config(4, session_mode="store", session_storage="redis")
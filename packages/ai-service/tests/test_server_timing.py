@@ -0,0 +1,93 @@
+"""
+Server-Timing tests — mỗi response mang thời gian từng bước của chính request đó
+(face: queue/decode/detect/anti_spoofing; RAG: llm...).
+"""
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("API_KEY", "test-api-key-secret")
+
+from benchmarks.common import synthetic_jpeg
+from app.utils.server_timing import ServerTimingMiddleware
+from app.utils.stage_timer import StageTimings, stage, timing_scope
+
+
+def _parse(header):
+    entries = {}
+    for entry in header.split(","):
+        name, _, dur = entry.strip().partition(";dur=")
+        entries[name] = float(dur)
+    return entries
+
+
+def test_face_endpoint_reports_its_stages():
+    """Stage chạy trên thread của executor vẫn vào header của đúng request"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.limiter import limiter
+    from app.routers import face_router
+    from app.services.face_service import FaceService
+    from app.utils.image_utils import ImageUtils
+
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.models_ready = True
+    service.image_utils = ImageUtils()
+    service.anti_spoofing = None
+    service.texture_analyzer = MagicMock()
+    service.texture_analyzer.comprehensive_check.return_value = {
+        'is_real': True, 'confidence': 0.9, 'attack_type': 'none'
+    }
+    service.detector = MagicMock()
+    service.detector.detect_single_face.return_value = {
+        'success': True, 'face': {'bbox': [40, 40, 200, 200], 'confidence': 0.99},
+    }
+
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(face_router.router)
+    files = [("image", ("a.jpg", synthetic_jpeg(320, 240), "image/jpeg"))]
+
+    with patch.object(face_router, "face_service", service):
+        res = TestClient(app).post(
+            "/api/face/anti-spoofing/check", files=files, data={"method": "texture"},
+            headers={"X-API-Key": os.environ["API_KEY"]},
+        )
+
+    assert res.status_code == 200, res.text
+    timings = _parse(res.headers["server-timing"])
+    assert {"queue", "decode", "detect", "anti_spoofing", "texture", "total"} <= set(timings)
+    assert timings["total"] >= timings["decode"] + timings["detect"]
+
+
+async def test_llm_calls_are_timed_per_request():
+    """invoke_llm_with_usage ghi bước llm; các lần gọi trong một request được cộng dồn"""
+    from app.services.usage_tracker import invoke_llm_with_usage
+
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(return_value=MagicMock())
+    with patch("app.services.usage_tracker.record_usage", AsyncMock()), \
+            patch("app.services.usage_tracker.extract_token_usage", return_value=(1, 1, True)):
+        with timing_scope() as timings:
+            for _ in range(2):
+                await invoke_llm_with_usage(llm, "hi", company_id="c1", user_id="u1", operation="chat")
+            with stage("vector_search"):
+                pass
+
+    assert [name for name, _ in timings.items()] == ["llm", "vector_search"]
+    assert llm.ainvoke.await_count == 2
+
+
+def test_header_format():
+    """Định dạng chuẩn: name;dur=<ms>, theo thứ tự bước chạy"""
+    timings = StageTimings()
+    timings.add("decode", 0.0061)
+    timings.add("detect", 0.0417)
+    timings.add("decode", 0.001)
+    assert timings.header(0.063) == "decode;dur=7.1, detect;dur=41.7, total;dur=63.0"
@@ -0,0 +1,104 @@
+"""
+Per-stage metrics tests — thời gian từng bước của verify_face (kể cả bước chạy
+trên thread phụ) và endpoint /metrics theo định dạng Prometheus.
+"""
+import os
+import sys
+from unittest.mock import MagicMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("JWT_SECRET", "test-jwt-secret")
+
+from benchmarks.common import synthetic_jpeg
+from app.services.anti_spoofing_cascade import AntiSpoofingCascade
+from app.services.face_service import FaceService
+from app.utils.image_utils import ImageUtils
+from app.utils.metrics import REGISTRY, MetricsRegistry, render_prometheus
+from app.utils.stage_timer import stage
+
+
+def _stage_counts(operation):
+    snapshot = REGISTRY.histogram("operation_stage_seconds").snapshot()
+    prefix = f"operation={operation},stage="
+    return {key[len(prefix):]: value["count"] for key, value in snapshot.items() if key.startswith(prefix)}
+
+
+def _service():
+    # FaceService không qua __init__ để khỏi tải model
+    service = FaceService.__new__(FaceService)
+    service.image_utils = ImageUtils()
+    service.gallery = MagicMock()
+    service.pipeline_pool = None
+    service._anti_spoofing_method = "hybrid"
+    service.anti_spoofing = None
+    service.anti_spoofing_cascade = AntiSpoofingCascade(order=["texture", "sfas"], early_exit=True)
+    service.texture_analyzer = MagicMock()
+    service.texture_analyzer.comprehensive_check.return_value = {'is_real': True, 'confidence': 0.9}
+    service.detector = MagicMock()
+    service.detector.detect_single_face.return_value = {
+        'success': True,
+        'face': {'embedding': [1.0] + [0.0] * 511, 'bbox': [40, 40, 200, 200],
+                 'confidence': 0.99, 'score': 0.99},
+    }
+    service.recognizer = MagicMock()
+    service.recognizer.verify_against_multiple.return_value = {'match': True, 'similarity': 0.9}
+    return service
+
+
+def test_verify_face_records_each_stage():
+    """decode, detect, anti_spoofing (+ texture) và recognize đều được ghi cho operation verify"""
+    before = _stage_counts("verify")
+    result = _service().verify_face(synthetic_jpeg(320, 240), reference_embeddings=[[1.0] + [0.0] * 511])
+    assert result['match'] is True
+
+    after = _stage_counts("verify")
+    for name in ("decode", "detect", "anti_spoofing", "texture", "recognize"):
+        assert after.get(name, 0) == before.get(name, 0) + 1, name
+    # Ngoài operation (warm-up, worker process) không ghi gì
+    with stage("detect"):
+        pass
+    assert _stage_counts("verify") == after
+
+
+def test_render_prometheus_histogram_and_labels():
+    """Bucket tích lũy + _sum/_count, label được escape"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time", buckets=(0.1, 1.0))
+    histogram.observe(0.05, {"stage": 'de"code'})
+    histogram.observe(3.0, {"stage": 'de"code'})
+    registry.gauge("queue_depth", "Queue", callback=lambda: 4)
+
+    text = render_prometheus(registry)
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="de\\"code",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="de\\"code",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="de\\"code"} 2' in text
+    assert "queue_depth 4" in text
+
+
+def test_metrics_endpoint_exposes_queue_sessions_and_model_load():
+    """/metrics: độ sâu hàng đợi executor, session đang mở, thời gian tải model"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.liveness_session_store import create_session_store
+
+    service = _service()
+    service.startup_timings = {}
+    service._timed("insightface", lambda: None)
+    service.verify_face(synthetic_jpeg(320, 240), reference_embeddings=[[1.0] + [0.0] * 511])
+    store = create_session_store("memory", ttl_seconds=60)
+    store.create("s1", MagicMock())
+
+    try:
+        res = TestClient(app).get("/metrics")
+    finally:
+        store.close()
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'model_load_seconds{step="insightface"}' in res.text
+    assert "# TYPE inference_queue_depth gauge" in res.text
+    assert "liveness_sessions_active 1" in res.text
+    assert 'operation_stage_seconds_bucket{operation="verify",stage="decode",le=' in res.text
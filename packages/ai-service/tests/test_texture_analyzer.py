@@ -0,0 +1,117 @@
+"""
+TextureAnalyzer tests — LBP dạng slice và FFT nửa phổ (rfft2) phải cho
+kết quả giống hệt cách tính cũ (vòng lặp từng pixel, fft2 đầy đủ).
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app.services.texture_analyzer import TextureAnalyzer, _spectrum_layout
+
+
+def _face(h, w, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    base = 127 + 60 * np.sin(xx / 9.0) * np.cos(yy / 13.0)
+    return np.clip(base + rng.normal(0, 15, size=(h, w)), 0, 255).astype(np.uint8)
+
+
+def _lbp_loop(gray):
+    """LBP tham chiếu: vòng lặp từng pixel, biên phản chiếu"""
+    padded = cv2.copyMakeBorder(gray, 1, 1, 1, 1, cv2.BORDER_REFLECT)
+    h, w = gray.shape
+    lbp = np.zeros((h, w), dtype=np.uint8)
+    offsets = [(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0)]
+    for i in range(h):
+        for j in range(w):
+            center = padded[i + 1, j + 1]
+            code = 0
+            for k, (dy, dx) in enumerate(offsets):
+                if padded[i + dy, j + dx] >= center:
+                    code |= 1 << k
+            lbp[i, j] = code
+    return lbp
+
+
+@pytest.mark.parametrize("shape", [(32, 32), (31, 45)])
+def test_lbp_matches_pixel_loop(shape):
+    """LBP vector hoá == vòng lặp, không bị wraparound ở biên"""
+    gray = _face(*shape)
+    assert np.array_equal(TextureAnalyzer().calculate_lbp(gray), _lbp_loop(gray))
+
+
+@pytest.mark.parametrize("shape", [(128, 128), (97, 113), (64, 90)])
+def test_rfft_features_match_full_fft(shape):
+    """Tỉ lệ năng lượng cao tần và vùng Moiré từ rfft2 khớp với fft2 đầy đủ"""
+    gray = _face(*shape, seed=1)
+    h, w = gray.shape
+
+    magnitude = np.abs(np.fft.fftshift(np.fft.fft2(gray.astype(np.float32))))
+    ch, cw = h // 2, w // 2
+    y, x = np.ogrid[:h, :w]
+    low = (x - cw) ** 2 + (y - ch) ** 2 <= (min(h, w) // 8) ** 2
+    expected_ratio = magnitude[~low].sum() / magnitude.sum()
+    expected_region = magnitude[ch - ch // 2:ch + ch // 2, cw - cw // 2:cw + cw // 2]
+
+    weights, low_weights, rows, cols = _spectrum_layout(h, w)
+    half = np.abs(np.fft.rfft2(gray.astype(np.float32)))
+    ratio = 1 - np.vdot(low_weights, half) / np.vdot(weights, half)
+
+    assert ratio == pytest.approx(expected_ratio, rel=1e-5)
+    np.testing.assert_allclose(half[rows, cols], expected_region, rtol=1e-4, atol=1e-2)
+
+
+def test_faces_are_analysed_at_their_own_resolution_by_default():
+    """Mặc định giữ độ phân giải gốc (ngưỡng được chỉnh ở đó); features khớp cách tính cũ"""
+    analyzer = TextureAnalyzer()
+    gray = _face(300, 260, seed=2)
+    assert analyzer.prepare(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)).shape == (300, 260)
+
+    result = analyzer.comprehensive_check(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    hist = np.bincount(_lbp_loop(gray).ravel(), minlength=256) / gray.size
+    entropy = -np.sum(hist[hist > 0] * np.log2(hist[hist > 0]))
+    assert result['print_detection']['features']['entropy'] == pytest.approx(entropy, abs=1e-4)
+
+    magnitude = np.abs(np.fft.fftshift(np.fft.fft2(gray.astype(np.float32))))
+    h, w = gray.shape
+    y, x = np.ogrid[:h, :w]
+    low = (x - w // 2) ** 2 + (y - h // 2) ** 2 <= (min(h, w) // 8) ** 2
+    expected_ratio = magnitude[~low].sum() / magnitude.sum()
+    assert result['screen_detection']['high_freq_ratio'] == pytest.approx(expected_ratio, abs=1e-4)
+
+
+def test_canonical_size_is_opt_in():
+    """canonical_size đặt thì mọi kích thước mặt về cùng một cỡ, cache phổ luôn trúng"""
+    analyzer = TextureAnalyzer(canonical_size=128)
+    for h, w in [(480, 400), (300, 260), (90, 70)]:
+        bgr = cv2.cvtColor(_face(h, w), cv2.COLOR_GRAY2BGR)
+        assert analyzer.prepare(bgr).shape == (128, 128)
+
+    _spectrum_layout.cache_clear()
+    analyzer.comprehensive_check(cv2.cvtColor(_face(480, 400), cv2.COLOR_GRAY2BGR))
+    analyzer.comprehensive_check(cv2.cvtColor(_face(250, 210), cv2.COLOR_GRAY2BGR))
+    info = _spectrum_layout.cache_info()
+    assert info.misses == 1 and info.hits == 1
+
+
+def test_prepare_failure_returns_error_result():
+    """Lỗi tiền xử lý trả về kết quả lỗi, không chạy tiếp trên ảnh gốc"""
+    result = TextureAnalyzer().comprehensive_check(np.zeros((0, 0, 3), dtype=np.uint8))
+    assert 'error' in result
+    assert result['confidence'] == 0.0
+    assert 'print_detection' not in result
+
+
+def test_comprehensive_check_result_format():
+    result = TextureAnalyzer().comprehensive_check(cv2.cvtColor(_face(200, 180), cv2.COLOR_GRAY2BGR))
+    assert set(result) >= {'is_real', 'is_attack', 'attack_type', 'confidence',
+                           'print_detection', 'screen_detection', 'method'}
+    assert 'features' in result['print_detection']
+    assert 'high_freq_ratio' in result['screen_detection']